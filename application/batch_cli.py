@@ -0,0 +1,222 @@
+# Headless command-line and Python entry point for batch feature extraction, importing nothing GUI-related.
+from argparse import ArgumentParser, ArgumentTypeError
+from json import dumps, load
+from multiprocessing import freeze_support
+from os import dup, dup2, fdopen
+import sys
+from time import time
+
+# Settings of a batch job, with their defaults. Folders without a default are required.
+JOB_SPEC_DEFAULTS = {
+    "input_folder": None,
+    "output_2d_folder": None,
+    "output_3d_folder": None,
+    "model": 1,
+    "precision": "fp32",
+    "engine": "pytorch",
+    "preset": "balanced",
+    "feature": "Building Footprints",
+    "post_processing": "Simplify Contours",
+    "format": "OBJ",
+    "score_threshold": 0.5,
+    "class_thresholds": None,
+    "workers": 1,
+    "batch_size": 1,
+    "tile_size": None,
+    "device": None,
+    "resume": False,
+    "reexport_only": False,
+    "annotation_scale": 0.8,
+    "annotate_every": 1,
+    "mosaic": False,
+    "mosaic_chunk_size": 2048,
+}
+REQUIRED_JOB_SETTINGS = ("input_folder", "output_2d_folder", "output_3d_folder")
+
+def load_job_spec(spec):
+    """
+    Validate a job spec and fill in the defaults of the missing settings.
+
+    Parameters:
+        spec (dict): Job settings, see JOB_SPEC_DEFAULTS.
+
+    Returns:
+        dict: The complete job spec.
+    """
+    unknown = sorted(set(spec) - set(JOB_SPEC_DEFAULTS))
+    if unknown:
+        raise ValueError(f"Unknown job settings: {', '.join(unknown)}")
+
+    job_spec = dict(JOB_SPEC_DEFAULTS)
+    job_spec.update({name: value for name, value in spec.items() if value is not None})
+
+    missing = [name for name in REQUIRED_JOB_SETTINGS if not job_spec[name]]
+    if missing:
+        raise ValueError(f"Missing job settings: {', '.join(missing)}")
+    for name in ("workers", "batch_size", "mosaic_chunk_size"):
+        if int(job_spec[name]) < 1:
+            raise ValueError(f"{name} must be at least 1, got {job_spec[name]}.")
+    if job_spec["class_thresholds"] is not None and not isinstance(job_spec["class_thresholds"], dict):
+        raise ValueError("class_thresholds must map class ids to scores.")
+    if float(job_spec["annotation_scale"]) <= 0 or int(job_spec["annotate_every"]) < 0:
+        raise ValueError("annotation_scale must be positive and annotate_every at least 0.")
+    return job_spec
+
+def run_job(spec, on_event=None):
+    """
+    Run a batch feature extraction job without any user interface.
+
+    Parameters:
+        spec (dict): Job settings, validated by load_job_spec.
+        on_event (callable): Called with a dict for each event of the job: "start", "progress" (after every image), "done" or "error".
+
+    Returns:
+        dict: Summary of the run, as returned by extract_features.
+    """
+    job_spec = load_job_spec(spec)
+
+    def emit(event, **fields):
+        if on_event is not None:
+            on_event({"event": event, "time": time(), **fields})
+
+    emit("start", spec=job_spec)
+    try:
+        # Imported here so parsing a job spec does not load the model libraries
+        from detect_buildings import extract_features, POST_PROCESSING_ALGORITHMS, EXPORT_FORMATS
+
+        if job_spec["post_processing"] not in POST_PROCESSING_ALGORITHMS:
+            raise ValueError(f"Unknown post-processing algorithm: {job_spec['post_processing']}")
+        if job_spec["format"].upper() not in EXPORT_FORMATS:
+            raise ValueError(f"Unknown export format: {job_spec['format']}")
+
+        summary = extract_features(
+            job_spec["model"], job_spec["feature"], job_spec["input_folder"], job_spec["output_2d_folder"],
+            job_spec["output_3d_folder"], job_spec["post_processing"],
+            batch_size=int(job_spec["batch_size"]), device=job_spec["device"], num_workers=int(job_spec["workers"]),
+            tile_size=job_spec["tile_size"], reexport_only=job_spec["reexport_only"], resume=job_spec["resume"],
+            annotation_scale=float(job_spec["annotation_scale"]), annotate_every=int(job_spec["annotate_every"]),
+            export_format=job_spec["format"].upper(),
+            score_threshold=float(job_spec["score_threshold"]), class_thresholds=job_spec["class_thresholds"],
+            precision=job_spec["precision"], engine=job_spec["engine"], preset=job_spec["preset"],
+            mosaic=bool(job_spec["mosaic"]), mosaic_chunk_size=int(job_spec["mosaic_chunk_size"]),
+            on_progress=lambda progress: emit("progress", **progress),
+        )
+    except Exception as e:
+        emit("error", message=str(e))
+        raise
+
+    emit("done", images=summary["images"], seconds=summary["seconds"], cache=summary["cache"],
+         transfer=summary["transfer"], timings=summary["timings"])
+    return summary
+
+class JsonLinesReporter:
+    """Job event callback writing each event as one JSON line, for scripts and schedulers to parse."""
+
+    def __init__(self, stream):
+        self.stream = stream
+
+    def __call__(self, event):
+        self.stream.write(dumps(event) + "\n")
+        self.stream.flush()
+
+def print_event(event):
+    """Job event callback printing human readable progress."""
+    if event["event"] == "progress":
+        print(f"[{event['completed']}/{event['total']}] {event['image']} "
+              f"(about {event['remaining_seconds']:.0f} seconds left)")
+    elif event["event"] == "error":
+        print(f"ERROR: {event['message']}", file=sys.stderr)
+
+def take_over_stdout():
+    """
+    Return a stream on the original stdout and send everything else written to stdout to stderr.
+
+    The redirect happens at the file descriptor level, so the logs of worker processes and
+    native libraries cannot end up between the JSON lines either.
+    """
+    sys.stdout.flush()
+    json_stream = fdopen(dup(sys.stdout.fileno()), "w")
+    dup2(sys.stderr.fileno(), sys.stdout.fileno())
+    return json_stream
+
+def parse_class_threshold(text):
+    """Parse a CLASS=SCORE command-line value into a (class id, score) pair."""
+    class_id, separator, score = text.partition("=")
+    if not separator:
+        raise ArgumentTypeError(f"expected CLASS=SCORE, got {text}")
+    try:
+        return int(class_id), float(score)
+    except ValueError:
+        raise ArgumentTypeError(f"expected an integer class id and a score, got {text}")
+
+def build_parser():
+    """Build the command-line argument parser."""
+    parser = ArgumentParser(description="Extract features from a folder of satellite images without the user interface.")
+    parser.add_argument("--spec", help="JSON job spec file, the options below override its settings.")
+    parser.add_argument("--input", dest="input_folder", help="Folder of input images.")
+    parser.add_argument("--output-2d", dest="output_2d_folder", help="Output folder for the annotated images.")
+    parser.add_argument("--output-3d", dest="output_3d_folder", help="Output folder for the OBJ files.")
+    parser.add_argument("--model", type=int, help="Detection model number (default 1).")
+    parser.add_argument("--precision", choices=["fp32", "int8"],
+                        help="Model precision, int8 runs a quantized model on the CPU, faster at a small accuracy cost (default fp32).")
+    parser.add_argument("--engine", choices=["pytorch", "onnx"],
+                        help="Inference engine, onnx runs the exported model with ONNX Runtime on the CPU (default pytorch).")
+    parser.add_argument("--preset", choices=["fast", "balanced", "accurate"],
+                        help="Input resolution preset, trading detail for speed (default balanced, the model config).")
+    parser.add_argument("--feature", help="Feature to extract (default Building Footprints).")
+    parser.add_argument("--post-processing", dest="post_processing", help="Post-processing algorithm (default Simplify Contours).")
+    parser.add_argument("--format", help="Mesh file format of the 3D outputs: OBJ, GLB or PLY (default OBJ).")
+    parser.add_argument("--score-threshold", dest="score_threshold", type=float,
+                        help="Minimum confidence of the exported detections (default 0.5).")
+    parser.add_argument("--class-threshold", dest="class_thresholds", type=parse_class_threshold, action="append",
+                        metavar="CLASS=SCORE", help="Minimum confidence of one class id, overriding --score-threshold. Repeatable.")
+    parser.add_argument("--workers", type=int, help="Number of worker processes (default 1).")
+    parser.add_argument("--batch-size", dest="batch_size", type=int, help="Images per forward pass (default 1).")
+    parser.add_argument("--tile-size", dest="tile_size", type=int, help="Run large scenes in overlapping tiles of this size.")
+    parser.add_argument("--annotation-scale", dest="annotation_scale", type=float,
+                        help="Scale of the annotated 2D images (default 0.8).")
+    parser.add_argument("--annotate-every", dest="annotate_every", type=int,
+                        help="Only annotate every Nth image, 0 disables annotated images (default 1).")
+    parser.add_argument("--mosaic", action="store_true", default=None,
+                        help="Also assemble all footprints into a city mosaic with levels of detail, in <output-3d>/mosaic.")
+    parser.add_argument("--mosaic-chunk-size", dest="mosaic_chunk_size", type=int,
+                        help="Side of the finest mosaic chunks in input pixels (default 2048).")
+    parser.add_argument("--device", help="Inference device (default: GPU if available).")
+    parser.add_argument("--resume", action="store_true", default=None, help="Skip the images completed by an interrupted run.")
+    parser.add_argument("--reexport-only", dest="reexport_only", action="store_true", default=None,
+                        help="Re-export the stored predictions of the last run without running the model.")
+    parser.add_argument("--json", action="store_true", help="Report progress as JSON lines on stdout, logs go to stderr.")
+    return parser
+
+def main(argv=None):
+    """Run a batch job from the command line, returning the process exit code."""
+    args = build_parser().parse_args(argv)
+    settings = {name: value for name, value in vars(args).items() if name not in ("spec", "json")}
+    if settings["class_thresholds"] is not None:
+        settings["class_thresholds"] = dict(settings["class_thresholds"])
+
+    try:
+        spec = {}
+        if args.spec:
+            with open(args.spec, encoding="utf-8") as spec_file:
+                spec = load(spec_file)
+        spec.update({name: value for name, value in settings.items() if value is not None})
+        job_spec = load_job_spec(spec)
+    except (OSError, ValueError) as e:
+        print(f"Invalid job: {e}", file=sys.stderr)
+        return 2
+
+    try:
+        if args.json:
+            # Keep stdout for the JSON lines, the pipeline logs go to stderr
+            run_job(job_spec, on_event=JsonLinesReporter(take_over_stdout()))
+        else:
+            run_job(job_spec, on_event=print_event)
+    except Exception as e:
+        print(f"Terminated, error occurred during extraction: {e}", file=sys.stderr)
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    freeze_support()  # Required for inference worker processes in frozen (PyInstaller) builds
+    sys.exit(main())
@@ -0,0 +1,55 @@
+# Batched inference, running several images through the detection model in a single forward pass.
+DEFAULT_BATCH_SIZE = 1
+
+def iter_batches(items, batch_size):
+    """Yield consecutive lists of at most batch_size items."""
+    if batch_size < 1:
+        raise ValueError(f"Batch size must be at least 1, got {batch_size}")
+    for start in range(0, len(items), batch_size):
+        yield items[start:start + batch_size]
+
+def preprocess_image(predictor, img):
+    """
+    Prepare a BGR image for the model exactly as DefaultPredictor does for a single image.
+
+    Parameters:
+        predictor (DefaultPredictor): Predictor providing the test-time resize and input format.
+        img (numpy.ndarray): Image in BGR order, as read by OpenCV.
+
+    Returns:
+        dict: Model input with the resized CHW image tensor and the original image size.
+    """
+    from torch import as_tensor
+
+    if predictor.input_format == "RGB":
+        img = img[:, :, ::-1]  # The model expects RGB inputs
+    height, width = img.shape[:2]
+    image = predictor.aug.get_transform(img).apply_image(img)
+    image = as_tensor(image.astype("float32").transpose(2, 0, 1))
+    return {"image": image, "height": height, "width": width}
+
+def predict_batch(predictor, images):
+    """
+    Run inference on a batch of images in one call to the model.
+
+    The model pads every resized image in the batch to a common size (a multiple of the
+    backbone stride) before the backbone runs, and rescales each prediction back to its
+    own image size, so the per-image outputs match calling predictor(img) on each image.
+
+    Parameters:
+        predictor (DefaultPredictor): Loaded predictor whose model is run on the batch, or an OnnxPredictor.
+        images (list): Images in BGR order, as read by OpenCV.
+
+    Returns:
+        list: One output dict (with an "instances" field) per input image.
+    """
+    if not images:
+        return []
+    if hasattr(predictor, "predict_images"):
+        return predictor.predict_images(images)  # Predictors of other engines run without torch
+
+    from torch import no_grad
+
+    with no_grad():
+        inputs = [preprocess_image(predictor, img) for img in images]
+        return predictor.model(inputs)
@@ -0,0 +1,61 @@
+# Benchmark of contour extraction on synthetic dense scenes: full-frame masks against box-cropped masks.
+from argparse import ArgumentParser
+from os import path
+from time import perf_counter
+import sys
+
+from cv2 import ellipse
+from numpy import zeros, uint8, array, array_equal
+from numpy.random import default_rng
+
+sys.path.insert(0, path.dirname(path.dirname(path.abspath(__file__))))
+
+from detect_buildings import process_contours  # noqa: E402
+
+def dense_scene(size, buildings, seed=0):
+    """Return boolean masks and (x0, y0, x1, y1) boxes of randomly placed elliptical buildings in a size x size image."""
+    rng = default_rng(seed)
+    masks = zeros((buildings, size, size), dtype=bool)
+    boxes = []
+    for i in range(buildings):
+        half_width, half_height = rng.integers(5, 40, size=2)
+        x, y = rng.integers(40, size - 40, size=2)
+        canvas = zeros((size, size), dtype=uint8)
+        ellipse(canvas, (int(x), int(y)), (int(half_width), int(half_height)), float(rng.uniform(0, 180)), 0, 360, 1, -1)
+        masks[i] = canvas.astype(bool)
+        rows, columns = masks[i].any(axis=1).nonzero()[0], masks[i].any(axis=0).nonzero()[0]
+        boxes.append((columns[0], rows[0], columns[-1], rows[-1]))
+    return masks, array(boxes, dtype=float)
+
+def time_contours(masks, boxes, algorithm, repeats):
+    """Return the best time of extracting every instance's contours, and the contours found."""
+    best, contours = None, None
+    for _ in range(repeats):
+        start = perf_counter()
+        contours = [process_contours(mask, algorithm, box) for mask, box in zip(masks, boxes)]
+        elapsed = perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, contours
+
+def main(argv=None):
+    parser = ArgumentParser(description="Compare full-frame and box-cropped contour extraction.")
+    parser.add_argument("--size", type=int, default=2048, help="Side of the synthetic image in pixels.")
+    parser.add_argument("--buildings", type=int, default=400, help="Number of buildings in the image.")
+    parser.add_argument("--algorithm", default="Simplify Contours", help="Post-processing algorithm.")
+    parser.add_argument("--repeats", type=int, default=3, help="Runs per method, the fastest is kept.")
+    args = parser.parse_args(argv)
+
+    masks, boxes = dense_scene(args.size, args.buildings)
+    full_seconds, full_contours = time_contours(masks, [None] * len(masks), args.algorithm, args.repeats)
+    cropped_seconds, cropped_contours = time_contours(masks, boxes, args.algorithm, args.repeats)
+
+    identical = all(len(a) == len(b) and all(array_equal(ca, cb) for ca, cb in zip(a, b))
+                    for a, b in zip(full_contours, cropped_contours))
+    print(f"{args.buildings} buildings in a {args.size}x{args.size} image ({args.algorithm}):")
+    print(f"    full-frame masks:  {full_seconds * 1000:8.1f} ms")
+    print(f"    box-cropped masks: {cropped_seconds * 1000:8.1f} ms  ({full_seconds / cropped_seconds:.1f}x faster)")
+    print(f"    identical contours: {identical}")
+    return 0 if identical else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
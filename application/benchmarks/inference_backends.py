@@ -0,0 +1,75 @@
+# Benchmark of the CPU latency of the PyTorch and ONNX Runtime engines on the same images, with a check that their predictions agree.
+from argparse import ArgumentParser
+from os import listdir, path
+from statistics import median
+import sys
+from time import perf_counter
+
+from cv2 import imread
+from numpy import abs as absolute
+
+sys.path.insert(0, path.dirname(path.dirname(path.abspath(__file__))))
+
+from instance_filter import filter_instances  # noqa: E402
+from onnx_backend import ENGINES  # noqa: E402
+from predictor_registry import build_predictor, get_model_paths  # noqa: E402
+
+def time_engine(predictor, images, repeats, warmup):
+    """Return the median seconds per image and the filtered predictions of each image."""
+    for img in images[:warmup]:
+        predictor(img)
+    timings = []
+    for _ in range(repeats):
+        predictions = []
+        for img in images:
+            start = perf_counter()
+            outputs = predictor(img)
+            timings.append(perf_counter() - start)
+            predictions.append(filter_instances(outputs["instances"], 0.5))
+    return median(timings), predictions
+
+def compare_predictions(expected, actual):
+    """Return the largest box and score differences and the smallest mask IoU over matching predictions, or None when the counts differ."""
+    box_error = score_error = 0.0
+    mask_iou = 1.0
+    for reference, candidate in zip(expected, actual):
+        if len(reference) != len(candidate):
+            return None
+        if not len(reference):
+            continue
+        box_error = max(box_error, float(absolute(reference.boxes - candidate.boxes).max()))
+        score_error = max(score_error, float(absolute(reference.scores - candidate.scores).max()))
+        for i in range(len(reference)):
+            first, second = reference.masks.dense(i), candidate.masks.dense(i)
+            mask_iou = min(mask_iou, (first & second).sum() / max((first | second).sum(), 1))
+    return box_error, score_error, mask_iou
+
+def main(argv=None):
+    parser = ArgumentParser(description="Compare the CPU latency and predictions of the inference engines.")
+    parser.add_argument("images", help="Folder of images to run the models on.")
+    parser.add_argument("--model", type=int, default=1, help="Detection model number (default 1).")
+    parser.add_argument("--repeats", type=int, default=3, help="Timed passes over the images.")
+    parser.add_argument("--warmup", type=int, default=1, help="Images run once before timing.")
+    args = parser.parse_args(argv)
+
+    images = [imread(path.join(args.images, name)) for name in sorted(listdir(args.images))]
+    images = [img for img in images if img is not None]
+    weights_path, config_path = get_model_paths(args.model)
+
+    results = {}
+    for engine in ENGINES:
+        predictor = build_predictor(config_path, weights_path, "cpu", engine=engine)
+        results[engine] = time_engine(predictor, images, args.repeats, args.warmup)
+        print(f"{engine:8} {results[engine][0] * 1000:8.1f} ms per image (median of {len(images) * args.repeats})")
+
+    print(f"speedup of onnx: {results['pytorch'][0] / results['onnx'][0]:.2f}x")
+    comparison = compare_predictions(results["pytorch"][1], results["onnx"][1])
+    if comparison is None:
+        print("predictions differ: the engines found a different number of buildings")
+        return 1
+    box_error, score_error, mask_iou = comparison
+    print(f"largest box difference {box_error:.2f} px, largest score difference {score_error:.4f}, lowest mask IoU {mask_iou:.3f}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
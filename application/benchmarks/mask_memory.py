@@ -0,0 +1,97 @@
+# Benchmark of the peak memory of crowded predictions: full-frame boolean masks against packed, box-cropped masks.
+from argparse import ArgumentParser, SUPPRESS
+from os import path
+from resource import getrusage, RUSAGE_SELF
+import subprocess
+import sys
+from time import perf_counter
+
+from cv2 import ellipse
+from numpy import concatenate, zeros, uint8
+from numpy.random import default_rng
+
+sys.path.insert(0, path.dirname(path.dirname(path.abspath(__file__))))
+
+from compact_masks import PackedMasks, crop_windows  # noqa: E402
+from detect_buildings import process_contours  # noqa: E402
+
+def draw_buildings(size, buildings, seed):
+    """Yield the (size, size) mask and (x0, y0, x1, y1) box of randomly placed elliptical buildings, one at a time."""
+    rng = default_rng(seed)
+    canvas = zeros((size, size), dtype=uint8)
+    for _ in range(buildings):
+        half_width, half_height = (int(value) for value in rng.integers(5, 40, size=2))
+        x, y = (int(value) for value in rng.integers(40, size - 40, size=2))
+        canvas[:] = 0
+        ellipse(canvas, (x, y), (half_width, half_height), float(rng.uniform(0, 180)), 0, 360, 1, -1)
+        reach = max(half_width, half_height)
+        yield canvas.astype(bool), (x - reach, y - reach, x + reach, y + reach)
+
+def dense_predictions(size, buildings, seed):
+    """Masks as they were held on the CPU: one full-frame boolean mask per instance."""
+    masks = zeros((buildings, size, size), dtype=bool)
+    boxes = []
+    for i, (mask, box) in enumerate(draw_buildings(size, buildings, seed)):
+        masks[i] = mask
+        boxes.append(box)
+    return masks, boxes
+
+def packed_predictions(size, buildings, seed):
+    """Masks as they are now held on the CPU: only the crop windows, packed (the full frame stays on the model device)."""
+    crops, boxes = [], []
+    for mask, box in draw_buildings(size, buildings, seed):
+        x0, y0, x1, y1 = crop_windows([box], (size, size))[0].tolist()
+        crops.append(mask[y0:y1, x0:x1].ravel())
+        boxes.append(box)
+    windows = crop_windows(boxes, (size, size))
+    return PackedMasks.from_pixels((size, size), windows, concatenate(crops)), boxes
+
+def run_mode(mode, size, buildings, images, algorithm):
+    """Hold the predictions of several images, as the pipeline queues do, and extract their contours."""
+    baseline_kb = getrusage(RUSAGE_SELF).ru_maxrss
+    start = perf_counter()
+    predictions = [(dense_predictions if mode == "dense" else packed_predictions)(size, buildings, seed)
+                   for seed in range(images)]
+    contour_count = 0
+    for masks, boxes in predictions:
+        if mode == "dense":
+            contours = [process_contours(masks[i], algorithm, box) for i, box in enumerate(boxes)]
+        else:
+            contours = [process_contours(masks.crop(i), algorithm, offset=tuple(window[:2]))
+                        for i, window in enumerate(masks.windows.tolist())]
+        contour_count += sum(len(found) for found in contours)
+    elapsed = perf_counter() - start
+    peak_kb = getrusage(RUSAGE_SELF).ru_maxrss
+    print(f"{mode} {elapsed:.3f} {(peak_kb - baseline_kb) / 1024:.1f} {contour_count}")
+
+def main(argv=None):
+    parser = ArgumentParser(description="Compare the peak memory of full-frame and packed instance masks.")
+    parser.add_argument("--size", type=int, default=1024, help="Side of the synthetic images in pixels.")
+    parser.add_argument("--buildings", type=int, default=300, help="Buildings per image.")
+    parser.add_argument("--images", type=int, default=2, help="Images whose predictions are held at once, as in the pipeline queues.")
+    parser.add_argument("--algorithm", default="Simplify Contours", help="Post-processing algorithm.")
+    parser.add_argument("--mode", choices=["dense", "packed"], help=SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.mode:
+        run_mode(args.mode, args.size, args.buildings, args.images, args.algorithm)
+        return 0
+
+    # Each mode runs in its own process, so its peak resident memory is measured on its own
+    results = {}
+    for mode in ("dense", "packed"):
+        command = [sys.executable, path.abspath(__file__), "--mode", mode, "--size", str(args.size),
+                   "--buildings", str(args.buildings), "--images", str(args.images), "--algorithm", args.algorithm]
+        output = subprocess.run(command, capture_output=True, text=True, check=True).stdout.strip().splitlines()[-1].split()
+        results[mode] = (float(output[1]), float(output[2]), int(output[3]))
+
+    print(f"{args.images} images of {args.size}x{args.size} pixels with {args.buildings} buildings each:")
+    for mode, (seconds, peak_mb, _) in results.items():
+        print(f"    {mode:6} masks: peak RSS +{peak_mb:8.1f} MB  {seconds * 1000:8.1f} ms")
+    print(f"    peak RSS reduction: {results['dense'][1] / max(results['packed'][1], 0.1):.1f}x")
+    identical = results["dense"][2] == results["packed"][2]
+    print(f"    same contours found: {identical}")
+    return 0 if identical else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
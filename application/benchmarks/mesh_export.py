@@ -0,0 +1,51 @@
+# Benchmark of the mesh export formats: write time and file size of the footprints of a synthetic image.
+from argparse import ArgumentParser
+from os import path
+from tempfile import TemporaryDirectory
+from time import perf_counter
+import sys
+
+from numpy import array, cos, sin, int32
+from numpy.random import default_rng
+
+sys.path.insert(0, path.dirname(path.dirname(path.abspath(__file__))))
+
+from make_geometry import flatten_contours, build_mesh  # noqa: E402
+from export_feature import EXPORT_FORMATS  # noqa: E402
+
+# Outline of an L-shaped building around the origin, the most common concave footprint
+L_SHAPE = array([[-1, -1], [1, -1], [1, 0], [0, 0], [0, 1], [-1, 1]], dtype=float)
+
+def synthetic_footprints(buildings, seed=0):
+    """Return the mesh of an image with the given number of rotated and scaled L-shaped footprints."""
+    rng = default_rng(seed)
+    groups = []
+    for _ in range(buildings):
+        angle, size = rng.uniform(0, 6.28), rng.uniform(5, 40)
+        rotation = array([[cos(angle), -sin(angle)], [sin(angle), cos(angle)]])
+        outline = L_SHAPE @ rotation.T * size + rng.uniform(50, 8000, size=2)
+        groups.append(flatten_contours([outline.round().astype(int32)]))
+    return build_mesh(groups)
+
+def main(argv=None):
+    parser = ArgumentParser(description="Compare the write time and size of the mesh export formats.")
+    parser.add_argument("--buildings", type=int, default=2000, help="Buildings in the synthetic image.")
+    parser.add_argument("--repeats", type=int, default=5, help="Runs per format, the fastest is kept.")
+    args = parser.parse_args(argv)
+
+    mesh = synthetic_footprints(args.buildings)
+    print(f"{len(mesh[0])} vertices in {args.buildings} footprints:")
+    with TemporaryDirectory() as folder:
+        for export_format, writers in EXPORT_FORMATS.items():
+            file_path = path.join(folder, f"footprints{writers['extension']}")
+            best = None
+            for _ in range(args.repeats):
+                start = perf_counter()
+                writers["buildings"](file_path, *mesh, name_prefix="building")
+                elapsed = perf_counter() - start
+                best = elapsed if best is None else min(best, elapsed)
+            print(f"    {export_format:4} {best * 1000:8.1f} ms  {path.getsize(file_path) / 1e3:8.1f} kB")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
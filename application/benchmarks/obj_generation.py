@@ -0,0 +1,92 @@
+# Micro-benchmark of footprint OBJ generation: in-memory per-point Python loops against the streaming NumPy writer.
+from argparse import ArgumentParser
+from os import path
+from tempfile import TemporaryDirectory
+from time import perf_counter
+from tracemalloc import start as start_tracing, stop as stop_tracing, get_traced_memory, reset_peak
+import sys
+
+from numpy import array
+from numpy.random import default_rng
+
+sys.path.insert(0, path.dirname(path.dirname(path.abspath(__file__))))
+
+from make_geometry import flatten_contours, build_mesh  # noqa: E402
+from obj_writer import write_buildings_obj  # noqa: E402
+
+def legacy_flatten_contours(contours):
+    """flatten_contours as it was before vectorization."""
+    flattened_contours = []
+    for contour in contours:
+        flattened_contour = []
+        for pt in contour:
+            flattened_contour.append([pt[0][0], pt[0][1], 0])
+        flattened_contours.append(array(flattened_contour))
+    return flattened_contours
+
+def legacy_footprints_obj(contour_groups):
+    """build_footprints_obj as it was before vectorization."""
+    vertices, obj_faces, vertex_index = [], [], 1
+    for flattened_contours in contour_groups:
+        for contour in flattened_contours:
+            obj_faces.append("f " + " ".join(str(vertex_index + idx) for idx in range(len(contour))))
+            for pt in contour:
+                vertices.append(f"v {pt[0]} {pt[1]} 0")
+            vertex_index += len(contour)
+    return "\n".join(vertices) + "\n" + "\n".join(obj_faces) + "\n"
+
+def synthetic_contours(buildings, points_per_building, seed=0):
+    """Return the contours of an image with the given number of buildings, as OpenCV (n, 1, 2) int32 arrays."""
+    rng = default_rng(seed)
+    return [[rng.integers(0, 8000, size=(points_per_building, 1, 2)).astype("int32")] for _ in range(buildings)]
+
+def legacy_write(groups, file_path):
+    with open(file_path, "w") as footprints_file:
+        footprints_file.write(legacy_footprints_obj([legacy_flatten_contours(contours) for contours in groups]))
+
+def streaming_write(groups, file_path, name_prefix):
+    write_buildings_obj(file_path, *build_mesh([flatten_contours(contours) for contours in groups]), name_prefix=name_prefix)
+
+def best_time(function, repeats):
+    """Return the fastest time of the function and the peak memory it allocated."""
+    best = None
+    for _ in range(repeats):
+        start = perf_counter()
+        function()
+        elapsed = perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+
+    start_tracing()
+    reset_peak()
+    function()
+    peak_bytes = get_traced_memory()[1]
+    stop_tracing()
+    return best, peak_bytes
+
+def main(argv=None):
+    parser = ArgumentParser(description="Compare the legacy and vectorized footprint OBJ generation.")
+    parser.add_argument("--buildings", type=int, default=1000, help="Buildings in the synthetic image.")
+    parser.add_argument("--points", type=int, default=20, help="Contour points per building.")
+    parser.add_argument("--repeats", type=int, default=5, help="Runs per implementation, the fastest is kept.")
+    args = parser.parse_args(argv)
+
+    groups = synthetic_contours(args.buildings, args.points)
+    with TemporaryDirectory() as folder:
+        legacy_path, streaming_path, named_path = (path.join(folder, name) for name in ("legacy.obj", "streaming.obj", "named.obj"))
+        results = [
+            ("in-memory, per-point loops", best_time(lambda: legacy_write(groups, legacy_path), args.repeats)),
+            ("streaming", best_time(lambda: streaming_write(groups, streaming_path, None), args.repeats)),
+            ("streaming, named buildings", best_time(lambda: streaming_write(groups, named_path, "building"), args.repeats)),
+        ]
+        with open(legacy_path, "rb") as legacy_file, open(streaming_path, "rb") as streaming_file:
+            identical = legacy_file.read() == streaming_file.read()
+
+    legacy_seconds = results[0][1][0]
+    print(f"{args.buildings * args.points} vertices in {args.buildings} footprints:")
+    for label, (seconds, peak_bytes) in results:
+        print(f"    {label:28} {seconds * 1000:8.1f} ms  ({legacy_seconds / seconds:.1f}x)  peak {peak_bytes / 1e6:6.1f} MB")
+    print(f"    byte-identical (unnamed):    {identical}")
+    return 0 if identical else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,92 @@
+# End-to-end throughput of extract_features on generated images, with a stub predictor standing in for the model.
+from argparse import ArgumentParser
+from contextlib import redirect_stdout
+from io import StringIO
+from json import dumps
+from os import makedirs, path
+from tempfile import TemporaryDirectory
+import sys
+
+from cv2 import GaussianBlur, imwrite
+from numpy.random import default_rng
+
+sys.path.insert(0, path.dirname(path.dirname(path.abspath(__file__))))
+
+from detect_buildings import extract_features  # noqa: E402
+from predictor_registry import PredictorRegistry  # noqa: E402
+from stub_predictor import StubPredictor, DEFAULT_BUILDINGS_PER_MEGAPIXEL  # noqa: E402
+
+def generate_images(folder, images, size, seed=0):
+    """Write images of blurred noise, each different, so that each one gets its own synthetic buildings."""
+    rng = default_rng(seed)
+    for index in range(images):
+        noise = rng.integers(0, 256, size=(size, size, 3), dtype="uint8")
+        imwrite(path.join(folder, f"image_{index:04d}.png"), GaussianBlur(noise, (0, 0), 3))
+
+def run_harness(images=20, size=1024, density=DEFAULT_BUILDINGS_PER_MEGAPIXEL, inference_delay=0.0, quiet=True, **extract_options):
+    """
+    Run the full extraction pipeline over generated images with a StubPredictor.
+
+    Parameters:
+        images (int): Number of generated images.
+        size (int): Side of the generated images in pixels.
+        density (float): Synthetic buildings per megapixel.
+        inference_delay (float): Simulated inference seconds per image.
+        quiet (bool): Hide the per-image output of the pipeline.
+        extract_options: Further keyword options of extract_features (batch size, tiling, export format, ...).
+
+    Returns:
+        dict: Throughput ("images_per_second"), the per-image busy time of each pipeline stage in
+        seconds ("stages"), the per-image time of the inference stage spent outside the stub ("inference_overhead")
+        and the run summary of extract_features ("summary").
+    """
+    stub = StubPredictor(density, inference_delay)
+    registry = PredictorRegistry(factory=lambda *predictor_options: stub)
+    with TemporaryDirectory() as folder:
+        input_folder, output_2d_folder, output_3d_folder = (path.join(folder, name) for name in ("input", "2d", "3d"))
+        makedirs(input_folder)
+        generate_images(input_folder, images, size)
+
+        output = StringIO() if quiet else sys.stdout
+        with redirect_stdout(output):
+            summary = extract_features(1, "Building Footprints", input_folder, output_2d_folder, output_3d_folder,
+                                       "Simplify Contours", registry=registry, device="cpu", cache_folder=None, **extract_options)
+
+    stages = {stats["stage"]: stats["busy_seconds"] / max(stats["items"], 1) for stats in summary["stages"]}
+    inference_seconds = sum(stats["busy_seconds"] for stats in summary["stages"] if stats["stage"] == "inference")
+    # Time of the inference stage spent outside the stub: filtering and packing the predictions, reading tiles
+    overhead = inference_seconds - stub.seconds
+    return {"images_per_second": images / summary["seconds"], "stages": stages,
+            "inference_overhead": max(overhead, 0.0) / images, "summary": summary}
+
+def main(argv=None):
+    parser = ArgumentParser(description="Measure the throughput of the extraction pipeline with a stub predictor, without model weights.")
+    parser.add_argument("--images", type=int, default=20, help="Number of generated images.")
+    parser.add_argument("--size", type=int, default=1024, help="Side of the generated images in pixels.")
+    parser.add_argument("--density", type=float, default=DEFAULT_BUILDINGS_PER_MEGAPIXEL, help="Synthetic buildings per megapixel.")
+    parser.add_argument("--inference-delay", type=float, default=0.0, help="Simulated inference seconds per image.")
+    parser.add_argument("--batch-size", type=int, default=1, help="Images per inference batch.")
+    parser.add_argument("--tile-size", type=int, help="Run the images as tiled scenes with tiles of this size.")
+    parser.add_argument("--format", default="OBJ", help="Mesh file format: OBJ, GLB or PLY.")
+    parser.add_argument("--annotate-every", type=int, default=1, help="Write an annotated image for every n-th image, none when 0.")
+    parser.add_argument("--verbose", action="store_true", help="Show the output of the pipeline.")
+    parser.add_argument("--json", action="store_true", help="Print the results as JSON.")
+    args = parser.parse_args(argv)
+
+    results = run_harness(args.images, args.size, args.density, args.inference_delay, quiet=not args.verbose,
+                          batch_size=args.batch_size, tile_size=args.tile_size, export_format=args.format,
+                          annotate_every=args.annotate_every)
+    if args.json:
+        print(dumps({name: value for name, value in results.items() if name != "summary"}, indent=2))
+        return 0
+
+    print(f"{args.images} images of {args.size}x{args.size} pixels, {args.density:g} buildings per megapixel, "
+          f"{args.inference_delay * 1000:g} ms simulated inference:")
+    print(f"    {results['images_per_second']:.2f} images/s")
+    for stage, seconds in results["stages"].items():
+        print(f"    {stage:14} {seconds * 1000:8.1f} ms per image")
+    print(f"    inference stage outside the model: {results['inference_overhead'] * 1000:.1f} ms per image")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
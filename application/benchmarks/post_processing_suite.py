@@ -0,0 +1,167 @@
+# Micro-benchmark suite of the contour post-processing and geometry export stages, checked against a JSON baseline.
+from argparse import ArgumentParser
+from json import dump, load
+from os import makedirs, path
+from platform import machine, python_version, system
+from statistics import median
+from tempfile import TemporaryDirectory
+from time import perf_counter
+import sys
+
+from cv2 import fillPoly, findContours, RETR_EXTERNAL, CHAIN_APPROX_SIMPLE, __version__ as opencv_version
+from numpy import cos, linspace, pi, sin, stack, zeros, int32, uint8, __version__ as numpy_version
+from numpy.random import default_rng
+
+sys.path.insert(0, path.dirname(path.dirname(path.abspath(__file__))))
+
+from post_processing import simplify_contours, smooth_contours, fill_holes, bounding_boxes, convex_hulls  # noqa: E402
+from make_geometry import flatten_contours, build_mesh  # noqa: E402
+from obj_writer import write_buildings_obj  # noqa: E402
+
+DEFAULT_BASELINE_PATH = path.join(path.dirname(path.abspath(__file__)), "baselines", "post_processing.json")
+DEFAULT_TOLERANCE = 0.3  # A stage fails when it is more than 30% slower than its baseline
+MIN_REGRESSION_SECONDS = 0.001  # Slowdowns smaller than this are timer noise, whatever their ratio
+MIN_SAMPLE_SECONDS = 0.2  # Fast stages are looped so each timing sample lasts at least this long
+
+def synthetic_masks(images, buildings, seed=0):
+    """
+    Return the box-cropped masks of the buildings of several images.
+
+    Buildings are polygons of 8 to 64 vertices around a 6 to 60 pixel radius with jittered
+    edges, so their contours have tens to hundreds of points, as predicted footprints do.
+    """
+    rng = default_rng(seed)
+    masks = []
+    for _ in range(images * buildings):
+        radius = float(rng.uniform(6, 60))
+        vertices = int(rng.integers(8, 65))
+        angles = linspace(0, 2 * pi, vertices, endpoint=False) + rng.uniform(0, pi)
+        radii = radius * rng.uniform(0.7, 1.0, size=vertices)
+        size = int(2 * radius) + 5
+        points = stack([size / 2 + radii * cos(angles), size / 2 + radii * sin(angles)], axis=1).astype(int32)
+        mask = zeros((size, size), dtype=uint8)
+        fillPoly(mask, [points], 255)
+        masks.append(mask)
+    return masks
+
+def find_contours(masks):
+    """Outer contours of every mask, as process_contours finds them."""
+    return [findContours(mask, RETR_EXTERNAL, CHAIN_APPROX_SIMPLE)[0] for mask in masks]
+
+def write_obj(groups, folder):
+    """Write the footprints of all buildings to an OBJ file, one object per building."""
+    write_buildings_obj(path.join(folder, "footprints.obj"), *build_mesh(flatten_contours(contours) for contours in groups))
+
+def stage_functions(masks, folder):
+    """Return the benchmarked stages, each a function of no arguments processing every building once."""
+    groups = find_contours(masks)
+    flattened = [flatten_contours(contours) for contours in groups]
+    return {
+        "find_contours": lambda: find_contours(masks),
+        "fill_holes": lambda: [fill_holes(mask) for mask in masks],
+        "simplify_contours": lambda: [simplify_contours(contours) for contours in groups],
+        "smooth_contours": lambda: [smooth_contours(contours) for contours in groups],
+        "convex_hulls": lambda: [convex_hulls(contours) for contours in groups],
+        "bounding_boxes": lambda: [bounding_boxes(contours) for contours in groups],
+        "flatten_contours": lambda: [flatten_contours(contours) for contours in groups],
+        "build_mesh": lambda: build_mesh(flattened),
+        "write_obj": lambda: write_obj(groups, folder),
+    }
+
+def time_stage(function, repeats, min_sample_seconds=MIN_SAMPLE_SECONDS):
+    """Return the median time of one call of function, each sample looping over enough calls to last min_sample_seconds."""
+    calls = 1
+    while True:
+        start = perf_counter()
+        for _ in range(calls):
+            function()
+        if perf_counter() - start >= min_sample_seconds:
+            break
+        calls *= 2
+    samples = []
+    for _ in range(repeats):
+        start = perf_counter()
+        for _ in range(calls):
+            function()
+        samples.append((perf_counter() - start) / calls)
+    return median(samples)
+
+def run_suite(images, buildings, repeats, seed=0, min_sample_seconds=MIN_SAMPLE_SECONDS):
+    """
+    Time every stage on the same synthetic buildings.
+
+    Returns:
+        dict: The workload ("workload"), the library versions ("environment") and the median
+        time of each stage in seconds ("stages").
+    """
+    masks = synthetic_masks(images, buildings, seed)
+    stages = {}
+    with TemporaryDirectory() as folder:
+        for name, function in stage_functions(masks, folder).items():
+            stages[name] = time_stage(function, repeats, min_sample_seconds)
+    points = sum(len(contour) for contours in find_contours(masks) for contour in contours)
+    return {"workload": {"images": images, "buildings": buildings, "seed": seed, "contour_points": points},
+            "environment": {"python": python_version(), "numpy": numpy_version, "opencv": opencv_version,
+                            "platform": f"{system()} {machine()}"},
+            "stages": stages}
+
+def compare_to_baseline(results, baseline, tolerance=DEFAULT_TOLERANCE, min_regression=MIN_REGRESSION_SECONDS):
+    """
+    Compare the stage timings with a baseline.
+
+    Returns:
+        list: (stage, seconds, baseline seconds) of the stages slower than the baseline by more
+        than tolerance (a fraction) and by more than min_regression seconds.
+    """
+    if results["workload"] != baseline["workload"]:
+        raise ValueError("The baseline was measured on a different workload, run the suite with the same options or update it.")
+    regressions = []
+    for stage, seconds in results["stages"].items():
+        reference = baseline["stages"].get(stage)
+        if reference is not None and seconds > reference * (1 + tolerance) and seconds - reference > min_regression:
+            regressions.append((stage, seconds, reference))
+    return regressions
+
+def main(argv=None):
+    parser = ArgumentParser(description="Time the post-processing and geometry export stages and compare them with a baseline.")
+    parser.add_argument("--images", type=int, default=4, help="Images of synthetic buildings.")
+    parser.add_argument("--buildings", type=int, default=300, help="Buildings per image.")
+    parser.add_argument("--repeats", type=int, default=5, help="Timing samples per stage, the median is kept.")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE_PATH, help="JSON baseline to compare with.")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE, help="Allowed slowdown as a fraction of the baseline (default 0.3).")
+    parser.add_argument("--update-baseline", action="store_true", help="Write the timings as the new baseline instead of comparing.")
+    args = parser.parse_args(argv)
+
+    results = run_suite(args.images, args.buildings, args.repeats)
+    workload = results["workload"]
+    print(f"{workload['images']} images of {workload['buildings']} buildings ({workload['contour_points']} contour points):")
+
+    if args.update_baseline or not path.isfile(args.baseline):
+        for stage, seconds in results["stages"].items():
+            print(f"    {stage:18} {seconds * 1000:8.2f} ms")
+        makedirs(path.dirname(args.baseline) or ".", exist_ok=True)
+        with open(args.baseline, "w", encoding="utf-8") as baseline_file:
+            dump(results, baseline_file, indent=2)
+        print(f"Baseline written to {args.baseline}")
+        return 0
+
+    with open(args.baseline, encoding="utf-8") as baseline_file:
+        baseline = load(baseline_file)
+    if baseline["environment"] != results["environment"]:
+        print(f"Warning: the baseline was measured with {baseline['environment']}, timings may not be comparable.")
+    try:
+        regressions = {stage for stage, _, _ in compare_to_baseline(results, baseline, args.tolerance)}
+    except ValueError as error:
+        print(error)
+        return 2
+    for stage, seconds in results["stages"].items():
+        reference = baseline["stages"].get(stage)
+        change = f"{(seconds / reference - 1) * 100:+6.1f}%" if reference else "   new"
+        print(f"    {stage:18} {seconds * 1000:8.2f} ms  {change}{'  SLOWER THAN BASELINE' if stage in regressions else ''}")
+    if regressions:
+        print(f"{len(regressions)} stages are more than {args.tolerance:.0%} slower than the baseline.")
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,78 @@
+# Startup-time benchmark: import cost of the application entry modules, each measured in a fresh interpreter.
+from argparse import ArgumentParser
+from json import dumps
+from os import path
+from subprocess import run
+import sys
+
+APPLICATION_FOLDER = path.dirname(path.dirname(path.abspath(__file__)))
+
+# Modules imported when the GUI or the batch CLI starts
+STARTUP_MODULES = ["user_interface", "detect_buildings", "batch_cli"]
+
+# Libraries that must only be imported once an extraction starts
+HEAVY_MODULES = ["torch", "detectron2", "matplotlib"]
+
+def measure_import(module, repeats=3):
+    """
+    Import a module in fresh interpreters with -X importtime and keep the fastest run.
+
+    Parameters:
+        module (str): Name of the module to import, relative to the application folder.
+        repeats (int): Number of fresh interpreters to measure.
+
+    Returns:
+        dict: Cumulative import time in seconds ("seconds"), the slowest direct and indirect
+        imports ("heaviest") and the heavy libraries that were loaded ("heavy_modules").
+    """
+    check = f"import sys, {module}; print(','.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))"
+    best = None
+    for _ in range(repeats):
+        result = run([sys.executable, "-X", "importtime", "-c", check], cwd=APPLICATION_FOLDER,
+                     capture_output=True, text=True)
+        if result.returncode != 0:
+            return {"module": module, "error": result.stderr.strip().splitlines()[-1]}
+
+        # Lines look like "import time:  self [us] | cumulative | indented module name"
+        timings = []
+        for line in result.stderr.splitlines():
+            if not line.startswith("import time:") or "[us]" in line:
+                continue
+            _, cumulative, name = line[len("import time:"):].split("|")
+            timings.append((int(cumulative) / 1e6, name.strip()))
+        seconds = next(cumulative for cumulative, name in reversed(timings) if name == module)
+        if best is None or seconds < best["seconds"]:
+            heavy = [name for name in result.stdout.strip().split(",") if name]
+            best = {"module": module, "seconds": seconds, "heaviest": sorted(timings, reverse=True)[1:6], "heavy_modules": heavy}
+    return best
+
+def main(argv=None):
+    parser = ArgumentParser(description="Measure the import time of the application entry modules.")
+    parser.add_argument("modules", nargs="*", default=STARTUP_MODULES, help="Modules to measure.")
+    parser.add_argument("--repeats", type=int, default=3, help="Fresh interpreters per module, the fastest run is kept.")
+    parser.add_argument("--budget", type=float, help="Fail when a module takes longer than this many seconds to import.")
+    parser.add_argument("--json", action="store_true", help="Print the results as JSON.")
+    args = parser.parse_args(argv)
+
+    results = [measure_import(module, args.repeats) for module in args.modules]
+    if args.json:
+        print(dumps(results, indent=2))
+
+    failed = False
+    for result in results:
+        if "error" in result:
+            if not args.json:
+                print(f"{result['module']}: import failed ({result['error']})")
+            continue  # Missing optional GUI or model dependencies on this machine
+        over_budget = args.budget is not None and result["seconds"] > args.budget
+        failed = failed or over_budget or bool(result["heavy_modules"])
+        if not args.json:
+            print(f"{result['module']}: {result['seconds'] * 1000:.0f} ms{' (over budget)' if over_budget else ''}")
+            for seconds, name in result["heaviest"]:
+                print(f"    {seconds * 1000:8.1f} ms  {name}")
+            if result["heavy_modules"]:
+                print(f"    Heavy libraries imported at startup: {', '.join(result['heavy_modules'])}")
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
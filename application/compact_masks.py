@@ -0,0 +1,158 @@
+# Compact instance masks: each mask cropped to a window around its box and bit-packed, unpacked only where a dense mask is needed.
+from math import ceil, floor
+
+from numpy import arange, asarray, ceil as ceil_array, floor as floor_array, concatenate, cumsum, full, maximum, minimum, ndarray, packbits, repeat, unpackbits, zeros, float32, int32, int64
+
+CONTOUR_CROP_MARGIN = 2  # Pixels kept around each predicted box when cropping its mask for contour extraction
+
+def mask_crop_window(box, mask_shape, margin=CONTOUR_CROP_MARGIN):
+    """Return the (x0, y0, x1, y1) window of a box rounded outwards, grown by margin pixels and clipped to the mask."""
+    height, width = mask_shape
+    x0, y0 = max(floor(box[0]) - margin, 0), max(floor(box[1]) - margin, 0)
+    x1, y1 = min(ceil(box[2]) + margin, width), min(ceil(box[3]) + margin, height)
+    return x0, y0, max(x1, x0), max(y1, y0)
+
+def crop_windows(boxes, mask_shape, margin=CONTOUR_CROP_MARGIN):
+    """Return the (N, 4) crop windows of N boxes at once, see mask_crop_window."""
+    height, width = mask_shape
+    boxes = asarray(boxes, dtype=float).reshape(-1, 4)
+    starts, ends = floor_array(boxes[:, :2]).astype(int64), ceil_array(boxes[:, 2:]).astype(int64)
+    x0, y0 = maximum(starts[:, 0] - margin, 0), maximum(starts[:, 1] - margin, 0)
+    x1, y1 = minimum(ends[:, 0] + margin, width), minimum(ends[:, 1] + margin, height)
+    return concatenate([x0[:, None], y0[:, None], maximum(x1, x0)[:, None], maximum(y1, y0)[:, None]], axis=1)
+
+class PackedMasks:
+    """
+    Instance masks of one image, each cropped to a window and bit-packed into a single bit stream.
+
+    A crowded image costs one bit per pixel of its crop windows, instead of one byte per pixel
+    of the whole image for every instance. Masks are unpacked one at a time by crop and dense.
+    """
+
+    def __init__(self, image_size, windows, bits):
+        """
+        Parameters:
+            image_size (tuple): (height, width) of the image the masks belong to.
+            windows (numpy.ndarray): (N, 4) int64 (x0, y0, x1, y1) crop window of each mask.
+            bits (numpy.ndarray): uint8 bit stream of the crops, row-major, one after the other.
+        """
+        self.image_size = (int(image_size[0]), int(image_size[1]))
+        self.windows = asarray(windows, dtype=int64).reshape(-1, 4)
+        self.bits = bits
+        areas = (self.windows[:, 2] - self.windows[:, 0]) * (self.windows[:, 3] - self.windows[:, 1])
+        self.bit_offsets = concatenate(([0], cumsum(areas))).astype(int64)
+
+    @classmethod
+    def from_pixels(cls, image_size, windows, pixels):
+        """Pack the concatenated, flattened crops of all masks (a boolean array of pixels)."""
+        return cls(image_size, windows, packbits(pixels, axis=None))
+
+    @classmethod
+    def from_dense(cls, masks, windows):
+        """Pack the crop windows of (N, height, width) dense masks."""
+        crops = [masks[i, y0:y1, x0:x1].ravel() for i, (x0, y0, x1, y1) in enumerate(asarray(windows).tolist())]
+        pixels = concatenate(crops) if crops else zeros(0, dtype=bool)
+        return cls.from_pixels(masks.shape[1:], windows, pixels)
+
+    def __len__(self):
+        return len(self.windows)
+
+    @property
+    def area(self):
+        """Number of pixels in all the crop windows."""
+        return int(self.bit_offsets[-1])
+
+    @property
+    def nbytes(self):
+        return self.bits.nbytes + self.windows.nbytes + self.bit_offsets.nbytes
+
+    def crop(self, i):
+        """Unpack mask i within its crop window, as a boolean (y1 - y0, x1 - x0) array."""
+        x0, y0, x1, y1 = self.windows[i].tolist()
+        start, end = int(self.bit_offsets[i]), int(self.bit_offsets[i + 1])
+        # Only the bytes holding this crop are unpacked, it may start and end mid-byte
+        bits = unpackbits(self.bits[start // 8:(end + 7) // 8])[start % 8:start % 8 + end - start]
+        return bits.reshape(y1 - y0, x1 - x0).astype(bool)
+
+    def dense(self, i):
+        """Unpack mask i as a full (height, width) boolean mask of the image."""
+        mask = zeros(self.image_size, dtype=bool)
+        x0, y0, x1, y1 = self.windows[i].tolist()
+        mask[y0:y1, x0:x1] = self.crop(i)
+        return mask
+
+    def label_map(self):
+        """Return the int32 map of the last instance covering each pixel, or -1, see annotation_renderer.label_map."""
+        labels = full(self.image_size, -1, dtype=int32)
+        for i, (x0, y0, x1, y1) in enumerate(self.windows.tolist()):
+            labels[y0:y1, x0:x1][self.crop(i)] = i
+        return labels
+
+    def select(self, keep):
+        """Return the masks selected by a boolean array or index array, without unpacking the others to dense."""
+        indices = arange(len(self))[keep]
+        pixels = unpackbits(self.bits, count=self.area).astype(bool)
+        owners = repeat(arange(len(self)), self.bit_offsets[1:] - self.bit_offsets[:-1])
+        selected = zeros(len(self), dtype=bool)
+        selected[indices] = True
+        return PackedMasks.from_pixels(self.image_size, self.windows[indices], pixels[selected[owners]])
+
+class CompactInstances:
+    """
+    Predictions of one image on the CPU, with packed masks, used in place of detectron2 Instances
+    from the model output to the contour extraction, the annotations and the prediction cache.
+    """
+
+    def __init__(self, image_size, boxes, scores, classes, masks):
+        """
+        Parameters:
+            image_size (tuple): (height, width) of the image.
+            boxes (numpy.ndarray): (N, 4) float32 (x0, y0, x1, y1) predicted boxes.
+            scores (numpy.ndarray): (N,) float32 confidence of each instance.
+            classes (numpy.ndarray): (N,) int32 class of each instance.
+            masks (PackedMasks): Masks of the instances.
+        """
+        self.image_size = (int(image_size[0]), int(image_size[1]))
+        self.boxes = boxes
+        self.scores = scores
+        self.classes = classes
+        self.masks = masks
+
+    def __len__(self):
+        return len(self.scores)
+
+    def select(self, keep):
+        """Return the instances selected by a boolean array or index array."""
+        return CompactInstances(self.image_size, self.boxes[keep], self.scores[keep], self.classes[keep], self.masks.select(keep))
+
+def pack_instances(instances, margin=CONTOUR_CROP_MARGIN):
+    """
+    Move detectron2 Instances to the CPU as CompactInstances.
+
+    The crop windows of the masks are gathered on the model device and copied in a single
+    transfer, so the pixels outside the boxes never leave it.
+
+    Parameters:
+        instances (Instances): Predictions of one image or tile, on any device.
+        margin (int): Pixels kept around each box.
+
+    Returns:
+        CompactInstances: The instances on the CPU.
+    """
+    boxes = instances.pred_boxes.tensor.to("cpu").numpy().astype(float32).reshape(-1, 4)
+    scores = instances.scores.to("cpu").numpy().astype(float32)
+    classes = instances.pred_classes.to("cpu").numpy().astype(int32)
+    masks = instances.pred_masks
+    windows = crop_windows(boxes, tuple(masks.shape[-2:]), margin)
+
+    crops = [masks[i, y0:y1, x0:x1].reshape(-1) for i, (x0, y0, x1, y1) in enumerate(windows.tolist())]
+    if not crops:
+        pixels = zeros(0, dtype=bool)
+    elif isinstance(masks, ndarray):  # Masks already in main memory
+        pixels = concatenate(crops)
+    else:
+        from torch import cat
+
+        pixels = cat(crops).to("cpu").numpy()
+    packed = PackedMasks.from_pixels(instances.image_size, windows, pixels.astype(bool, copy=False))
+    return CompactInstances(instances.image_size, boxes, scores, classes, packed)
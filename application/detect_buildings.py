@@ -1,13 +1,32 @@
 from os import path, listdir, makedirs
-from time import time
+from time import perf_counter, time
+from uuid import uuid4
 from warnings import filterwarnings
 
-from cv2 import findContours, RETR_EXTERNAL, CHAIN_APPROX_SIMPLE, imwrite, imread
-from numpy import uint8, array
-
-from detectron2.utils.visualizer import Visualizer, ColorMode
-from detectron2.engine import DefaultPredictor
-from detectron2.config import get_cfg
+from cv2 import findContours, RETR_EXTERNAL, CHAIN_APPROX_SIMPLE, imwrite, polylines
+from numpy import uint8, int32, array
+
+from predictor_registry import get_predictor, get_model_paths, select_device
+from quantization import validate_precision, DEFAULT_PRECISION
+from onnx_backend import validate_engine, onnx_model_path, metadata_path, require_onnx_model, DEFAULT_ENGINE
+from resolution_presets import validate_preset, DEFAULT_PRESET
+from batch_inference import predict_batch, DEFAULT_BATCH_SIZE
+from pipeline import PipelineStage, run_pipeline, merge_stage_statistics, format_stage_report, DEFAULT_QUEUE_SIZE
+from inference_pool import run_inference_pool
+from tiling import predict_tiled, DEFAULT_TILE_OVERLAP
+from compact_masks import mask_crop_window
+from instance_filter import (filter_instances, keep_scene_instance, validate_thresholds, empty_transfer_statistics,
+                             merge_transfer_statistics, format_transfer_report, DEFAULT_SCORE_THRESHOLD)
+from raster_source import open_raster
+from make_geometry import flatten_contours, build_mesh, imagery_mesh
+from export_feature import EXPORT_FORMATS, DEFAULT_EXPORT_FORMAT
+from mosaic_export import save_mesh, mesh_path, export_mosaic, DEFAULT_CHUNK_SIZE
+from annotation_renderer import render_instances_annotation, should_annotate, DEFAULT_ANNOTATION_SCALE
+from run_manifest import RunManifest
+from extract_log import ExtractLog, ImageTimer, summarize_records, format_timing_report
+from prediction_cache import (PredictionCache, file_digest, model_fingerprint, prediction_key, encode_predictions,
+                              decode_predictions, save_predictions, load_predictions, merge_cache_statistics,
+                              format_cache_report, DEFAULT_CACHE_FOLDER, DEFAULT_CACHE_MAX_BYTES)
 
 # Post-processing algorithm imports
 from post_processing import simplify_contours, smooth_contours, fill_holes, bounding_boxes, convex_hulls
@@ -25,9 +44,36 @@ POST_PROCESSING_ALGORITHMS = {
     "Convex Hulls": convex_hulls
 }
 
-def process_contours(mask, selected_algorithm):
+SCORE_THRESHOLD = DEFAULT_SCORE_THRESHOLD  # Default confidence below which detections are not exported
+SCENE_ANNOTATION_MAX_SIDE = 4096  # Longest side of the annotated image written for tiled scenes
+PREDICTIONS_SUFFIX = "_predictions.npz"  # Raw predictions stored next to the mesh files, replayed by re-export runs
+
+def warm_up_libraries():
+    """
+    Import the machine learning libraries used by an extraction ahead of time.
+
+    They are only imported on first use so the application starts quickly. Calling this in
+    the background while the user sets up a run hides the import cost of the first extraction.
+    """
+    import torch
+    import detectron2.engine
+
+def process_contours(mask, selected_algorithm, box=None, offset=(0, 0)):
+    """
+    Find the outer contours of an instance mask and apply the selected post-processing algorithm.
+
+    When the predicted box is given, only the mask inside the box (plus a small margin) is
+    scanned, so the cost depends on the size of the building rather than of the image.
+    The contour points are still in the coordinates of the full mask. Masks that are already
+    cropped, such as packed masks (see compact_masks), give the position of their crop as offset.
+    """
+    if box is not None:
+        x0, y0, x1, y1 = mask_crop_window(box, mask.shape)
+        mask = mask[y0:y1, x0:x1]
+        offset = (offset[0] + x0, offset[1] + y0)
+
     # Get contours from the mask
-    contours, _ = findContours(mask.astype(uint8), RETR_EXTERNAL, CHAIN_APPROX_SIMPLE)
+    contours, _ = findContours(mask.astype(uint8), RETR_EXTERNAL, CHAIN_APPROX_SIMPLE, offset=offset)
 
     # Apply the selected post-processing algorithm
     if selected_algorithm in POST_PROCESSING_ALGORITHMS:
@@ -37,24 +83,328 @@ def process_contours(mask, selected_algorithm):
 
     return contours
 
-def flatten_contours(contours):
+def render_image_features(img, instances, export_post_process_algorithm, annotation_scale=DEFAULT_ANNOTATION_SCALE, timer=None):
     """
-    Ensure that contours are laid flat on the XY plane
-    (by ensuring all Z values are zero, without additional rotations).
+    Render the annotated image and build the imagery/footprint meshes for one image's predictions.
+
+    Parameters:
+        img (numpy.ndarray): Image in BGR order, as read by OpenCV.
+        instances (CompactInstances): Predicted instances for the image, already filtered by score (see instance_filter.filter_instances).
+        export_post_process_algorithm (str): Selected post-processing algorithm.
+        annotation_scale (float): Scale of the annotated image relative to the input, None to skip it.
+        timer (ImageTimer): Times the "annotation" and "contours" stages of the image, when given.
+
+    Returns:
+        dict: The annotated BGR image ("annotated", None when skipped), and the imagery and footprint meshes ("imagery", "footprints", see make_geometry).
     """
-    flattened_contours = []
-    for contour in contours:
-        # Ensure that all Z values are 0, leaving the contour in its original orientation
-        flattened_contour = []
-        for pt in contour:
-            # Simply set the Z coordinate to 0 to lay it flat on the XY plane
-            flattened_contour.append([pt[0][0], pt[0][1], 0])
-
-        flattened_contours.append(array(flattened_contour))
-    
-    return flattened_contours
+    timer = timer or ImageTimer(None)
+
+    # Visualize predictions
+    annotated = None
+    if annotation_scale is not None:
+        with timer.measure("annotation"):
+            annotated = render_instances_annotation(img, instances, annotation_scale)
+
+    # Process building footprints
+    contour_groups = []
+    with timer.measure("contours"):
+        for i, window in enumerate(instances.masks.windows.tolist()):
+            # Process contours with the selected algorithm, each packed mask only holding the area around its predicted box
+            processed_contours = process_contours(instances.masks.crop(i), export_post_process_algorithm, offset=tuple(window[:2]))
+
+            # Flatten the contours to ensure they lie flat on the XY plane (Z = 0)
+            contour_groups.append(flatten_contours(processed_contours))
+        footprints = build_mesh(contour_groups)
+
+    height, width, _ = img.shape
+    return {
+        "annotated": annotated,
+        "imagery": imagery_mesh(width, height),
+        "footprints": footprints,
+    }
+
+def render_scene_features(source, scene_instances, export_post_process_algorithm, annotation_scale=DEFAULT_ANNOTATION_SCALE, timer=None):
+    """
+    Render the annotated image and build the imagery/footprint meshes for a tiled scene.
+
+    The footprint outlines are drawn on a preview of the scene downscaled to at most
+    SCENE_ANNOTATION_MAX_SIDE pixels, so large scenes are never held in memory in full.
+
+    Parameters:
+        source (RasterSource): The scene the instances were detected in.
+        scene_instances (list): SceneInstances detected by predict_tiled.
+        export_post_process_algorithm (str): Selected post-processing algorithm.
+        annotation_scale (float): Scale of the annotated image relative to the scene (capped by SCENE_ANNOTATION_MAX_SIDE), None to skip it.
+        timer (ImageTimer): Times the "annotation" and "contours" stages of the scene, when given.
+
+    Returns:
+        dict: The annotated BGR image ("annotated", None when skipped), and the imagery and footprint meshes ("imagery", "footprints", see make_geometry).
+    """
+    timer = timer or ImageTimer(None)
+    height, width = source.height, source.width
+    annotated = None
+    if annotation_scale is not None:
+        with timer.measure("annotation"):
+            annotated = source.read_preview(min(SCENE_ANNOTATION_MAX_SIDE, round(max(height, width) * annotation_scale)))
+        annotation_scale = annotated.shape[1] / width
+
+    contour_groups = []
+    for instance in scene_instances:
+        with timer.measure("contours"):
+            # Contours are found in the box-cropped mask, then moved back to scene coordinates
+            processed_contours = process_contours(instance.mask, export_post_process_algorithm)
+            offset = array([instance.box[0], instance.box[1]])
+            scene_contours = [contour + offset for contour in processed_contours]
+            contour_groups.append(flatten_contours(scene_contours))
+
+        if annotated is not None:
+            with timer.measure("annotation"):
+                outlines = [(contour.reshape(-1, 2) * annotation_scale).astype(int32) for contour in scene_contours]
+                polylines(annotated, outlines, isClosed=True, color=(0, 255, 0), thickness=1)
+
+    with timer.measure("contours"):
+        footprints = build_mesh(contour_groups)
+    return {
+        "annotated": annotated,
+        "imagery": imagery_mesh(width, height),
+        "footprints": footprints,
+    }
+
+def write_image_features(image_file, rendered, output_2d_folder, output_3d_folder, export_format=DEFAULT_EXPORT_FORMAT, timer=None):
+    """
+    Save the annotated image and the imagery/footprint meshes rendered by render_image_features.
+
+    Parameters:
+        image_file (str): File name of the processed image.
+        rendered (dict): Output of render_image_features.
+        output_2d_folder (str): Path to the output folder for 2D annotated images.
+        output_3d_folder (str): Path to the output folder for 3D mesh files.
+        export_format (str): Mesh file format, one of EXPORT_FORMATS.
+        timer (ImageTimer): Times the write of each file, when given.
 
-def extract_features(model_selection, extract_feature, input_folder, output_2d_folder, output_3d_folder, export_post_process_algorithm, progressbar,feedback_label):
+    Returns:
+        list: Paths of the files written.
+    """
+    timer = timer or ImageTimer(None)
+    name = path.splitext(image_file)[0]
+    writers = EXPORT_FORMATS[export_format]
+    annotated_path = path.join(output_2d_folder, f"{name}_annotated.jpg")
+    imagery_path = path.join(output_3d_folder, f"{name}_imagery{writers['extension']}")
+    footprints_path = path.join(output_3d_folder, f"{name}_footprints{writers['extension']}")
+    written = [imagery_path, footprints_path]
+
+    # Save annotated image, unless annotations were skipped for this image
+    if rendered["annotated"] is not None:
+        with timer.measure("write_annotated"):
+            imwrite(annotated_path, rendered["annotated"])
+        written.insert(0, annotated_path)
+
+    # Write the big polygon to a separate mesh file
+    with timer.measure("write_imagery"):
+        writers["mesh"](imagery_path, *rendered["imagery"], name=f"{name}_imagery")
+
+    # Write to a single mesh file for building footprints, one object per building
+    with timer.measure("write_footprints"):
+        writers["buildings"](footprints_path, *rendered["footprints"], name_prefix=f"{name}_building")
+
+    return written
+
+def predictions_path(output_3d_folder, image_file):
+    """Return the path of the stored raw predictions of an image."""
+    return path.join(output_3d_folder, path.splitext(image_file)[0] + PREDICTIONS_SUFFIX)
+
+def export_image_features(image_file, img, outputs, output_2d_folder, output_3d_folder, export_post_process_algorithm, export_format=DEFAULT_EXPORT_FORMAT, score_threshold=SCORE_THRESHOLD, class_thresholds=None):
+    """Save the annotated image and the imagery/footprint mesh files for one image's predictions."""
+    instances = filter_instances(outputs["instances"], score_threshold, class_thresholds)
+    rendered = render_image_features(img, instances, export_post_process_algorithm)
+    write_image_features(image_file, rendered, output_2d_folder, output_3d_folder, export_format)
+
+def process_image_files(load_predictor, image_files, input_folder, output_2d_folder, output_3d_folder, export_post_process_algorithm, batch_size=DEFAULT_BATCH_SIZE, on_image_done=None, queue_size=DEFAULT_QUEUE_SIZE, tile_size=None, tile_overlap=DEFAULT_TILE_OVERLAP, cache_folder=None, cache_max_bytes=DEFAULT_CACHE_MAX_BYTES, model_digest=None, reexport=False, manifest_settings=None, annotation_scale=DEFAULT_ANNOTATION_SCALE, annotate_every=1, export_format=DEFAULT_EXPORT_FORMAT, mosaic=False, score_threshold=SCORE_THRESHOLD, class_thresholds=None, precision=DEFAULT_PRECISION, engine=DEFAULT_ENGINE, preset=DEFAULT_PRESET, timing_run=None):
+    """
+    Run inference and export the features of the given image files.
+
+    The work is split into a prefetching reader, the inference stage, a post-processing
+    stage and a writer, each on its own thread and joined by bounded queues, so the model
+    keeps running while other images are decoded, post-processed and written.
+
+    The raw predictions of every image are stored next to its mesh files. In re-export mode
+    the model is skipped and those stored predictions are post-processed and exported again.
+
+    Parameters:
+        load_predictor (callable): Returns the predictor, only called when an image actually needs inference. None in re-export mode.
+        image_files (list): File names of the images to process.
+        input_folder (str): Path to the input folder containing images.
+        output_2d_folder (str): Path to the output folder for 2D annotated images.
+        output_3d_folder (str): Path to the output folder for 3D mesh files.
+        export_post_process_algorithm (str): Selected post-processing algorithm.
+        batch_size (int): Number of images run through the model in a single forward pass.
+        on_image_done (callable): Called with the file name of each image once its outputs are written.
+        queue_size (int): Maximum number of images waiting between two adjacent stages.
+        tile_size (int): When set, each image is treated as a scene and run through the model in overlapping tiles of this size.
+        tile_overlap (int): Overlap between adjacent tiles in pixels.
+        cache_folder (str): Folder of the prediction cache, or None to always run the model.
+        cache_max_bytes (int): Size cap of the prediction cache.
+        model_digest (str): Fingerprint of the model weights and config, part of the cache keys.
+        reexport (bool): Replay the post-processing and export from the stored predictions instead of running the model.
+        manifest_settings (dict): Settings of the run, when set each completed image is recorded in the run manifest of output_3d_folder.
+        annotation_scale (float): Scale of the annotated images relative to the inputs.
+        annotate_every (int): Only write an annotated image for every annotate_every-th image, none when 0.
+        export_format (str): Mesh file format of the imagery and footprints, one of EXPORT_FORMATS.
+        mosaic (bool): Also store the footprint mesh of each image, for export_mosaic.
+        score_threshold (float): Detections below this confidence are dropped before leaving the model device.
+        class_thresholds (dict): Minimum confidence per class id, overriding score_threshold for that class.
+        precision (str): Precision of the model returned by load_predictor, part of the cache keys.
+        engine (str): Inference engine of the model returned by load_predictor, part of the cache keys.
+        preset (str): Resolution preset of the model returned by load_predictor, part of the cache keys.
+        timing_run (str): Id of the extraction run, when set the stage timings of each image are appended to the extract log of output_3d_folder.
+
+    Returns:
+        dict: Per-stage utilisation statistics ("stages"), prediction cache statistics ("cache") and device transfer statistics ("transfer").
+    """
+    cache = PredictionCache(cache_folder, cache_max_bytes) if cache_folder else None
+    manifest = RunManifest(output_3d_folder, manifest_settings) if manifest_settings is not None else None
+    extract_log = ExtractLog(output_3d_folder, timing_run) if timing_run is not None else None
+    image_indices = {image_file: index for index, image_file in enumerate(image_files)}
+    class_thresholds = validate_thresholds(score_threshold, class_thresholds)
+    transfer_statistics = empty_transfer_statistics()
+    # Cached predictions are filtered, so the thresholds are part of the key. Class thresholds only when
+    # set, which keeps the keys of runs without them unchanged.
+    cache_settings = {"score_threshold": score_threshold, "tile_size": tile_size, "tile_overlap": tile_overlap if tile_size else None}
+    if class_thresholds:
+        cache_settings["class_thresholds"] = sorted(class_thresholds.items())
+    if precision != DEFAULT_PRECISION:
+        cache_settings["precision"] = precision  # Quantized models predict slightly differently
+    if engine != DEFAULT_ENGINE:
+        cache_settings["engine"] = engine  # So do exported ones, within a pixel
+    if preset != DEFAULT_PRESET:
+        cache_settings["preset"] = preset
+
+    def apply_thresholds(instances):
+        # Stored and cached predictions are compact already, and may predate the current thresholds
+        if isinstance(instances, list):
+            return [instance for instance in instances if keep_scene_instance(instance, score_threshold, class_thresholds)]
+        return filter_instances(instances, score_threshold, class_thresholds)
+
+    def read_image(image_file):
+        # Whole images are decoded here, tiled scenes are only opened and read one tile at a time
+        print(f"Processing image: {image_file}")
+        image_path = path.join(input_folder, image_file)
+        timer = ImageTimer(image_file)
+        item = {"image_file": image_file, "cache_key": None, "instances": None, "cached": False, "timer": timer}
+        tiled = bool(tile_size)
+
+        if reexport:
+            # Stored predictions are re-exported as they were made, whole-image or tiled
+            with timer.measure("load_predictions"):
+                stored = load_predictions(predictions_path(output_3d_folder, image_file))
+            with timer.measure("filtering"):
+                item["instances"] = apply_thresholds(stored)
+            tiled = isinstance(item["instances"], list)
+        elif cache is not None:
+            # Serve the predictions from the cache when neither the pixels nor the model changed
+            with timer.measure("cache_lookup"):
+                item["cache_key"] = prediction_key(file_digest(image_path), model_digest, cache_settings)
+                cached_arrays = cache.get(item["cache_key"])
+            if cached_arrays is not None:
+                with timer.measure("filtering"):
+                    item["instances"] = apply_thresholds(decode_predictions(cached_arrays))
+                item["cached"] = True
+
+        item["tiled"] = tiled
+        with timer.measure("decode"):
+            source = open_raster(image_path)
+            if tiled:
+                item["image"] = source
+            else:
+                item["image"] = source.read()
+                source.close()
+        return item
+
+    def infer(batch):
+        # Perform inference on the images missing from the cache in one forward pass
+        uncached = [item for item in batch if item["instances"] is None]
+        if uncached:
+            predictor = load_predictor()
+            start = perf_counter()
+            batch_outputs = predict_batch(predictor, [item["image"] for item in uncached])
+            seconds = perf_counter() - start
+            for item, outputs in zip(uncached, batch_outputs):
+                item["timer"].add("inference", seconds / len(uncached))  # Shared evenly by the images of the batch
+                # Only the confident detections are moved off the model device
+                with item["timer"].measure("filtering"):
+                    item["instances"] = filter_instances(outputs["instances"], score_threshold, class_thresholds, transfer_statistics)
+        return batch
+
+    def infer_tiled(item):
+        # Batches are made of tiles of a single scene rather than of whole images
+        if item["instances"] is None:
+            predictor = load_predictor()
+            # Tiles are read, run and filtered in turn, all timed as inference
+            with item["timer"].measure("inference"):
+                item["instances"] = predict_tiled(predictor, item["image"], tile_size, tile_overlap, batch_size, score_threshold,
+                                                  class_thresholds=class_thresholds, statistics=transfer_statistics)
+        return item
+
+    def post_process(item):
+        if cache is not None and item["cache_key"] is not None and not item["cached"]:
+            with item["timer"].measure("cache_store"):
+                cache.put(item["cache_key"], encode_predictions(item["instances"]))
+
+        scale = annotation_scale if should_annotate(image_indices[item["image_file"]], annotate_every) else None
+        if item["tiled"]:
+            with item["image"] as source:
+                item["rendered"] = render_scene_features(source, item["instances"], export_post_process_algorithm, scale,
+                                                         timer=item["timer"])
+        else:
+            item["rendered"] = render_image_features(item["image"], item["instances"], export_post_process_algorithm, scale,
+                                                     timer=item["timer"])
+        item["timer"].record["instances"] = len(item["instances"])
+        item["timer"].record["vertices"] = len(item["rendered"]["footprints"][0])
+        item["image"] = None  # Release the pixels before the item waits for the writer
+        return item
+
+    def write(item):
+        image_file = item["image_file"]
+        timer = item["timer"]
+        output_files = write_image_features(image_file, item["rendered"], output_2d_folder, output_3d_folder, export_format,
+                                            timer=timer)
+        stored_predictions = predictions_path(output_3d_folder, image_file)
+        if not reexport:
+            with timer.measure("write_predictions"):
+                save_predictions(stored_predictions, item["instances"])
+        output_files.append(stored_predictions)
+        if mosaic:
+            stored_mesh = mesh_path(output_3d_folder, image_file)
+            with timer.measure("write_mesh"):
+                save_mesh(stored_mesh, item["rendered"])
+            output_files.append(stored_mesh)
+
+        # The image only counts as completed once every output is on disk
+        if manifest is not None:
+            with timer.measure("write_manifest"):
+                manifest.record(image_file, output_files)
+        if extract_log is not None:
+            extract_log.record(timer, cached=item["cached"], tiled=item["tiled"])
+        print(f"Succesfully extracted features: {image_file}\n")
+
+        if on_image_done is not None:
+            on_image_done(image_file)
+
+    # Re-export runs have no inference stage, the reader already loads the stored predictions
+    stages = [PipelineStage("read", read_image)]
+    if tile_size and not reexport:
+        stages.append(PipelineStage("inference", infer_tiled))
+    elif not reexport:
+        stages.append(PipelineStage("inference", infer, batch_size=batch_size))
+    stages += [
+        PipelineStage("post-process", post_process),
+        PipelineStage("write", write),
+    ]
+    statistics = run_pipeline(image_files, stages, queue_size)
+    print(format_stage_report(statistics))
+    return {"stages": statistics, "cache": cache.statistics() if cache is not None else None, "transfer": transfer_statistics}
+
+def extract_features(model_selection, extract_feature, input_folder, output_2d_folder, output_3d_folder, export_post_process_algorithm, progressbar=None, feedback_label=None, registry=None, batch_size=DEFAULT_BATCH_SIZE, device=None, num_workers=1, threads_per_worker=None, queue_size=DEFAULT_QUEUE_SIZE, tile_size=None, tile_overlap=DEFAULT_TILE_OVERLAP, cache_folder=DEFAULT_CACHE_FOLDER, cache_max_bytes=DEFAULT_CACHE_MAX_BYTES, reexport_only=False, resume=False, on_progress=None, annotation_scale=DEFAULT_ANNOTATION_SCALE, annotate_every=1, export_format=DEFAULT_EXPORT_FORMAT, mosaic=False, mosaic_chunk_size=DEFAULT_CHUNK_SIZE, score_threshold=SCORE_THRESHOLD, class_thresholds=None, precision=DEFAULT_PRECISION, engine=DEFAULT_ENGINE, preset=DEFAULT_PRESET):
     """
     Perform feature extraction from satellite images based on the selected model and feature type.
     
@@ -63,35 +413,64 @@ def extract_features(model_selection, extract_feature, input_folder, output_2d_f
         extract_feature (str): The feature to extract.
         input_folder (str): Path to the input folder containing images.
         output_2d_folder (str): Path to the output folder for 2D annotated images.
-        output_3d_folder (str): Path to the output folder for 3D OBJ files.
+        output_3d_folder (str): Path to the output folder for 3D mesh files.
         export_post_process_algorithm (str): Selected post-processing algorithm.
-        progressbar (CTkProgressBar): Progress bar to update during processing.
-        feedback_label (CTkLabel): Label to display feedback messages upon completion of extraction.
+        progressbar (CTkProgressBar): Optional progress bar to update during processing.
+        feedback_label (CTkLabel): Optional label to display feedback messages upon completion of extraction.
+        registry (PredictorRegistry): Optional predictor registry, defaults to the shared process-wide registry.
+        batch_size (int): Number of images run through the model in a single forward pass.
+        device (str): Device to run the model on, picked automatically (GPU if available) when None.
+        num_workers (int): Number of worker processes, each holding its own model. 1 runs in this process.
+        threads_per_worker (int): Torch/OpenCV threads per worker process, defaults to an even share of the CPU cores.
+        queue_size (int): Maximum number of images waiting between two adjacent pipeline stages.
+        tile_size (int): Enables tiling mode for large scenes: each image is run through the model in overlapping tiles of this size.
+        tile_overlap (int): Overlap between adjacent tiles in pixels, should exceed the size of most buildings.
+        cache_folder (str): Folder of the on-disk prediction cache, None disables the cache.
+        cache_max_bytes (int): Size cap of the prediction cache, least recently used entries are evicted beyond it.
+        reexport_only (bool): Skip the model and re-export the predictions stored by a previous run with the selected post-processing algorithm.
+        resume (bool): Skip the images an interrupted run with the same settings already completed, according to its run manifest.
+        on_progress (callable): Called with a dict (image, completed, total, remaining_seconds) after each image, for headless callers.
+        annotation_scale (float): Scale of the annotated 2D images relative to the inputs, lower is faster.
+        annotate_every (int): Only write an annotated 2D image for every annotate_every-th image (per worker), none when 0.
+        export_format (str): Mesh file format of the imagery and footprints: "OBJ", "GLB" (binary glTF) or "PLY" (binary).
+        mosaic (bool): Also assemble the footprints of all images into a city mosaic with levels of detail, see mosaic_export.export_mosaic.
+        mosaic_chunk_size (int): Side of the finest mosaic chunks in pixels of the input images.
+        score_threshold (float): Detections below this confidence are not exported.
+        class_thresholds (dict): Minimum confidence per class id (0 to NUM_CLASSES - 1), overriding score_threshold for that class.
+        precision (str): "fp32", or "int8" to run a dynamically quantized model on the CPU, faster on CPU-only nodes at a small accuracy cost (see quantization).
+        engine (str): "pytorch", or "onnx" to run the ONNX export of the model with ONNX Runtime on the CPU (see onnx_backend).
+        preset (str): Resolution preset trading detail for speed, "fast", "balanced" (the model config) or "accurate" (see resolution_presets).
+
+    Returns:
+        dict: Summary of the run: number of images processed ("images"), duration ("seconds"), pipeline stage statistics ("stages"), cache statistics ("cache") and device transfer statistics ("transfer") and per-stage image timings ("timings", see extract_log.summarize_records).
     """
     
-    # Configure model weights based on selection
-    if model_selection == 1:
-        MODEL_WEIGHTS_PATH = "./prebuilt_detect_models/model_roboflow_default_2k_iter/model_trained_default_set.pth"
-        CONFIG_FILE_PATH = "./config/mask_rcnn_R_101_FPN_3x_2k_iter.yaml"  # Local path to the config file
-    elif model_selection == 2:
-        MODEL_WEIGHTS_PATH = "./prebuilt_detect_models/model_roboflow_optimized_5k_iter/model_optimized_5k_iter.pth"
-        CONFIG_FILE_PATH = "./config/mask_rcnn_R_101_FPN_3x_5k_iter.yaml"  # Local path to the config file
-    else:
-        MODEL_WEIGHTS_PATH = "./prebuilt_detect_models/model_roboflow_default_2k_iter/model_trained_default_set.pth"
-        CONFIG_FILE_PATH = "./config/mask_rcnn_R_101_FPN_3x_5k_iter.yaml"  # Local path to the config file
-
-    NUM_CLASSES = 3  # Adjust based on your model's training
     print(f"Extracting features for: {extract_feature}")
-
-    # Set up configuration for inference
-    cfg = get_cfg()
-    cfg.MODEL.DEVICE = "cuda"  # or "cpu" if GPU is unavailable
-    cfg.merge_from_file(CONFIG_FILE_PATH)
-    cfg.MODEL.WEIGHTS = MODEL_WEIGHTS_PATH  # Set the model weights path
-    cfg.MODEL.ROI_HEADS.NUM_CLASSES = NUM_CLASSES  # Set the number of classes
-
-    # Initialize the predictor
-    predictor = DefaultPredictor(cfg)
+    if export_format not in EXPORT_FORMATS:
+        raise ValueError(f"Unknown export format: {export_format}")
+    class_thresholds = validate_thresholds(score_threshold, class_thresholds)
+    precision = validate_precision(precision)
+    engine = validate_engine(engine)
+    if engine == "onnx" and precision != DEFAULT_PRECISION:
+        raise ValueError("The ONNX engine runs the exported FP32 model, INT8 precision needs the PyTorch engine.")
+    preset = validate_preset(preset)
+    if engine == "onnx" and preset != DEFAULT_PRESET:
+        raise ValueError("The ONNX engine runs the model at the resolution it was exported with, other presets need the PyTorch engine.")
+
+    if not reexport_only and engine == "onnx":
+        # ONNX Runtime runs on the CPU, and doesn't need PyTorch to pick the device
+        if device not in (None, "cpu"):
+            print(f"The ONNX engine runs on the CPU, ignoring the requested device {device}.")
+        device = "cpu"
+        print(f"Running inference on device: {device} (onnx)")
+    elif not reexport_only:
+        if precision == "int8":
+            # Quantized kernels only exist for the CPU
+            if device not in (None, "cpu"):
+                print(f"INT8 inference runs on the CPU, ignoring the requested device {device}.")
+            device = "cpu"
+        device = select_device(device)
+        print(f"Running inference on device: {device} ({precision}, {preset} preset)")
 
     # Create output folders. Replace with custom paths later.
     output_folder = output_2d_folder
@@ -100,101 +479,75 @@ def extract_features(model_selection, extract_feature, input_folder, output_2d_f
     makedirs(obj_folder, exist_ok=True)
 
     # Check for input images
-    if len(listdir(input_folder)) == 0:
+    image_files = listdir(input_folder)
+    if len(image_files) == 0:
         raise ValueError("No input images found in the specified folder.")
 
+    if reexport_only:
+        # Only images with predictions stored by a previous run can be re-exported
+        missing = [image_file for image_file in image_files if not path.isfile(predictions_path(output_3d_folder, image_file))]
+        for image_file in missing:
+            print(f"Warning: no stored predictions for {image_file}, skipping it. Run a full extraction to process it.")
+        image_files = [image_file for image_file in image_files if image_file not in missing]
+        if len(image_files) == 0:
+            raise ValueError("No stored predictions found in the 3D output folder. Run a full extraction first.")
+
+    # Completed images are recorded in the run manifest of the 3D output folder
+    manifest_settings = {"model": model_selection, "feature": extract_feature,
+                         "post_processing": export_post_process_algorithm, "tile_size": tile_size, "format": export_format,
+                         "mosaic": mosaic, "score_threshold": score_threshold,
+                         "class_thresholds": {str(class_id): threshold for class_id, threshold in sorted(class_thresholds.items())},
+                         "precision": precision}
+    if engine != DEFAULT_ENGINE:
+        manifest_settings["engine"] = engine  # Manifests of PyTorch runs stay resumable
+    if preset != DEFAULT_PRESET:
+        manifest_settings["preset"] = preset
+    manifest = RunManifest(output_3d_folder, manifest_settings)
+    # Per-image stage timings of the run, streamed to the extract log of the 3D output folder
+    run_id = uuid4().hex
+    extract_log = ExtractLog(output_3d_folder, run_id)
+    mosaic_files = list(image_files)  # Resumed runs still assemble the mosaic from every image
+    if resume:
+        # Images with missing or partly written outputs are not in the completed set, so they are done again
+        completed = manifest.completed_images()
+        image_files = [image_file for image_file in image_files if image_file not in completed]
+        print(f"Resuming run: {len(completed)} images already completed, {len(image_files)} left.")
+        if len(image_files) == 0:
+            if progressbar is not None:
+                progressbar.set(1)
+            if feedback_label is not None:
+                feedback_label.configure(text="✅ All images were already extracted by the previous run.", font=("Arial", 16), text_color="green")
+            if mosaic:
+                export_mosaic(mosaic_files, output_3d_folder, input_folder, export_format, mosaic_chunk_size)
+            return {"images": 0, "seconds": 0.0, "stages": None, "cache": None, "transfer": None, "timings": None}
+    else:
+        manifest.reset()
+        extract_log.reset()
+
     # Start time for prediction
     start_time = time()
 
-    count_of_images = len(listdir(input_folder))
-    weight_per_image = 1 / count_of_images
-    progress_value = 0  # start progress from 0
-    
+    count_of_images = len(image_files)
     count_of_extracted = 0 # count of images processed
-    
-    # Iterate over each image file in the folder
-    for image_file in listdir(input_folder):
+
+    def update_progress(image_file):
+        """Report progress through the callback, progress bar and feedback label after an image is processed."""
+        nonlocal count_of_extracted
         count_of_extracted += 1
-        print(f"Processing image: {image_file}")
-        image_path = path.join(input_folder, image_file)
-        img = imread(image_path)
-
-        # Perform inference
-        outputs = predictor(img)
-
-        # Visualize and save predictions
-        visualizer = Visualizer(img[:, :, ::-1], metadata=None, scale=0.8, instance_mode=ColorMode.IMAGE_BW)
-        out = visualizer.draw_instance_predictions(outputs["instances"].to("cpu"))
-
-        # Save annotated image
-        output_path = path.join(output_2d_folder, f"{path.splitext(image_file)[0]}_annotated.jpg")
-        imwrite(output_path, out.get_image()[:, :, ::-1])  # Convert RGB to BGR for OpenCV and save
-
-        # Create .obj file for all detected buildings in this image
-        instances = outputs["instances"].to("cpu")
-        masks = instances.pred_masks.numpy()
-
-        vertices = []  # To hold all vertices for this image
-        obj_faces = []  # To hold all face definitions for this image
-        vertex_index = 1  # Start vertex indexing at 1 for OBJ format
-
-        # Add the big polygon that spans the entire image
-        height, width, _ = img.shape
-        big_polygon = [
-            [0, 0, 0],
-            [width, 0, 0],
-            [width, height, 0],
-            [0, height, 0]
-        ]
-        big_polygon_vertices = [f"v {pt[0]} {pt[1]} {pt[2]}" for pt in big_polygon]
-        big_polygon_faces = [f"f {vertex_index} {vertex_index+1} {vertex_index+2} {vertex_index+3}"]
-
-        # Write the big polygon to a separate .obj file
-        big_polygon_filename = f"{path.splitext(image_file)[0]}_imagery.obj"
-        big_polygon_file_path = path.join(obj_folder, big_polygon_filename)
-
-        with open(big_polygon_file_path, 'w') as big_polygon_file:
-            big_polygon_file.write("\n".join(big_polygon_vertices) + "\n")
-            big_polygon_file.write("\n".join(big_polygon_faces) + "\n")
-
-        # Process building footprints
-        for i in range(len(instances)):
-            if instances.scores[i] >= 0.5:  # Filter out low-confidence detections
-                mask = masks[i]
-                # Fetch the selected algorithm from the user interface 
-                selected_algorithm = export_post_process_algorithm
-                
-                # Process contours with the selected algorithm
-                processed_contours = process_contours(mask, selected_algorithm)
-
-                # Step 2: Flatten the contours to ensure they lie flat on the XY plane (Z = 0)
-                flattened_contours = flatten_contours(processed_contours)
-
-                for contour in flattened_contours:
-                    # For each contour, create a single ngon
-                    face = "f " + " ".join(str(vertex_index + idx) for idx in range(len(contour)))
-                    obj_faces.append(face)
-
-                    # Add vertices for the current contour
-                    for pt in contour:
-                        vertices.append(f"v {pt[0]} {pt[1]} 0")  # Set Z to 0
-
-                    vertex_index += len(contour)
-
-        # Write to a single .obj file for building footprints
-        footprints_filename = f"{path.splitext(image_file)[0]}_footprints.obj"
-        footprints_file_path = path.join(obj_folder, footprints_filename)
-
-        with open(footprints_file_path, 'w') as footprints_file:
-            footprints_file.write("\n".join(vertices) + "\n")
-            footprints_file.write("\n".join(obj_faces) + "\n")
-        
-        print(f"Succesfully extracted features: {image_file}\n")
+        progress_value = count_of_extracted / count_of_images
+        elapsed_time = time() - start_time
+        estimated_total_time = elapsed_time / progress_value
+        remaining_time = estimated_total_time - elapsed_time
+
+        if on_progress is not None:
+            on_progress({"image": image_file, "completed": count_of_extracted, "total": count_of_images,
+                         "remaining_seconds": remaining_time})
+        if progressbar is not None:
+            progressbar.set(progress_value) 
+        if feedback_label is None:
+            return
         
-        progress_value += weight_per_image
-        progressbar.set(progress_value) 
-        
-        if progress_value >= 1.0:   
+        if count_of_extracted >= count_of_images:   
             feedback_label.configure(
                 text="✅ Extraction Completed Successfully!\nNext Steps:\n1. Validate output 2D and 3D files manually.\n2. Re-run tool using available configurations below.\n3. Use the exported data for 3D visualization in Blender.",
                 font=("Arial", 16),
@@ -203,13 +556,70 @@ def extract_features(model_selection, extract_feature, input_folder, output_2d_f
             ) 
         else:
             # Display feedback message
-            elapsed_time = time() - start_time
-            estimated_total_time = elapsed_time / progress_value
-            remaining_time = estimated_total_time - elapsed_time
             feedback_label.configure(
                 text=f"🚀 Extracted {count_of_extracted} images out of {count_of_images}.\nEstimated remaining time: {remaining_time:.2f} seconds.",
                 font=("Arial", 18),
             )
 
-
-    print(f"=====\nSUCCESS:Extracted features of type {extract_feature} from {len(listdir(input_folder))} images in {time()-start_time:.2f} seconds.\n=====")
+    # Pipeline options shared by the single-process and worker pool modes
+    options = {"batch_size": batch_size, "queue_size": queue_size, "tile_size": tile_size, "tile_overlap": tile_overlap,
+               "cache_folder": cache_folder, "cache_max_bytes": cache_max_bytes, "manifest_settings": manifest_settings,
+               "annotation_scale": annotation_scale, "annotate_every": annotate_every, "export_format": export_format,
+               "mosaic": mosaic, "score_threshold": score_threshold, "class_thresholds": class_thresholds,
+               "precision": precision, "engine": engine, "preset": preset, "timing_run": run_id}
+    if cache_folder and not reexport_only:
+        weights_path, config_path = get_model_paths(model_selection)
+        model_files = ()
+        if engine == "onnx":
+            # The ONNX export makes the predictions, and can be exported again from unchanged weights
+            onnx_path = onnx_model_path(weights_path)
+            require_onnx_model(onnx_path)
+            model_files = (onnx_path, metadata_path(onnx_path))
+        options["model_digest"] = model_fingerprint(weights_path, config_path, *model_files)
+
+    if reexport_only:
+        # Post-processing and export only, which is fast enough to run in this process
+        statistics = process_image_files(None, image_files, input_folder, output_2d_folder, output_3d_folder,
+                                         export_post_process_algorithm, on_image_done=update_progress, queue_size=queue_size, reexport=True,
+                                         manifest_settings=manifest_settings, annotation_scale=annotation_scale,
+                                         annotate_every=annotate_every, export_format=export_format, mosaic=mosaic,
+                                         score_threshold=score_threshold, class_thresholds=class_thresholds, timing_run=run_id)
+        stage_statistics = statistics["stages"]
+        cache_statistics = transfer_statistics = None
+    elif num_workers > 1:
+        # Shard the input folder across worker processes, each loading its own copy of the model
+        shard_args = (model_selection, device, input_folder, output_2d_folder, output_3d_folder, export_post_process_algorithm, options)
+        worker_statistics = run_inference_pool(image_files, shard_args, num_workers, threads_per_worker, on_image_done=update_progress)
+        stage_statistics = merge_stage_statistics([statistics["stages"] for statistics in worker_statistics])
+        print(format_stage_report(stage_statistics))
+        cache_statistics = [statistics["cache"] for statistics in worker_statistics if statistics["cache"]]
+        cache_statistics = merge_cache_statistics(cache_statistics) if cache_statistics else None
+        transfer_statistics = merge_transfer_statistics([statistics["transfer"] for statistics in worker_statistics])
+    else:
+        # The predictor comes from the shared registry, and is only loaded once an image misses the cache
+        def load_predictor():
+            return get_predictor(model_selection, device=device, registry=registry, precision=precision, engine=engine,
+                                 preset=preset)
+
+        statistics = process_image_files(load_predictor, image_files, input_folder, output_2d_folder, output_3d_folder,
+                                         export_post_process_algorithm, on_image_done=update_progress, **options)
+        stage_statistics = statistics["stages"]
+        cache_statistics = statistics["cache"]
+        transfer_statistics = statistics["transfer"]
+
+    if cache_statistics is not None:
+        print(format_cache_report(cache_statistics))
+    if transfer_statistics is not None and transfer_statistics["instances"]:
+        print(format_transfer_report(transfer_statistics))
+
+    if mosaic:
+        # Needs the footprints of every image, so it runs once all workers are done
+        export_mosaic(mosaic_files, output_3d_folder, input_folder, export_format, mosaic_chunk_size)
+
+    timings = summarize_records(extract_log.records())
+    print(format_timing_report(timings))
+
+    duration = time() - start_time
+    print(f"=====\nSUCCESS:Extracted features of type {extract_feature} from {count_of_images} images in {duration:.2f} seconds.\n=====")
+    return {"images": count_of_images, "seconds": duration, "stages": stage_statistics, "cache": cache_statistics,
+            "transfer": transfer_statistics, "timings": timings}
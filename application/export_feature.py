@@ -1 +1,206 @@
-# Logic on how to convert model export data to FBX or GeoJSON format.
\ No newline at end of file
+# Logic on how to convert model export data to binary glTF (GLB) or PLY meshes, written straight from NumPy buffers.
+from contextlib import contextmanager
+from json import dumps
+from os import getpid, remove, replace
+from struct import pack
+from threading import get_ident
+
+from numpy import arange, asarray, ascontiguousarray, cumsum, repeat, zeros, float32, uint8, uint16, uint32
+
+from make_geometry import triangulate_mesh
+from obj_writer import write_mesh_obj, write_buildings_obj
+
+# glTF constants, see the glTF 2.0 specification
+GLB_MAGIC = 0x46546C67  # "glTF"
+GLB_JSON_CHUNK = 0x4E4F534A  # "JSON"
+GLB_BIN_CHUNK = 0x004E4942  # "BIN\0"
+GLTF_FLOAT = 5126
+GLTF_UNSIGNED_SHORT = 5123
+GLTF_UNSIGNED_INT = 5125
+GLTF_ARRAY_BUFFER = 34962
+GLTF_ELEMENT_ARRAY_BUFFER = 34963
+
+@contextmanager
+def _atomic_file(file_path):
+    """Open a binary file under a temporary name, moved into place once written and removed on error."""
+    temp_path = f"{file_path}.{getpid()}.{get_ident()}.tmp"
+    try:
+        with open(temp_path, "wb") as output_file:
+            yield output_file
+    except BaseException:
+        remove(temp_path)
+        raise
+    replace(temp_path, file_path)
+
+def _glb_document(name, vertices, triangles, vertex_values=None, value_name=None):
+    """
+    Build the glTF JSON of a single mesh node, its binary buffer holding the positions, the
+    optional per-vertex values and the triangle indices, in that order.
+
+    Parameters:
+        name (str): Name of the node and its mesh.
+        vertices (numpy.ndarray): (N, 3) float32 positions.
+        triangles (numpy.ndarray): (T, 3) uint16 or uint32 triangles.
+        vertex_values (numpy.ndarray): Optional (N,) float32 values stored as the custom attribute value_name.
+        value_name (str): Attribute name, application specific attributes start with an underscore.
+
+    Returns:
+        dict: The glTF document.
+    """
+    document = {"asset": {"version": "2.0", "generator": "Civic Builder"}, "scene": 0, "scenes": [{"nodes": []}]}
+    if len(triangles) == 0:
+        return document
+
+    arrays = [vertices] + ([vertex_values] if vertex_values is not None else []) + [triangles]
+    offsets = cumsum([0] + [array.nbytes for array in arrays]).tolist()
+    buffer_views = [{"buffer": 0, "byteOffset": offsets[i], "byteLength": array.nbytes, "target": GLTF_ARRAY_BUFFER}
+                    for i, array in enumerate(arrays)]
+    buffer_views[-1]["target"] = GLTF_ELEMENT_ARRAY_BUFFER
+    accessors = [{"bufferView": 0, "componentType": GLTF_FLOAT, "count": len(vertices), "type": "VEC3",
+                  "min": vertices.min(axis=0).tolist(), "max": vertices.max(axis=0).tolist()}]
+    attributes = {"POSITION": 0}
+    if vertex_values is not None:
+        accessors.append({"bufferView": 1, "componentType": GLTF_FLOAT, "count": len(vertex_values), "type": "SCALAR"})
+        attributes[value_name] = 1
+    index_type = GLTF_UNSIGNED_SHORT if triangles.dtype == uint16 else GLTF_UNSIGNED_INT
+    accessors.append({"bufferView": len(arrays) - 1, "componentType": index_type, "count": triangles.size, "type": "SCALAR"})
+
+    document.update({
+        "scenes": [{"nodes": [0]}],
+        "nodes": [{"name": name, "mesh": 0}],
+        "meshes": [{"name": name, "primitives": [{"attributes": attributes, "indices": len(accessors) - 1, "material": 0}]}],
+        # Footprints are flat, so they are shown from both sides whatever their winding order
+        "materials": [{"doubleSided": True}],
+        "accessors": accessors,
+        "bufferViews": buffer_views,
+        "buffers": [{"byteLength": offsets[-1]}],  # The binary chunk may be padded past the end of the buffer
+    })
+    return document
+
+def _write_glb(file_path, name, vertices, face_offsets, vertex_values=None, value_name=None):
+    """Triangulate a mesh and write it as a single node GLB file, see _glb_document."""
+    triangles, _ = triangulate_mesh(vertices, face_offsets)
+    vertices = ascontiguousarray(asarray(vertices, dtype=float32).reshape(-1, 3))
+    # Small meshes, such as the imagery and most footprints, fit 16-bit indices
+    triangles = ascontiguousarray(triangles, dtype=uint16 if len(vertices) <= 0xFFFF else uint32)
+    if vertex_values is not None:
+        vertex_values = ascontiguousarray(vertex_values, dtype=float32)
+    document = _glb_document(name, vertices, triangles, vertex_values, value_name)
+
+    # Chunks are padded to 4 bytes, the JSON with spaces
+    json_bytes = dumps(document, separators=(",", ":")).encode("utf-8")
+    json_bytes += b" " * (-len(json_bytes) % 4)
+    binary_length = document["buffers"][0]["byteLength"] if "buffers" in document else 0
+    padding = b"\0" * (-binary_length % 4)
+    total_length = 12 + 8 + len(json_bytes) + (8 + binary_length + len(padding) if binary_length else 0)
+
+    with _atomic_file(file_path) as output_file:
+        output_file.write(pack("<III", GLB_MAGIC, 2, total_length))
+        output_file.write(pack("<II", len(json_bytes), GLB_JSON_CHUNK))
+        output_file.write(json_bytes)
+        if binary_length:
+            # Indices come last, so the 4-byte values before them stay aligned
+            output_file.write(pack("<II", binary_length + len(padding), GLB_BIN_CHUNK))
+            output_file.write(vertices.data)
+            if vertex_values is not None:
+                output_file.write(vertex_values.data)
+            output_file.write(triangles.data)
+            output_file.write(padding)
+
+def write_mesh_glb(file_path, vertices, face_offsets, name=None):
+    """Write a single mesh to a GLB file, see obj_writer.write_mesh_obj."""
+    _write_glb(file_path, name or "mesh", vertices, face_offsets)
+
+def write_buildings_glb(file_path, vertices, face_offsets, building_offsets, name_prefix="building"):
+    """
+    Write building footprints to a GLB file as a single mesh, with the building number of each vertex as a "_BUILDING" attribute.
+
+    A single mesh keeps the file small and is drawn in one call by game engines, where one node
+    per building would not scale to thousands of buildings.
+
+    Parameters:
+        file_path (str): Path of the GLB file.
+        vertices (numpy.ndarray): (N, 3) vertices of all buildings.
+        face_offsets (numpy.ndarray): (F + 1,) vertex offsets of the faces, see make_geometry.build_mesh.
+        building_offsets (numpy.ndarray): (B + 1,) face offsets of the buildings.
+        name_prefix (str): Node name, building k matches the object name_prefix_k of the OBJ export. No building attribute when None.
+    """
+    if name_prefix is None:
+        _write_glb(file_path, "buildings", vertices, face_offsets)
+        return
+    faces_per_building = building_offsets[1:] - building_offsets[:-1]
+    vertices_per_face = face_offsets[1:] - face_offsets[:-1]
+    buildings = repeat(repeat(arange(1, len(building_offsets)), faces_per_building), vertices_per_face)
+    _write_glb(file_path, name_prefix, vertices, face_offsets, buildings, "_BUILDING")
+
+def _ply_face_bytes(face_offsets, face_values=None):
+    """
+    Pack PLY face records (vertex count, vertex indices, then an optional int value) into one byte array.
+
+    Records have varying lengths, so they are assembled with scattered byte copies instead of a structured dtype.
+    """
+    sizes = face_offsets[1:] - face_offsets[:-1]
+    largest = int(sizes.max()) if len(sizes) else 0
+    count_type = "<u1" if largest < 2 ** 8 else "<u2" if largest < 2 ** 16 else "<u4"
+    count_bytes = zeros(1, dtype=count_type).itemsize
+    value_bytes = 4 if face_values is not None else 0
+
+    record_lengths = count_bytes + 4 * sizes + value_bytes
+    starts = cumsum(record_lengths) - record_lengths
+    packed = zeros(int(record_lengths.sum()), dtype=uint8)
+
+    packed[starts[:, None] + arange(count_bytes)] = sizes.astype(count_type).view(uint8).reshape(-1, count_bytes)
+    # Byte position of each vertex index: its record start, past the count, plus its place in the face
+    indices = arange(int(face_offsets[0]), int(face_offsets[-1]), dtype="<i4")
+    face_of_vertex = repeat(arange(len(sizes)), sizes)
+    vertex_starts = starts[face_of_vertex] + count_bytes + 4 * (indices - face_offsets[face_of_vertex])
+    packed[vertex_starts[:, None] + arange(4)] = indices.view(uint8).reshape(-1, 4)
+    if face_values is not None:
+        packed[(starts + record_lengths - 4)[:, None] + arange(4)] = asarray(face_values, dtype="<i4").view(uint8).reshape(-1, 4)
+    return packed, {"<u1": "uchar", "<u2": "ushort", "<u4": "uint"}[count_type]
+
+def _write_ply(file_path, vertices, face_offsets, comments, face_values=None, value_name=None):
+    """Write a mesh as binary little endian PLY, with polygon faces and an optional int property per face."""
+    vertices = ascontiguousarray(asarray(vertices, dtype="<f4").reshape(-1, 3))
+    face_bytes, count_type = _ply_face_bytes(face_offsets, face_values)
+    header = ["ply", "format binary_little_endian 1.0"] + [f"comment {comment}" for comment in comments] + [
+        f"element vertex {len(vertices)}", "property float x", "property float y", "property float z",
+        f"element face {len(face_offsets) - 1}", f"property list {count_type} int vertex_indices"]
+    if face_values is not None:
+        header.append(f"property int {value_name}")
+    header.append("end_header\n")
+
+    with _atomic_file(file_path) as output_file:
+        output_file.write("\n".join(header).encode("ascii"))
+        output_file.write(vertices.data)
+        output_file.write(face_bytes.data)
+
+def write_mesh_ply(file_path, vertices, face_offsets, name=None):
+    """Write a single mesh to a binary PLY file, see obj_writer.write_mesh_obj."""
+    _write_ply(file_path, vertices, face_offsets, [name] if name else [])
+
+def write_buildings_ply(file_path, vertices, face_offsets, building_offsets, name_prefix="building"):
+    """
+    Write building footprints to a binary PLY file, with the building number of each face as a "building" property.
+
+    Parameters:
+        file_path (str): Path of the PLY file.
+        vertices (numpy.ndarray): (N, 3) vertices of all buildings.
+        face_offsets (numpy.ndarray): (F + 1,) vertex offsets of the faces, see make_geometry.build_mesh.
+        building_offsets (numpy.ndarray): (B + 1,) face offsets of the buildings.
+        name_prefix (str): Building k matches the object name_prefix_k of the other formats, no building property when None.
+    """
+    if name_prefix is None:
+        _write_ply(file_path, vertices, face_offsets, [])
+        return
+    buildings = repeat(arange(1, len(building_offsets)), building_offsets[1:] - building_offsets[:-1])
+    _write_ply(file_path, vertices, face_offsets, [f"building k is {name_prefix}_k"], buildings, "building")
+
+# Mesh writers of each export format, selected next to the post-processing algorithm.
+# Every format offers a single mesh writer and a per-building footprints writer with the same arguments.
+EXPORT_FORMATS = {
+    "OBJ": {"extension": ".obj", "mesh": write_mesh_obj, "buildings": write_buildings_obj},
+    "GLB": {"extension": ".glb", "mesh": write_mesh_glb, "buildings": write_buildings_glb},
+    "PLY": {"extension": ".ply", "mesh": write_mesh_ply, "buildings": write_buildings_ply},
+}
+DEFAULT_EXPORT_FORMAT = "OBJ"
@@ -0,0 +1,123 @@
+# Multi-process inference, each worker process holds its own predictor and processes a shard of the input folder.
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_EXCEPTION
+from multiprocessing import get_context
+from os import cpu_count, environ
+from queue import Empty
+
+# Progress queue of the current worker process, set up by init_worker
+_progress_queue = None
+
+def split_shards(image_files, num_workers):
+    """Split the image files into at most num_workers interleaved shards of similar size."""
+    if num_workers < 1:
+        raise ValueError(f"Number of workers must be at least 1, got {num_workers}")
+    shards = [image_files[i::num_workers] for i in range(num_workers)]
+    return [shard for shard in shards if shard]
+
+def default_threads_per_worker(num_workers):
+    """Share the available CPU cores evenly between the workers, so they don't oversubscribe them."""
+    return max(1, (cpu_count() or 1) // num_workers)
+
+def init_worker(threads_per_worker, progress_queue):
+    """Limit the torch/OpenCV thread pools of a worker process and keep its progress queue."""
+    global _progress_queue
+    _progress_queue = progress_queue
+
+    # Set for any native libraries that read the thread count when they are first loaded
+    for variable in ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS"):
+        environ[variable] = str(threads_per_worker)
+
+    from cv2 import setNumThreads
+
+    setNumThreads(threads_per_worker)
+    try:
+        from torch import set_num_threads, set_num_interop_threads
+    except ImportError:
+        return  # ONNX Runtime workers read OMP_NUM_THREADS instead
+    set_num_threads(threads_per_worker)
+    try:
+        set_num_interop_threads(1)
+    except RuntimeError:
+        pass  # Inter-op threads can only be set before torch runs any parallel work
+
+def report_image_done(image_file):
+    """Tell the parent process that an image has been processed."""
+    if _progress_queue is not None:
+        _progress_queue.put(image_file)
+
+def process_shard(shard, model_selection, device, input_folder, output_2d_folder, output_3d_folder, export_post_process_algorithm, options):
+    """
+    Extract features from one shard of the input images in a worker process.
+
+    Parameters:
+        options (dict): Keyword options for process_image_files (batch size, queue size, tiling, cache).
+
+    Returns:
+        dict: Pipeline stage, prediction cache and device transfer statistics of this worker.
+    """
+    from predictor_registry import get_predictor
+    from quantization import DEFAULT_PRECISION
+    from onnx_backend import DEFAULT_ENGINE
+    from resolution_presets import DEFAULT_PRESET
+    from detect_buildings import process_image_files
+
+    # Each worker process has its own registry, so the model is loaded at most once per worker
+    def load_predictor():
+        return get_predictor(model_selection, device=device, precision=options.get("precision", DEFAULT_PRECISION),
+                             engine=options.get("engine", DEFAULT_ENGINE), preset=options.get("preset", DEFAULT_PRESET))
+
+    return process_image_files(load_predictor, shard, input_folder, output_2d_folder, output_3d_folder,
+                               export_post_process_algorithm, on_image_done=report_image_done, **options)
+
+def run_inference_pool(image_files, shard_args, num_workers, threads_per_worker=None, on_image_done=None, shard_function=process_shard):
+    """
+    Process the image files with a pool of worker processes and merge their results.
+
+    Parameters:
+        image_files (list): File names of the images to process.
+        shard_args (tuple): Extra arguments passed to shard_function after each shard.
+        num_workers (int): Number of worker processes.
+        threads_per_worker (int): Thread budget per worker, defaults to an even share of the CPU cores.
+        on_image_done (callable): Called in the parent process with the file name of each processed image.
+        shard_function (callable): Function processing a shard in a worker process.
+
+    Returns:
+        list: The result of shard_function for each shard.
+    """
+    shards = split_shards(image_files, num_workers)
+    if threads_per_worker is None:
+        threads_per_worker = default_threads_per_worker(len(shards))
+
+    print(f"Starting {len(shards)} inference workers with {threads_per_worker} threads each.")
+
+    # Spawn fresh interpreters, forked workers would inherit the parent's CUDA and thread pool state
+    context = get_context("spawn")
+    progress_queue = context.Queue()
+
+    def drain_progress(timeout):
+        try:
+            image_file = progress_queue.get(timeout=timeout)
+        except Empty:
+            return
+        if on_image_done is not None:
+            on_image_done(image_file)
+
+    with ProcessPoolExecutor(max_workers=len(shards), mp_context=context,
+                             initializer=init_worker, initargs=(threads_per_worker, progress_queue)) as executor:
+        futures = [executor.submit(shard_function, shard, *shard_args) for shard in shards]
+
+        # Relay progress from the workers while they run, stopping early if one of them fails
+        pending = futures
+        while pending:
+            drain_progress(timeout=0.1)
+            done, pending = wait(pending, timeout=0, return_when=FIRST_EXCEPTION)
+            if any(future.exception() for future in done):
+                break
+
+        results = [future.result() for future in futures]  # Re-raises the first worker error
+
+    # Report any progress messages still queued after the workers finished
+    while not progress_queue.empty():
+        drain_progress(timeout=0.1)
+
+    return results
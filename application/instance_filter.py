@@ -0,0 +1,100 @@
+# Confidence filtering of predicted instances while they are still on the model device, so only the kept ones are copied off it.
+from predictor_registry import NUM_CLASSES
+from compact_masks import CompactInstances, pack_instances, CONTOUR_CROP_MARGIN
+
+DEFAULT_SCORE_THRESHOLD = 0.5  # Detections below this confidence are not exported
+
+def validate_thresholds(score_threshold, class_thresholds=None):
+    """
+    Check a score threshold and per-class thresholds, returning the class thresholds keyed by int class id.
+
+    Parameters:
+        score_threshold (float): Minimum score of the detections of every class.
+        class_thresholds (dict): Optional minimum score per class id (0 to NUM_CLASSES - 1), overriding score_threshold.
+
+    Returns:
+        dict: The class thresholds, empty when none are set.
+    """
+    thresholds = {int(class_id): float(threshold) for class_id, threshold in (class_thresholds or {}).items()}
+    for class_id in thresholds:
+        if not 0 <= class_id < NUM_CLASSES:
+            raise ValueError(f"Class id must be between 0 and {NUM_CLASSES - 1}, got {class_id}.")
+    for threshold in [float(score_threshold)] + list(thresholds.values()):
+        if not 0 <= threshold <= 1:
+            raise ValueError(f"Score thresholds must be between 0 and 1, got {threshold}.")
+    return thresholds
+
+def keep_mask(scores, classes, score_threshold, class_thresholds=None):
+    """Return the boolean mask of the scores reaching the threshold of their class, computed where the scores are."""
+    keep = scores >= score_threshold
+    for class_id, threshold in (class_thresholds or {}).items():
+        selected = classes == class_id
+        keep[selected] = scores[selected] >= threshold
+    return keep
+
+def instances_bytes(instances):
+    """Return the size of the tensors of detectron2 Instances, read from their shapes without touching the data."""
+    total = 0
+    for value in instances.get_fields().values():
+        tensor = getattr(value, "tensor", value)  # Boxes wrap their tensor
+        total += tensor.element_size() * tensor.numel()
+    return total
+
+def empty_transfer_statistics():
+    """Return zeroed device transfer statistics, updated by filter_instances."""
+    return {"instances": 0, "kept": 0, "bytes_moved": 0, "bytes_skipped": 0}
+
+def filter_instances(instances, score_threshold=DEFAULT_SCORE_THRESHOLD, class_thresholds=None, statistics=None,
+                     margin=CONTOUR_CROP_MARGIN):
+    """
+    Drop the low-confidence detections of a prediction and move the rest to the CPU as CompactInstances.
+
+    The scores are compared on the model device, so the dense masks of the dropped
+    detections, by far the largest part of a prediction, are never copied off it, and
+    only the crop windows of the kept masks are (see compact_masks.pack_instances).
+    CompactInstances, such as stored predictions, are only filtered.
+
+    Parameters:
+        instances (Instances): Predictions of one image or tile, on any device, or CompactInstances.
+        score_threshold (float): Minimum score of the kept detections.
+        class_thresholds (dict): Minimum score per class id, overriding score_threshold for that class.
+        statistics (dict): Transfer statistics to update (see empty_transfer_statistics), or None.
+        margin (int): Pixels kept around each box when cropping the masks.
+
+    Returns:
+        CompactInstances: The kept detections, on the CPU.
+    """
+    if isinstance(instances, CompactInstances):
+        return instances.select(keep_mask(instances.scores, instances.classes, score_threshold, class_thresholds))
+
+    kept = instances[keep_mask(instances.scores, instances.pred_classes, score_threshold, class_thresholds)]
+    compact = pack_instances(kept, margin)
+    if statistics is not None:
+        # Masks are moved as one byte per pixel of their crop windows, bit-packed on the CPU
+        mask_bytes = kept.pred_masks.element_size()
+        moved_bytes = instances_bytes(kept) - mask_bytes * (kept.pred_masks.numel() - compact.masks.area)
+        statistics["instances"] += len(instances)
+        statistics["kept"] += len(kept)
+        statistics["bytes_moved"] += moved_bytes
+        statistics["bytes_skipped"] += instances_bytes(instances) - moved_bytes
+    return compact
+
+def keep_scene_instance(instance, score_threshold=DEFAULT_SCORE_THRESHOLD, class_thresholds=None):
+    """Whether a SceneInstance of a stored tiled prediction reaches the threshold of its class."""
+    return instance.score >= (class_thresholds or {}).get(instance.class_id, score_threshold)
+
+def merge_transfer_statistics(all_statistics):
+    """Sum the transfer statistics of several runs (e.g. one per worker process)."""
+    merged = empty_transfer_statistics()
+    for statistics in all_statistics:
+        for name in merged:
+            merged[name] += statistics[name]
+    return merged
+
+def format_transfer_report(statistics):
+    """Format transfer statistics as a one line report."""
+    total_bytes = statistics["bytes_moved"] + statistics["bytes_skipped"]
+    saved = statistics["bytes_skipped"] / total_bytes if total_bytes else 0.0
+    return (f"Device transfer: kept {statistics['kept']} of {statistics['instances']} detections, "
+            f"moved {statistics['bytes_moved'] / 1e6:.1f} MB, skipped {statistics['bytes_skipped'] / 1e6:.1f} MB "
+            f"({saved:.0%} saved).")
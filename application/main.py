@@ -1,4 +1,5 @@
 from sys import exit
+from multiprocessing import freeze_support
 
 from customtkinter import CTk
 
@@ -25,4 +26,5 @@ def main():
         exit(1)
 
 if __name__ == "__main__":
+    freeze_support()  # Required for inference worker processes in frozen (PyInstaller) builds
     main()
\ No newline at end of file
@@ -1 +1,267 @@
-# Logic to convert contours to 3d geometry
\ No newline at end of file
+# Logic to convert contours to 3d geometry
+from numpy import (array, arange, argsort, asarray, bincount, ceil, concatenate, cumsum, empty, full, log2, repeat, stack,
+                   take_along_axis, where, zeros, int64, float64)
+
+MAX_BATCHED_CORNERS = 64  # Larger concave faces are clipped one at a time, the batched ear test grows with the square of the corners
+BATCH_ELEMENTS = 1 << 20  # Corner pairs tested at once by the batched ear clipping, which bounds its memory
+
+def flatten_contours(contours):
+    """
+    Ensure that contours are laid flat on the XY plane
+    (by ensuring all Z values are zero, without additional rotations).
+
+    Accepts OpenCV contours of shape (n, 1, 2) as well as plain (n, 2) point arrays.
+    """
+    flattened_contours = []
+    for contour in contours:
+        points = asarray(contour).reshape(-1, 2)
+        # Keep X and Y as they are and set Z to 0, leaving the contour in its original orientation
+        flattened_contour = zeros((len(points), 3), dtype=points.dtype)
+        flattened_contour[:, :2] = points
+        flattened_contours.append(flattened_contour)
+    return flattened_contours
+
+def build_mesh(contour_groups):
+    """
+    Concatenate the flattened contours of all buildings into a single mesh.
+
+    Parameters:
+        contour_groups (iterable): For each building, its flattened contours.
+
+    Returns:
+        tuple: The (N, 3) array of all vertices, the (F + 1,) array of face offsets (face i uses
+        vertices face_offsets[i] to face_offsets[i + 1] - 1) and the (B + 1,) array of building
+        offsets (building j is made of faces building_offsets[j] to building_offsets[j + 1] - 1).
+    """
+    contour_groups = list(contour_groups)
+    contours = [contour for flattened_contours in contour_groups for contour in flattened_contours]
+    building_offsets = concatenate(([0], cumsum([len(flattened_contours) for flattened_contours in contour_groups]))).astype(int64)
+    if not contours:
+        return empty((0, 3), dtype=int64), zeros(1, dtype=int64), building_offsets
+    vertices = concatenate([asarray(contour).reshape(-1, 3) for contour in contours])
+    face_offsets = concatenate(([0], cumsum([len(contour) for contour in contours]))).astype(int64)
+    return vertices, face_offsets, building_offsets
+
+def imagery_mesh(width, height):
+    """Return the vertices and face offsets of the big polygon that spans the entire image."""
+    vertices = array([[0, 0, 0], [width, 0, 0], [width, height, 0], [0, height, 0]], dtype=int64)
+    return vertices, array([0, 4], dtype=int64)
+
+def _triangulate_polygon(points):
+    """
+    Split a simple polygon into triangles by ear clipping.
+
+    Parameters:
+        points (numpy.ndarray): (n, 2) outline of the polygon, in either winding order.
+
+    Returns:
+        list: Triangles as (a, b, c) indices into points.
+    """
+    coordinates = asarray(points, dtype=float64).tolist()
+    count = len(coordinates)
+    if count < 3:
+        return []
+    # Only used for faces with more than MAX_BATCHED_CORNERS corners, which have too many for _clip_ears.
+    # Shoelace formula, the sign gives the winding order of the outline.
+    doubled_area = sum(x0 * y1 - x1 * y0 for (x0, y0), (x1, y1) in zip(coordinates, coordinates[1:] + coordinates[:1]))
+    orientation = 1 if doubled_area >= 0 else -1
+
+    def turn(a, b, c):
+        (ax, ay), (bx, by), (cx, cy) = coordinates[a], coordinates[b], coordinates[c]
+        return ((bx - ax) * (cy - ay) - (by - ay) * (cx - ax)) * orientation
+
+    # Only reflex corners can lie inside an ear, and a convex corner never becomes reflex
+    reflex = {i for i in range(count) if turn(i - 1, i, (i + 1) % count) <= 0}
+    if not reflex:
+        # Convex outlines, such as boxes and hulls, are fanned out from their first corner
+        return [(0, i, i + 1) for i in range(1, count - 1)]
+
+    def blocks_ear(i, a, b, c):
+        """Whether corner i lies inside or on the triangle a, b, c, copies of the triangle corners excepted."""
+        point = coordinates[i]
+        if point == coordinates[a] or point == coordinates[b] or point == coordinates[c]:
+            return False
+        return turn(a, b, i) >= 0 and turn(b, c, i) >= 0 and turn(c, a, i) >= 0
+
+    remaining = list(range(count))
+    triangles = []
+    k, attempts = 0, 0
+    while len(remaining) > 3 and attempts < len(remaining):
+        k %= len(remaining)
+        a, b, c = remaining[k - 1], remaining[k], remaining[(k + 1) % len(remaining)]
+        corner = turn(a, b, c)
+        # Collinear or repeated points are dropped without adding a triangle
+        is_ear = corner == 0 or (corner > 0 and not any(blocks_ear(i, a, b, c) for i in reflex))
+        if not is_ear:
+            k += 1
+            attempts += 1
+            continue
+
+        if corner > 0:
+            triangles.append((a, b, c))
+        del remaining[k]
+        reflex.discard(b)
+        attempts = 0
+        # The neighbours of the clipped corner may have become convex
+        left = len(remaining)
+        for position in (k - 1, k):
+            i = remaining[position % left]
+            if i in reflex and turn(remaining[(position - 1) % left], i, remaining[(position + 1) % left]) > 0:
+                reflex.discard(i)
+
+    # Fan out whatever is left, which is a single triangle unless the outline intersects itself
+    triangles.extend((remaining[0], remaining[i], remaining[i + 1]) for i in range(1, len(remaining) - 1))
+    return triangles
+
+def _clip_ears(points, starts, sizes):
+    """
+    Split concave faces into triangles by ear clipping, one ear of every face per round.
+
+    Gives the same triangles as _triangulate_polygon, but runs the ear tests of all faces
+    together, which is much faster for the thousands of small footprints of an image.
+
+    Parameters:
+        points (numpy.ndarray): (N, 2) coordinates of the corners.
+        starts (numpy.ndarray): (F,) index of the first corner of each face in points.
+        sizes (numpy.ndarray): (F,) number of corners of each face.
+
+    Returns:
+        tuple: The (T,) face of each triangle, and the (T, 3) triangles as indices into points,
+        grouped by face.
+    """
+    slots = int(sizes.max())
+    slot = arange(slots)
+    valid = slot < sizes[:, None]
+    corners = starts[:, None] + where(valid, slot, 0)  # Padding slots repeat the first corner and are never alive
+    x, y = points[corners, 0], points[corners, 1]
+    following = (slot + 1) % sizes[:, None]
+    previous = (slot - 1) % sizes[:, None]
+    doubled_areas = (where(valid, x * take_along_axis(y, following, 1) - take_along_axis(x, following, 1) * y, 0)).sum(axis=1)
+    orientation = where(doubled_areas >= 0, 1.0, -1.0)[:, None]
+    alive = valid.copy()
+    remaining = sizes.copy()
+    active = remaining > 3
+    cursor = zeros(len(sizes), dtype=int64)  # Each face looks for its next ear from the corner after its last one
+
+    faces, rounds, triangles = [], [], []
+    clip_round = 0
+    while active.any():
+        face = active.nonzero()[0]
+        fx, fy, before, after, live = x[face], y[face], previous[face], following[face], alive[face]
+        ax, ay = take_along_axis(fx, before, 1), take_along_axis(fy, before, 1)
+        cx, cy = take_along_axis(fx, after, 1), take_along_axis(fy, after, 1)
+        turns = ((fx - ax) * (cy - ay) - (fy - ay) * (cx - ax)) * orientation[face]
+        reflex = live & (turns <= 0)
+
+        # Corner i blocks the ear at b when it is reflex and inside or on the triangle a, b, c, copies of its corners excepted.
+        # Footprints have few reflex corners, so only those are tested, packed to the front of each row.
+        packed = argsort(~reflex, axis=1, kind="stable")[:, :max(int(reflex.sum(axis=1).max()), 1)]
+        reflex = take_along_axis(reflex, packed, 1)
+        ix, iy = take_along_axis(fx, packed, 1)[:, None, :], take_along_axis(fy, packed, 1)[:, None, :]
+        ax, ay, bx, by, cx, cy = (value[:, :, None] for value in (ax, ay, fx, fy, cx, cy))
+        sign = orientation[face][:, :, None]
+        inside = ((((bx - ax) * (iy - ay) - (by - ay) * (ix - ax)) * sign >= 0)
+                  & (((cx - bx) * (iy - by) - (cy - by) * (ix - bx)) * sign >= 0)
+                  & (((ax - cx) * (iy - cy) - (ay - cy) * (ix - cx)) * sign >= 0))
+        copies = ((ix == ax) & (iy == ay)) | ((ix == bx) & (iy == by)) | ((ix == cx) & (iy == cy))
+        blocked = (inside & ~copies & reflex[:, None, :]).any(axis=2)
+        # Collinear or repeated points are dropped without adding a triangle
+        ears = live & ((turns == 0) | ((turns > 0) & ~blocked))
+
+        # Faces without an ear intersect themselves, what is left of them is fanned out below
+        has_ear = ears.any(axis=1)
+        active[face[~has_ear]] = False
+        face, ears, turns, before, after = face[has_ear], ears[has_ear], turns[has_ear], before[has_ear], after[has_ear]
+        rows = arange(len(face))
+        b = where(ears, (slot - cursor[face, None]) % slots, slots).argmin(axis=1)
+        a, c = before[rows, b], after[rows, b]
+        kept = turns[rows, b] > 0
+        faces.append(face[kept])
+        rounds.append(full(int(kept.sum()), clip_round))
+        triangles.append(stack([corners[face, a], corners[face, b], corners[face, c]], axis=1)[kept])
+
+        following[face, a] = c
+        previous[face, c] = a
+        alive[face, b] = False
+        cursor[face] = c
+        remaining[face] -= 1
+        active[face[remaining[face] <= 3]] = False
+        clip_round += 1
+
+    # Fan out whatever is left from its first corner, a single triangle unless the outline intersects itself
+    order = empty((len(sizes), slots), dtype=int64)
+    order[:, 0] = alive.argmax(axis=1)
+    for position in range(1, int(remaining.max())):
+        order[:, position] = following[arange(len(sizes)), order[:, position - 1]]
+    fan_counts = remaining - 2
+    fan_face = repeat(arange(len(sizes)), fan_counts)
+    fan_rank = arange(int(fan_counts.sum())) - repeat(cumsum(fan_counts) - fan_counts, fan_counts)
+    faces.append(fan_face)
+    rounds.append(clip_round + fan_rank)
+    triangles.append(stack([corners[fan_face, order[fan_face, 0]], corners[fan_face, order[fan_face, fan_rank + 1]],
+                            corners[fan_face, order[fan_face, fan_rank + 2]]], axis=1))
+
+    faces, rounds = concatenate(faces), concatenate(rounds)
+    grouped = argsort(faces * (clip_round + slots) + rounds, kind="stable")
+    return faces[grouped], concatenate(triangles)[grouped]
+
+def triangulate_mesh(vertices, face_offsets):
+    """
+    Triangulate every face of a mesh built by build_mesh or imagery_mesh.
+
+    Parameters:
+        vertices (numpy.ndarray): (N, 3) vertices of the mesh.
+        face_offsets (numpy.ndarray): (F + 1,) vertex offsets of the faces.
+
+    Returns:
+        tuple: The (T, 3) array of triangles, as indices into vertices, and the (F + 1,) array of
+        triangle offsets (face i is made of triangles triangle_offsets[i] to triangle_offsets[i + 1] - 1).
+    """
+    face_offsets = asarray(face_offsets, dtype=int64)
+    sizes = face_offsets[1:] - face_offsets[:-1]
+    first = int(face_offsets[0])
+    points = asarray(vertices[first:int(face_offsets[-1]), :2], dtype=float64)
+
+    # Turn at every corner, relative to the winding order of its face, to find the convex faces at once
+    face_of_vertex = repeat(arange(len(sizes)), sizes)
+    face_start = face_offsets[:-1][face_of_vertex] - first
+    position = arange(len(points)) - face_start
+    following = face_start + (position + 1) % sizes[face_of_vertex]
+    previous = face_start + (position - 1) % sizes[face_of_vertex]
+    x, y = points[:, 0], points[:, 1]
+    doubled_areas = bincount(face_of_vertex, weights=x * y[following] - x[following] * y, minlength=len(sizes))
+    orientation = where(doubled_areas >= 0, 1.0, -1.0)[face_of_vertex]
+    turns = ((x - x[previous]) * (y[following] - y[previous]) - (y - y[previous]) * (x[following] - x[previous])) * orientation
+    convex = (bincount(face_of_vertex, weights=turns <= 0, minlength=len(sizes)) == 0) & (sizes >= 3)
+
+    # Convex faces are fanned out from their first corner
+    fan_faces = convex.nonzero()[0]
+    fan_counts = sizes[fan_faces] - 2
+    fan_face = repeat(fan_faces, fan_counts)
+    fan_rank = arange(int(fan_counts.sum())) - repeat(cumsum(fan_counts) - fan_counts, fan_counts)
+    fan_start = face_offsets[fan_face]
+    faces = [fan_face]
+    triangles = [stack([fan_start, fan_start + fan_rank + 1, fan_start + fan_rank + 2], axis=1)]
+
+    # Concave faces are clipped together, in batches of faces of about the same size
+    concave = ((~convex) & (sizes >= 3)).nonzero()[0]
+    batched = concave[sizes[concave] <= MAX_BATCHED_CORNERS]
+    slots = (2 ** ceil(log2(sizes[batched]))).astype(int64)
+    for width in sorted(set(slots.tolist())):
+        sized = batched[slots == width]
+        step = max(BATCH_ELEMENTS // (width * width), 1)
+        for chunk in range(0, len(sized), step):
+            group = sized[chunk:chunk + step]
+            group_faces, group_triangles = _clip_ears(points, face_offsets[group] - first, sizes[group])
+            faces.append(group[group_faces])
+            triangles.append(group_triangles + first)
+    for face in concave[sizes[concave] > MAX_BATCHED_CORNERS].tolist():
+        start, end = int(face_offsets[face]), int(face_offsets[face + 1])
+        face_triangles = asarray(_triangulate_polygon(points[start - first:end - first]), dtype=int64).reshape(-1, 3) + start
+        faces.append(full(len(face_triangles), face, dtype=int64))
+        triangles.append(face_triangles)
+
+    faces = concatenate(faces).astype(int64)
+    grouped = argsort(faces, kind="stable")
+    triangle_offsets = concatenate(([0], cumsum(bincount(faces, minlength=len(sizes))))).astype(int64)
+    return concatenate(triangles).astype(int64).reshape(-1, 3)[grouped], triangle_offsets
@@ -0,0 +1,264 @@
+# City-scale mosaic of the extracted footprints: every image placed at its grid or georeferenced offset,
+# grouped into spatial chunks with a quadtree of coarser levels of detail that engines can stream.
+from json import dump
+from math import ceil, log2, sqrt
+from os import path, makedirs, replace
+from re import compile as compile_pattern
+
+from cv2 import approxPolyDP
+from numpy import array, asarray, around, concatenate, cumsum, maximum, minimum, zeros, float32, float64, int64
+
+from export_feature import EXPORT_FORMATS, DEFAULT_EXPORT_FORMAT
+from make_geometry import flatten_contours, build_mesh
+from prediction_cache import write_arrays, read_arrays
+from raster_source import read_georeference
+
+MESH_SUFFIX = "_mesh.npz"  # Footprint mesh of each image, stored next to its mesh files for the mosaic
+MOSAIC_FOLDER = "mosaic"
+MOSAIC_INDEX = "mosaic_index.json"
+DEFAULT_CHUNK_SIZE = 2048  # Side of the finest chunks, in pixels of the input images
+LOD_TOLERANCE = 1.0  # Simplification tolerance of the first coarser level in pixels, doubled at every level above
+GRID_NAME_PATTERN = compile_pattern(r"_(\d+)_(\d+)$")  # Tiles named like scene_<row>_<column>.png
+
+def mesh_path(output_3d_folder, image_file):
+    """Return the path of the stored footprint mesh of an image."""
+    return path.join(output_3d_folder, path.splitext(image_file)[0] + MESH_SUFFIX)
+
+def save_mesh(file_path, rendered):
+    """Store the footprint mesh and the image size of rendered features (see render_image_features)."""
+    vertices, face_offsets, building_offsets = rendered["footprints"]
+    width, height = rendered["imagery"][0][2, :2]
+    write_arrays(file_path, {"vertices": vertices, "face_offsets": face_offsets, "building_offsets": building_offsets,
+                             "size": array([width, height], dtype=int64)})
+
+def load_mesh(file_path):
+    """Load a mesh stored by save_mesh, as ((vertices, face_offsets, building_offsets), (width, height))."""
+    arrays = read_arrays(file_path)
+    return (arrays["vertices"], arrays["face_offsets"], arrays["building_offsets"]), tuple(arrays["size"].tolist())
+
+def image_transforms(image_files, image_sizes, input_folder=None, grid_columns=None):
+    """
+    Place each image of the mosaic.
+
+    Images are placed at their georeferenced position when all of them are georeferenced
+    (world files or GeoTIFF tags). Otherwise they are laid out on a grid, by the row and
+    column at the end of their names (scene_<row>_<column>) when all of them have one,
+    or in name order, row by row.
+
+    Parameters:
+        image_files (list): File names of the images.
+        image_sizes (list): (width, height) of each image.
+        input_folder (str): Folder of the images, searched for georeferencing. None skips georeferencing.
+        grid_columns (int): Columns of the name order grid, defaults to a square grid.
+
+    Returns:
+        tuple: The layout ("georeferenced" or "grid") and the affine transform of each image, as
+        (a, b, c, d, e, f) mapping the pixel corner (x, y) to (a * x + b * y + c, d * x + e * y + f).
+    """
+    if input_folder is not None:
+        transforms = [read_georeference(path.join(input_folder, image_file)) for image_file in image_files]
+        if transforms and all(transform is not None for transform in transforms):
+            return "georeferenced", transforms
+
+    # Every grid cell is as large as the largest image
+    cell_width = max(width for width, _ in image_sizes)
+    cell_height = max(height for _, height in image_sizes)
+    matches = [GRID_NAME_PATTERN.search(path.splitext(image_file)[0]) for image_file in image_files]
+    if all(matches):
+        cells = [(int(match.group(1)), int(match.group(2))) for match in matches]
+    else:
+        columns = grid_columns or ceil(sqrt(len(image_files)))
+        order = sorted(range(len(image_files)), key=lambda i: image_files[i])
+        cells = [None] * len(image_files)
+        for position, i in enumerate(order):
+            cells[i] = divmod(position, columns)
+    return "grid", [(1.0, 0.0, column * cell_width, 0.0, 1.0, row * cell_height) for row, column in cells]
+
+def transform_points(points, transform):
+    """Apply an affine transform to (n, 2) pixel coordinates."""
+    a, b, c, d, e, f = transform
+    points = asarray(points, dtype=float64)
+    x, y = points[:, 0], points[:, 1]
+    transformed = points.copy()
+    transformed[:, 0] = a * x + b * y + c
+    transformed[:, 1] = d * x + e * y + f
+    return transformed
+
+def simplify_building(building, tolerance):
+    """
+    Simplify the outlines of a building for a coarser level.
+
+    Parameters:
+        building (tuple): The size of the building (longest side of its bounds) and its (n, 2) outlines.
+        tolerance (float): Largest distance between the outlines and their simplified versions.
+
+    Returns:
+        tuple: The building with simplified outlines, or None when it is too small to be seen at this level.
+    """
+    size, polygons = building
+    if size < 2 * tolerance:
+        return None
+    simplified = [approxPolyDP(polygon.astype(float32).reshape(-1, 1, 2), tolerance, True).reshape(-1, 2) for polygon in polygons]
+    simplified = [outline.astype(float64) for outline in simplified if len(outline) >= 3]
+    return (size, simplified) if simplified else None
+
+def mosaic_buildings(vertices, face_offsets, building_offsets, transform, origin):
+    """
+    Move the buildings of an image to mosaic coordinates.
+
+    Returns:
+        list: (size, outlines) of each building, see simplify_building, with the centre of its bounds.
+    """
+    points = transform_points(vertices[:, :2], transform) - origin
+    face_sizes = face_offsets[1:] - face_offsets[:-1]
+    faces_per_building = building_offsets[1:] - building_offsets[:-1]
+    if not len(points) or not face_sizes.all() or not faces_per_building.any():
+        return []
+
+    # Bounds of every building at once, from the bounds of its faces
+    face_low, face_high = minimum.reduceat(points, face_offsets[:-1]), maximum.reduceat(points, face_offsets[:-1])
+    first_faces = building_offsets[:-1][faces_per_building > 0]
+    low, high = minimum.reduceat(face_low, first_faces), maximum.reduceat(face_high, first_faces)
+    sizes = (high - low).max(axis=1).tolist()
+    centers = ((low + high) / 2).tolist()
+
+    offsets = face_offsets.tolist()
+    buildings = []
+    for building, (first_face, face_count) in enumerate(zip(first_faces.tolist(), faces_per_building[faces_per_building > 0].tolist())):
+        outlines = [points[offsets[face]:offsets[face + 1]] for face in range(first_face, first_face + face_count)]
+        buildings.append(((sizes[building], outlines), centers[building]))
+    return buildings
+
+class _QuadtreeWriter:
+    """Write the chunks of each quadtree level and collect their index entries."""
+
+    def __init__(self, folder, export_format, chunk_units, depth, pixel_size):
+        self.folder = folder
+        self.writers = EXPORT_FORMATS[export_format]
+        self.chunk_units = chunk_units
+        self.depth = depth
+        self.pixel_size = pixel_size
+        self.nodes = {}
+
+    def write_level(self, level, chunks):
+        """Write the non-empty chunks {(x, y): [buildings]} of a level, level 0 being the root, see simplify_building."""
+        level_folder = path.join(self.folder, f"lod{level}")
+        makedirs(level_folder, exist_ok=True)
+        size = self.chunk_units * 2 ** (self.depth - level)
+        geometric_error = 0.0 if level == self.depth else LOD_TOLERANCE * self.pixel_size * 2 ** (self.depth - level - 1)
+        for (x, y), buildings in sorted(chunks.items()):
+            # Buildings simplified away at this level are None
+            buildings = [building[1] for building in buildings if building is not None]
+            if not buildings:
+                continue
+            file_name = f"{x}_{y}{self.writers['extension']}"
+            outlines = [polygon for polygons in buildings for polygon in polygons]
+            vertices = zeros((sum(len(polygon) for polygon in outlines), 3))
+            vertices[:, :2] = concatenate(outlines)
+            face_offsets = concatenate(([0], cumsum([len(polygon) for polygon in outlines]))).astype(int64)
+            building_offsets = concatenate(([0], cumsum([len(polygons) for polygons in buildings]))).astype(int64)
+            # Millimetre-like precision keeps the OBJ text short, binary formats store float32 anyway
+            self.writers["buildings"](path.join(level_folder, file_name), around(vertices, 3), face_offsets,
+                                      building_offsets, name_prefix="building")
+            children = [f"{level + 1}/{2 * x + dx}/{2 * y + dy}" for dy in (0, 1) for dx in (0, 1)]
+            self.nodes[f"{level}/{x}/{y}"] = {
+                "level": level, "x": x, "y": y,
+                "file": f"lod{level}/{file_name}",
+                "chunk_bounds": [x * size, y * size, (x + 1) * size, (y + 1) * size],
+                "bounds": vertices[:, :2].min(axis=0).tolist() + vertices[:, :2].max(axis=0).tolist(),
+                "geometric_error": geometric_error,
+                "buildings": len(buildings),
+                "vertices": len(vertices),
+                "children": [child for child in children if child in self.nodes],
+            }
+
+def export_mosaic(image_files, output_3d_folder, input_folder=None, export_format=DEFAULT_EXPORT_FORMAT,
+                  chunk_size=DEFAULT_CHUNK_SIZE, grid_columns=None):
+    """
+    Assemble the footprints of all images into one mosaic, split into a quadtree of chunks.
+
+    The finest level holds the footprints as extracted, in chunks of chunk_size pixels.
+    Each coarser level merges four chunks into one, simplifies the outlines with a tolerance
+    doubling at every level and leaves out the buildings smaller than it, up to a single
+    root chunk. The chunks are written to output_3d_folder/mosaic/lod<level>/<x>_<y>.<ext>,
+    along with mosaic_imagery.<ext> (one quad per image) and mosaic_index.json, which
+    describes the placement of the images and the tree of chunks.
+
+    Coordinates are relative to the mosaic origin stored in the index (the minimum corner
+    of all images), which keeps them precise in float32 formats.
+
+    Parameters:
+        image_files (list): Images of the mosaic, with meshes stored by save_mesh in output_3d_folder.
+        output_3d_folder (str): Output folder of the 3D files.
+        input_folder (str): Folder of the input images, used for georeferencing.
+        export_format (str): Mesh file format of the chunks, one of EXPORT_FORMATS.
+        chunk_size (int): Side of the finest chunks in pixels of the input images, of the finest one when
+            georeferenced images have different ground resolutions.
+        grid_columns (int): Columns of the grid layout of images without georeferencing or row/column names.
+
+    Returns:
+        dict: The mosaic index.
+    """
+    image_files = [image_file for image_file in image_files if path.isfile(mesh_path(output_3d_folder, image_file))]
+    if not image_files:
+        raise ValueError("No stored footprint meshes found, run the extraction with the mosaic enabled first.")
+    image_sizes = [load_mesh(mesh_path(output_3d_folder, image_file))[1] for image_file in image_files]
+    layout, transforms = image_transforms(image_files, image_sizes, input_folder, grid_columns)
+
+    # Corners of every image in map coordinates, their minimum is the origin of the mosaic
+    corners = [transform_points([(0, 0), (width, 0), (width, height), (0, height)], transform)
+               for (width, height), transform in zip(image_sizes, transforms)]
+    origin = min(corner[:, 0].min() for corner in corners), min(corner[:, 1].min() for corner in corners)
+    extent = max(max(corner[:, 0].max() - origin[0], corner[:, 1].max() - origin[1]) for corner in corners)
+    # Map units per pixel of the finest image, so no image gets chunks or simplification coarser than its own pixels
+    pixel_size = min(sqrt(abs(a * e - b * d)) for a, b, _, d, e, _ in transforms)
+    chunk_units = chunk_size * pixel_size
+    depth = max(0, ceil(log2(extent / chunk_units))) if extent > chunk_units else 0
+
+    # Buckets every building of the finest level by the chunk holding the centre of its bounds
+    chunks = {}
+    for image_file, transform in zip(image_files, transforms):
+        mesh, _ = load_mesh(mesh_path(output_3d_folder, image_file))
+        for building, (center_x, center_y) in mosaic_buildings(*mesh, transform, origin):
+            chunks.setdefault((int(center_x // chunk_units), int(center_y // chunk_units)), []).append(building)
+
+    mosaic_folder = path.join(output_3d_folder, MOSAIC_FOLDER)
+    makedirs(mosaic_folder, exist_ok=True)
+    writer = _QuadtreeWriter(mosaic_folder, export_format, chunk_units, depth, pixel_size)
+    writer.write_level(depth, chunks)
+    for level in range(depth - 1, -1, -1):
+        # Four chunks make one parent chunk, simplified a little more than its children
+        tolerance = LOD_TOLERANCE * pixel_size * 2 ** (depth - level - 1)
+        parents = {}
+        for (x, y), buildings in chunks.items():
+            parents.setdefault((x // 2, y // 2), []).extend(
+                simplify_building(building, tolerance) for building in buildings if building is not None)
+        chunks = parents
+        writer.write_level(level, chunks)
+
+    # One quad per image, numbered like the images of the index
+    writers = EXPORT_FORMATS[export_format]
+    imagery_file = f"mosaic_imagery{writers['extension']}"
+    writers["buildings"](path.join(mosaic_folder, imagery_file),
+                         *build_mesh([flatten_contours([corner - origin]) for corner in corners]), name_prefix="image")
+
+    index = {
+        "version": 1,
+        "format": export_format,
+        "layout": layout,
+        "origin": list(origin),
+        "pixel_size": pixel_size,
+        "chunk_size": chunk_units,
+        "depth": depth,
+        "imagery": imagery_file,
+        "images": [{"file": image_file, "size": list(size), "transform": list(transform)}
+                   for image_file, size, transform in zip(image_files, image_sizes, transforms)],
+        "root": "0/0/0" if "0/0/0" in writer.nodes else None,
+        "nodes": writer.nodes,
+    }
+    index_path = path.join(mosaic_folder, MOSAIC_INDEX)
+    with open(index_path + ".tmp", "w") as index_file:
+        dump(index, index_file, indent=1)
+    replace(index_path + ".tmp", index_path)
+    print(f"Mosaic of {len(image_files)} images written to {mosaic_folder} ({depth + 1} levels, {len(writer.nodes)} chunks).")
+    return index
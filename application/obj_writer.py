@@ -0,0 +1,104 @@
+# Streaming OBJ writer, formatting NumPy vertex and face buffers chunk by chunk into a buffered file.
+from os import getpid, remove, replace
+from threading import get_ident
+
+from numpy import integer, issubdtype, float64
+
+CHUNK_ROWS = 65536  # Vertices or faces formatted per write
+WRITE_BUFFER_BYTES = 1024 * 1024
+
+def _vertex_text(vertices):
+    """Format OBJ vertex lines, with Z written as 0, each ending with a newline."""
+    if issubdtype(vertices.dtype, integer):
+        # One format operation over Python ints, much faster than formatting NumPy scalars one by one
+        return ("v %d %d 0\n" * len(vertices)) % tuple(vertices[:, :2].ravel().tolist())
+    if vertices.dtype == float64:
+        # Python floats print exactly like float64 scalars
+        return ("v %r %r 0\n" * len(vertices)) % tuple(vertices[:, :2].ravel().tolist())
+    return "".join(f"v {pt[0]} {pt[1]} 0\n" for pt in vertices)
+
+def _face_text(face_offsets, first_index):
+    """Format OBJ ngon lines for faces spanning face_offsets, numbering vertices from first_index."""
+    sizes = (face_offsets[1:] - face_offsets[:-1]).tolist()
+    template = "".join("f " + " ".join(("%d",) * size) + "\n" for size in sizes)
+    first = first_index + int(face_offsets[0])
+    return template % tuple(range(first, first + int(face_offsets[-1] - face_offsets[0])))
+
+class ObjWriter:
+    """
+    Write OBJ meshes to a file without building the whole text in memory.
+
+    The file is written under a temporary name and renamed into place on close, so readers
+    never see a partially written OBJ, even when the process dies halfway.
+    """
+
+    def __init__(self, file_path, buffer_size=WRITE_BUFFER_BYTES):
+        self.file_path = file_path
+        self.vertex_count = 0
+        self._temp_path = f"{file_path}.{getpid()}.{get_ident()}.tmp"
+        self._file = open(self._temp_path, "w", buffering=buffer_size)
+
+    def write_object(self, vertices, face_offsets, name=None):
+        """
+        Append a mesh to the file.
+
+        Parameters:
+            vertices (numpy.ndarray): (N, 3) vertices of the mesh.
+            face_offsets (numpy.ndarray): (F + 1,) offsets into vertices, face i uses vertices face_offsets[i] to face_offsets[i + 1] - 1.
+            name (str): Object name written before the mesh, or None for no object line.
+        """
+        if name is not None:
+            self._file.write(f"o {name}\n")
+        for start in range(0, len(vertices), CHUNK_ROWS):
+            self._file.write(_vertex_text(vertices[start:start + CHUNK_ROWS]))
+
+        # Faces refer to vertices by their 1-based index in the whole file
+        first_index = self.vertex_count + 1 - int(face_offsets[0])
+        for start in range(0, len(face_offsets) - 1, CHUNK_ROWS):
+            self._file.write(_face_text(face_offsets[start:start + CHUNK_ROWS + 1], first_index))
+        self.vertex_count += len(vertices)
+
+    def close(self):
+        """Finish the file and move it into place."""
+        self._file.close()
+        replace(self._temp_path, self.file_path)
+
+    def abort(self):
+        """Discard the partially written file."""
+        self._file.close()
+        remove(self._temp_path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+def write_mesh_obj(file_path, vertices, face_offsets, name=None):
+    """Write a single mesh to an OBJ file."""
+    with ObjWriter(file_path) as writer:
+        writer.write_object(vertices, face_offsets, name)
+
+def write_buildings_obj(file_path, vertices, face_offsets, building_offsets, name_prefix="building"):
+    """
+    Write building footprints to an OBJ file, one named object per building.
+
+    Parameters:
+        file_path (str): Path of the OBJ file.
+        vertices (numpy.ndarray): (N, 3) vertices of all buildings.
+        face_offsets (numpy.ndarray): (F + 1,) vertex offsets of the faces, see make_geometry.build_mesh.
+        building_offsets (numpy.ndarray): (B + 1,) face offsets of the buildings.
+        name_prefix (str): Objects are named name_prefix_1, name_prefix_2, ... or left unnamed when None.
+    """
+    with ObjWriter(file_path) as writer:
+        if name_prefix is None:
+            writer.write_object(vertices, face_offsets)
+            return
+        for building in range(len(building_offsets) - 1):
+            first_face, last_face = int(building_offsets[building]), int(building_offsets[building + 1])
+            building_faces = face_offsets[first_face:last_face + 1]
+            writer.write_object(vertices[building_faces[0]:building_faces[-1]], building_faces,
+                                f"{name_prefix}_{building + 1}")
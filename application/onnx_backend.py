@@ -0,0 +1,227 @@
+# ONNX Runtime inference engine: exports the detection models to ONNX and runs them on the CPU behind the DefaultPredictor interface.
+from argparse import ArgumentParser
+from json import dump, load
+from os import environ, path
+import sys
+
+from numpy import arange, ascontiguousarray, asarray, ceil, clip, concatenate, floor, zeros, float32, int32, int64
+
+from compact_masks import CompactInstances, PackedMasks, crop_windows
+
+ENGINES = ("pytorch", "onnx")
+DEFAULT_ENGINE = "pytorch"
+ONNX_OPSET_VERSION = 16
+# Outputs of the exported model, before detectron2's post-processing: boxes and masks are in the resized image
+OUTPUT_NAMES = ("boxes", "scores", "classes", "masks")
+MASK_THRESHOLD = 0.5  # Same as detectron2's paste_masks_in_image
+
+def validate_engine(engine):
+    """Return the engine in lower case, raising ValueError when it is not one of ENGINES."""
+    engine = str(engine).lower()
+    if engine not in ENGINES:
+        raise ValueError(f"Unknown inference engine: {engine}, expected one of {', '.join(ENGINES)}.")
+    return engine
+
+def onnx_model_path(weights_path):
+    """Return the path of the ONNX export of a checkpoint, stored next to it."""
+    return path.splitext(weights_path)[0] + ".onnx"
+
+def metadata_path(onnx_path):
+    """Return the path of the preprocessing settings stored next to an ONNX model."""
+    return onnx_path + ".json"
+
+def require_onnx_model(onnx_path):
+    """Raise FileNotFoundError with the export command when an ONNX model hasn't been exported yet."""
+    if not path.isfile(onnx_path):
+        raise FileNotFoundError(f"No ONNX model at {onnx_path}. Export it first with: python onnx_backend.py")
+
+def resized_shape(height, width, short_edge, max_size):
+    """Return the (height, width) of an image resized like detectron2's ResizeShortestEdge."""
+    scale = short_edge / min(height, width)
+    new_height, new_width = (short_edge, scale * width) if height < width else (scale * height, short_edge)
+    if max(new_height, new_width) > max_size:
+        scale = max_size / max(new_height, new_width)
+        new_height, new_width = new_height * scale, new_width * scale
+    return int(new_height + 0.5), int(new_width + 0.5)
+
+def preprocess(img, metadata):
+    """
+    Prepare a BGR image for the exported model, as DefaultPredictor does.
+
+    Returns:
+        tuple: The float32 (3, height, width) model input and its (height, width).
+    """
+    from PIL import Image
+
+    if metadata["input_format"] == "RGB":
+        img = img[:, :, ::-1]
+    height, width = resized_shape(img.shape[0], img.shape[1], metadata["min_size"], metadata["max_size"])
+    if (height, width) != img.shape[:2]:
+        # detectron2 resizes uint8 images with PIL, the same interpolation keeps the predictions identical
+        img = asarray(Image.fromarray(ascontiguousarray(img)).resize((width, height), Image.BILINEAR))
+    return ascontiguousarray(img.astype(float32).transpose(2, 0, 1)), (height, width)
+
+def _interpolation_weights(positions, size):
+    """Return the (len(positions), size) bilinear sampling weights of positions in a row of size cells, zero outside."""
+    weights = zeros((len(positions), size), dtype=float32)
+    below = floor(positions).astype(int64)
+    fraction = (positions - below).astype(float32)
+    rows = arange(len(positions))
+    for cell, weight in ((below, 1 - fraction), (below + 1, fraction)):
+        inside = (cell >= 0) & (cell < size)
+        weights[rows[inside], cell[inside]] = weight[inside]
+    return weights
+
+def paste_mask(mask, box, window):
+    """
+    Paste a low resolution mask of probabilities into the crop window of its box.
+
+    Samples the mask at the pixel centres of the window like detectron2's paste_masks_in_image
+    (bilinear, zero outside the mask), as one separable matrix product.
+
+    Parameters:
+        mask (numpy.ndarray): (M, M) mask probabilities over the box.
+        box (numpy.ndarray): (x0, y0, x1, y1) box in the image.
+        window (tuple): (x0, y0, x1, y1) crop window in the image.
+
+    Returns:
+        numpy.ndarray: Boolean (y1 - y0, x1 - x0) mask of the window.
+    """
+    x0, y0, x1, y1 = (float(value) for value in box)
+    wx0, wy0, wx1, wy1 = window
+    columns = ((arange(wx0, wx1) + 0.5 - x0) / max(x1 - x0, 1e-6)) * mask.shape[1] - 0.5
+    rows = ((arange(wy0, wy1) + 0.5 - y0) / max(y1 - y0, 1e-6)) * mask.shape[0] - 0.5
+    probabilities = _interpolation_weights(rows, mask.shape[0]) @ mask.astype(float32) @ _interpolation_weights(columns, mask.shape[1]).T
+    pasted = probabilities >= MASK_THRESHOLD
+    # detectron2 only pastes within one pixel of the box
+    pasted[:, (arange(wx0, wx1) < floor(x0) - 1) | (arange(wx0, wx1) >= ceil(x1) + 1)] = False
+    pasted[(arange(wy0, wy1) < floor(y0) - 1) | (arange(wy0, wy1) >= ceil(y1) + 1)] = False
+    return pasted
+
+def postprocess(outputs, input_size, image_size):
+    """
+    Turn the outputs of the exported model into CompactInstances of the original image.
+
+    Boxes are scaled and clipped to the image and empty boxes are dropped, like detectron2's
+    detector_postprocess, then each mask is pasted into its crop window only.
+    """
+    boxes, scores, classes, masks = (asarray(output) for output in outputs)
+    height, width = image_size
+    boxes = boxes.astype(float32).reshape(-1, 4) * float32([width / input_size[1], height / input_size[0]] * 2)
+    boxes[:, 0::2] = clip(boxes[:, 0::2], 0, width)
+    boxes[:, 1::2] = clip(boxes[:, 1::2], 0, height)
+    keep = (boxes[:, 2] > boxes[:, 0]) & (boxes[:, 3] > boxes[:, 1])
+    boxes, scores, classes, masks = boxes[keep], scores[keep], classes[keep], masks[keep].reshape(int(keep.sum()), *masks.shape[-2:])
+
+    windows = crop_windows(boxes, image_size)
+    crops = [paste_mask(mask, box, window).ravel() for mask, box, window in zip(masks, boxes, windows.tolist())]
+    pixels = concatenate(crops) if crops else zeros(0, dtype=bool)
+    return CompactInstances(image_size, boxes, scores.astype(float32), classes.astype(int32),
+                            PackedMasks.from_pixels(image_size, windows, pixels))
+
+class OnnxPredictor:
+    """
+    Run an exported detection model with ONNX Runtime on the CPU.
+
+    Callable like detectron2's DefaultPredictor, returning {"instances": ...} for a BGR image, but
+    its instances are CompactInstances, and neither PyTorch nor detectron2 is needed.
+    """
+
+    def __init__(self, onnx_path, threads=None):
+        """
+        Parameters:
+            onnx_path (str): Exported model, see export_onnx_model.
+            threads (int): Intra-op threads, defaults to OMP_NUM_THREADS (set for worker processes) or all cores.
+        """
+        from onnxruntime import InferenceSession, SessionOptions
+
+        require_onnx_model(onnx_path)
+        with open(metadata_path(onnx_path), encoding="utf-8") as metadata_file:
+            self.metadata = load(metadata_file)
+        self.input_format = self.metadata["input_format"]
+        self.model_bytes = path.getsize(onnx_path)
+
+        options = SessionOptions()
+        options.intra_op_num_threads = threads or int(environ.get("OMP_NUM_THREADS", 0))
+        self.session = InferenceSession(onnx_path, options, providers=["CPUExecutionProvider"])
+
+    def predict_images(self, images):
+        """Run the model on BGR images one at a time, returning one {"instances": CompactInstances} per image."""
+        results = []
+        for img in images:
+            image, input_size = preprocess(img, self.metadata)
+            outputs = self.session.run(list(OUTPUT_NAMES), {"image": image})
+            results.append({"instances": postprocess(outputs, input_size, img.shape[:2])})
+        return results
+
+    def __call__(self, img):
+        return self.predict_images([img])[0]
+
+def export_onnx_model(config_path, weights_path, onnx_path, sample_image, opset_version=ONNX_OPSET_VERSION):
+    """
+    Export a detection model to ONNX by tracing it on a sample image.
+
+    The exported graph covers normalisation, the backbone, proposals, NMS and the heads. Mask
+    pasting and box rescaling stay outside (see postprocess), so the model accepts any image size.
+
+    Parameters:
+        config_path (str): Path to the detectron2 config file.
+        weights_path (str): Path to the model weights.
+        onnx_path (str): Output path of the ONNX model, its preprocessing settings are written next to it.
+        sample_image (numpy.ndarray): BGR image to trace the model with, ideally with a few buildings in it.
+        opset_version (int): ONNX opset of the export.
+    """
+    import torch
+    from predictor_registry import build_predictor
+    from batch_inference import preprocess_image
+
+    predictor = build_predictor(config_path, weights_path, "cpu")
+    model = predictor.model.eval()
+
+    class ExportedModel(torch.nn.Module):
+        def __init__(self):
+            super().__init__()
+            self.model = model
+
+        def forward(self, image):
+            # do_postprocess=False returns the boxes in the resized image and the masks as box-relative probabilities
+            instances = model.inference([{"image": image}], do_postprocess=False)[0]
+            return instances.pred_boxes.tensor, instances.scores, instances.pred_classes, instances.pred_masks
+
+    image = preprocess_image(predictor, sample_image)["image"]
+    instance_axes = {0: "instances"}
+    with torch.no_grad():
+        torch.onnx.export(ExportedModel(), (image,), onnx_path, opset_version=opset_version, input_names=["image"],
+                          output_names=list(OUTPUT_NAMES),
+                          dynamic_axes={"image": {1: "height", 2: "width"}, **{name: instance_axes for name in OUTPUT_NAMES}})
+
+    metadata = {"input_format": predictor.input_format, "min_size": int(predictor.cfg.INPUT.MIN_SIZE_TEST),
+                "max_size": int(predictor.cfg.INPUT.MAX_SIZE_TEST), "config": path.basename(config_path),
+                "weights": path.basename(weights_path)}
+    with open(metadata_path(onnx_path), "w", encoding="utf-8") as metadata_file:
+        dump(metadata, metadata_file, indent=2)
+
+def main(argv=None):
+    """Export the prebuilt models to ONNX, next to their checkpoints."""
+    from cv2 import imread
+    from predictor_registry import MODEL_PATHS
+
+    parser = ArgumentParser(description="Export the prebuilt detection models to ONNX for the ONNX Runtime engine.")
+    parser.add_argument("--model", type=int, action="append", choices=sorted(MODEL_PATHS),
+                        help="Model number to export, repeatable (default: every prebuilt model).")
+    parser.add_argument("--sample-image", required=True, help="Image to trace the models with, ideally showing a few buildings.")
+    args = parser.parse_args(argv)
+
+    sample_image = imread(args.sample_image)
+    if sample_image is None:
+        print(f"Cannot read the sample image {args.sample_image}.", file=sys.stderr)
+        return 2
+    for model_selection in args.model or sorted(MODEL_PATHS):
+        weights_path, config_path = MODEL_PATHS[model_selection]
+        onnx_path = onnx_model_path(weights_path)
+        print(f"Exporting model {model_selection} to {onnx_path}")
+        export_onnx_model(config_path, weights_path, onnx_path, sample_image)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
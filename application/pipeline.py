@@ -0,0 +1,164 @@
+# Staged processing pipeline, overlapping image decoding, inference, post-processing and file writes.
+from queue import Queue, Empty, Full
+from threading import Thread, Event
+from time import perf_counter
+
+DEFAULT_QUEUE_SIZE = 4  # Items buffered between two adjacent stages, keeps memory use flat
+
+_END = object()  # Marks the end of the item stream between stages
+_POLL_SECONDS = 0.1
+
+class PipelineStage:
+    """
+    One stage of the pipeline, running its function on a dedicated thread.
+
+    When batch_size is None the function is called with a single item and returns a single item.
+    Otherwise it is called with a list of up to batch_size items and returns a list of items.
+    """
+
+    def __init__(self, name, function, batch_size=None):
+        self.name = name
+        self.function = function
+        self.batch_size = batch_size
+        self.items = 0
+        self.busy_seconds = 0.0
+
+def _put(queue, item, stop_event):
+    """Put an item on a bounded queue, giving up if the pipeline is stopped."""
+    while not stop_event.is_set():
+        try:
+            queue.put(item, timeout=_POLL_SECONDS)
+            return True
+        except Full:
+            continue
+    return False
+
+def _get(queue, stop_event):
+    """Get an item from a queue, returning _END if the pipeline is stopped."""
+    while not stop_event.is_set():
+        try:
+            return queue.get(timeout=_POLL_SECONDS)
+        except Empty:
+            continue
+    return _END
+
+def _feed(items, out_queue, stop_event, errors):
+    """Feed the source items into the first stage."""
+    try:
+        for item in items:
+            if not _put(out_queue, item, stop_event):
+                return
+    except BaseException as e:
+        errors.append(e)
+        stop_event.set()
+    finally:
+        _put(out_queue, _END, stop_event)
+
+def _run_stage(stage, in_queue, out_queue, stop_event, errors):
+    """Process items from the input queue until the end of the stream."""
+    finished = False
+    try:
+        while not finished:
+            # Collect a single item, or up to a full batch for batched stages
+            batch = []
+            while len(batch) < (stage.batch_size or 1):
+                item = _get(in_queue, stop_event)
+                if item is _END:
+                    finished = True
+                    break
+                batch.append(item)
+            if not batch:
+                break
+
+            start = perf_counter()
+            if stage.batch_size is None:
+                results = [stage.function(batch[0])]
+            else:
+                results = stage.function(batch)
+            stage.busy_seconds += perf_counter() - start
+            stage.items += len(batch)
+
+            for result in results:
+                if out_queue is not None and not _put(out_queue, result, stop_event):
+                    return
+    except BaseException as e:
+        errors.append(e)
+        stop_event.set()
+    finally:
+        if out_queue is not None:
+            _put(out_queue, _END, stop_event)
+
+def run_pipeline(items, stages, queue_size=DEFAULT_QUEUE_SIZE):
+    """
+    Run items through the stages, each on its own thread, joined by bounded queues.
+
+    The outputs of the last stage are discarded, so it should write its results itself.
+    If any stage raises, the whole pipeline stops and the first error is re-raised.
+
+    Parameters:
+        items (iterable): Source items fed to the first stage.
+        stages (list): PipelineStage instances, in processing order.
+        queue_size (int): Maximum number of items waiting between two adjacent stages.
+
+    Returns:
+        list: Per-stage statistics (see stage_statistics).
+    """
+    stop_event = Event()
+    errors = []
+    queues = [Queue(maxsize=queue_size) for _ in stages]
+
+    threads = [Thread(target=_feed, args=(items, queues[0], stop_event, errors), daemon=True)]
+    for i, stage in enumerate(stages):
+        out_queue = queues[i + 1] if i + 1 < len(stages) else None
+        threads.append(Thread(target=_run_stage, args=(stage, queues[i], out_queue, stop_event, errors),
+                              name=f"pipeline-{stage.name}", daemon=True))
+
+    start = perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall_seconds = perf_counter() - start
+
+    if errors:
+        raise errors[0]
+
+    return stage_statistics(stages, wall_seconds)
+
+def stage_statistics(stages, wall_seconds):
+    """Summarise how busy each stage was over the run. The busiest stage is the bottleneck."""
+    return [
+        {
+            "stage": stage.name,
+            "items": stage.items,
+            "busy_seconds": stage.busy_seconds,
+            "wall_seconds": wall_seconds,
+            "utilisation": stage.busy_seconds / wall_seconds if wall_seconds > 0 else 0.0,
+        }
+        for stage in stages
+    ]
+
+def merge_stage_statistics(all_statistics):
+    """Merge the stage statistics of several pipelines (e.g. one per worker process) stage by stage."""
+    merged = {}
+    for statistics in all_statistics:
+        for stats in statistics:
+            total = merged.setdefault(stats["stage"], {"stage": stats["stage"], "items": 0, "busy_seconds": 0.0, "wall_seconds": 0.0})
+            total["items"] += stats["items"]
+            total["busy_seconds"] += stats["busy_seconds"]
+            total["wall_seconds"] += stats["wall_seconds"]
+    for total in merged.values():
+        total["utilisation"] = total["busy_seconds"] / total["wall_seconds"] if total["wall_seconds"] > 0 else 0.0
+    return list(merged.values())
+
+def format_stage_report(statistics):
+    """Format the stage statistics as a human readable report, flagging the bottleneck stage."""
+    if not statistics:
+        return "No pipeline stages were run."
+    bottleneck = max(statistics, key=lambda stats: stats["utilisation"])
+    lines = ["Pipeline stage utilisation:"]
+    for stats in statistics:
+        marker = "  <-- bottleneck" if stats is bottleneck else ""
+        lines.append(f"  {stats['stage']:<14} {stats['utilisation']:6.1%} busy, "
+                     f"{stats['items']} items in {stats['busy_seconds']:.2f}s{marker}")
+    return "\n".join(lines)
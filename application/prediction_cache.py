@@ -0,0 +1,224 @@
+# On-disk cache of model predictions, keyed by the image contents, the model and the inference settings.
+from hashlib import sha256
+from os import path, makedirs, listdir, remove, replace, utime, getpid
+from threading import Lock, get_ident
+
+from numpy import array, float32, int32, int64, packbits, unpackbits, concatenate, cumsum, load, savez_compressed, uint8, zeros
+
+from tiling import SceneInstance
+from compact_masks import CompactInstances, PackedMasks
+
+DEFAULT_CACHE_FOLDER = "./prediction_cache"
+DEFAULT_CACHE_MAX_BYTES = 2 * 1024 * 1024 * 1024
+CACHE_EXTENSION = ".npz"
+_HASH_CHUNK_BYTES = 1024 * 1024
+
+# Fingerprints of model files, keyed by (path, size, modification time) so weights are hashed once per process
+_file_digests = {}
+_file_digests_lock = Lock()
+
+def file_digest(file_path):
+    """Return the SHA-256 hex digest of a file's contents, reading it in chunks."""
+    digest = sha256()
+    with open(file_path, "rb") as file:
+        for chunk in iter(lambda: file.read(_HASH_CHUNK_BYTES), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def model_fingerprint(weights_path, config_path, *model_files):
+    """
+    Return a digest identifying the model weights and config, memoized while the files are unchanged.
+
+    model_files are further files the predictions depend on, such as the ONNX export of the weights.
+    """
+    parts = []
+    for file_path in (weights_path, config_path) + model_files:
+        stat_key = (path.abspath(file_path), path.getsize(file_path), path.getmtime(file_path))
+        with _file_digests_lock:
+            if stat_key not in _file_digests:
+                _file_digests[stat_key] = file_digest(file_path)
+            parts.append(_file_digests[stat_key])
+    return sha256("".join(parts).encode()).hexdigest()
+
+def prediction_key(image_digest, model_digest, settings):
+    """
+    Build the cache key of an image's predictions.
+
+    Parameters:
+        image_digest (str): Digest of the image file contents.
+        model_digest (str): Digest of the model weights and config (see model_fingerprint).
+        settings (dict): Inference settings affecting the predictions (score threshold, tiling, ...).
+
+    Returns:
+        str: Hex digest used as the cache entry name.
+    """
+    settings_text = ";".join(f"{name}={settings[name]}" for name in sorted(settings))
+    return sha256(f"{image_digest}|{model_digest}|{settings_text}".encode()).hexdigest()
+
+def encode_instances(instances):
+    """Encode CompactInstances as arrays, their packed masks stored as they are."""
+    return {
+        "kind": array("compact_instances"),
+        "image_size": array(instances.image_size, dtype=int64),
+        "boxes": instances.boxes.astype(float32).reshape(-1, 4),
+        "scores": instances.scores.astype(float32),
+        "classes": instances.classes.astype(int32),
+        "windows": instances.masks.windows,
+        "masks": instances.masks.bits,
+    }
+
+def decode_instances(arrays):
+    """Rebuild the CompactInstances encoded by encode_instances."""
+    image_size = tuple(int(size) for size in arrays["image_size"])
+    masks = PackedMasks(image_size, arrays["windows"], arrays["masks"])
+    return CompactInstances(image_size, arrays["boxes"], arrays["scores"], arrays["classes"], masks)
+
+def encode_scene_instances(scene_instances):
+    """Encode the SceneInstances of a tiled scene as compact arrays, bit-packing each box-cropped mask."""
+    packed_masks = [packbits(instance.mask, axis=None) for instance in scene_instances]
+    return {
+        "kind": array("scene_instances"),
+        "boxes": array([instance.box for instance in scene_instances], dtype=int64).reshape(-1, 4),
+        "scores": array([instance.score for instance in scene_instances], dtype=float32),
+        "classes": array([instance.class_id for instance in scene_instances], dtype=int32),
+        "masks": concatenate(packed_masks) if packed_masks else zeros(0, dtype=uint8),
+        "mask_offsets": cumsum([0] + [len(packed) for packed in packed_masks]).astype(int64),
+    }
+
+def decode_scene_instances(arrays):
+    """Rebuild the SceneInstances encoded by encode_scene_instances."""
+    scene_instances = []
+    offsets = arrays["mask_offsets"]
+    for i, box in enumerate(arrays["boxes"]):
+        x0, y0, x1, y1 = (int(value) for value in box)
+        bits = unpackbits(arrays["masks"][offsets[i]:offsets[i + 1]], count=(y1 - y0) * (x1 - x0))
+        mask = bits.reshape(y1 - y0, x1 - x0).astype(bool)
+        scene_instances.append(SceneInstance((x0, y0, x1, y1), mask, float(arrays["scores"][i]), int(arrays["classes"][i])))
+    return scene_instances
+
+def encode_predictions(predictions):
+    """Encode either CompactInstances or a list of SceneInstances."""
+    if isinstance(predictions, list):
+        return encode_scene_instances(predictions)
+    return encode_instances(predictions)
+
+def decode_predictions(arrays):
+    """Decode arrays written by encode_predictions back into CompactInstances or SceneInstances."""
+    if str(arrays["kind"]) == "scene_instances":
+        return decode_scene_instances(arrays)
+    return decode_instances(arrays)
+
+def write_arrays(file_path, arrays):
+    """Write arrays to a compressed .npz file atomically, so readers never see a partially written file."""
+    temp_path = f"{file_path}.{getpid()}.{get_ident()}.tmp"
+    with open(temp_path, "wb") as file:
+        savez_compressed(file, **arrays)
+    replace(temp_path, file_path)
+
+def read_arrays(file_path):
+    """Read all the arrays of a .npz file into a dict."""
+    with load(file_path) as entry:
+        return {name: entry[name] for name in entry.files}
+
+def save_predictions(file_path, predictions):
+    """Store CompactInstances or SceneInstances in a compact .npz file (see encode_predictions)."""
+    write_arrays(file_path, encode_predictions(predictions))
+
+def load_predictions(file_path):
+    """Load the predictions stored by save_predictions."""
+    return decode_predictions(read_arrays(file_path))
+
+class PredictionCache:
+    """
+    Content-addressed on-disk cache of compact predictions.
+
+    Each entry is one compressed .npz file named after its key. When the folder grows past
+    max_bytes, the least recently used entries (by file modification time, refreshed on
+    every hit) are removed. Entries are written atomically, so several worker processes
+    can share a cache folder.
+    """
+
+    def __init__(self, folder=DEFAULT_CACHE_FOLDER, max_bytes=DEFAULT_CACHE_MAX_BYTES):
+        self.folder = folder
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = Lock()
+        makedirs(folder, exist_ok=True)
+        self._approx_bytes = sum(size for _, size, _ in self._entries())
+
+    def _entry_path(self, key):
+        return path.join(self.folder, key + CACHE_EXTENSION)
+
+    def get(self, key):
+        """Return the cached arrays for a key, or None on a miss."""
+        entry_path = self._entry_path(key)
+        try:
+            arrays = read_arrays(entry_path)
+            utime(entry_path)  # Mark as most recently used
+        except (FileNotFoundError, OSError, ValueError):
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+        return arrays
+
+    def put(self, key, arrays):
+        """Store the arrays for a key, then evict old entries if the cache is over its size cap."""
+        entry_path = self._entry_path(key)
+        write_arrays(entry_path, arrays)
+
+        with self._lock:
+            self._approx_bytes += path.getsize(entry_path)
+            if self._approx_bytes > self.max_bytes:
+                self._evict()
+
+    def _entries(self):
+        """Return (modification time, size, path) for every entry in the cache folder."""
+        entries = []
+        for name in listdir(self.folder):
+            if not name.endswith(CACHE_EXTENSION):
+                continue
+            entry_path = path.join(self.folder, name)
+            try:
+                entries.append((path.getmtime(entry_path), path.getsize(entry_path), entry_path))
+            except FileNotFoundError:
+                continue  # Removed by another process
+        return entries
+
+    def _evict(self):
+        """Remove the least recently used entries until the cache fits its size cap."""
+        # The folder is only scanned once the running total says the cap may be exceeded
+        entries = self._entries()
+        total_bytes = sum(size for _, size, _ in entries)
+        for _, size, entry_path in sorted(entries):
+            if total_bytes <= self.max_bytes:
+                break
+            try:
+                remove(entry_path)
+                self.evictions += 1
+            except FileNotFoundError:
+                pass
+            total_bytes -= size
+        self._approx_bytes = total_bytes
+
+    def statistics(self):
+        """Return the hit, miss and eviction counts of this cache instance."""
+        return {"hits": self.hits, "misses": self.misses, "evictions": self.evictions}
+
+def merge_cache_statistics(all_statistics):
+    """Sum the cache statistics of several runs (e.g. one per worker process)."""
+    merged = {"hits": 0, "misses": 0, "evictions": 0}
+    for statistics in all_statistics:
+        for name in merged:
+            merged[name] += statistics[name]
+    return merged
+
+def format_cache_report(statistics):
+    """Format cache statistics as a one line report."""
+    lookups = statistics["hits"] + statistics["misses"]
+    hit_rate = statistics["hits"] / lookups if lookups else 0.0
+    return (f"Prediction cache: {statistics['hits']} hits, {statistics['misses']} misses "
+            f"({hit_rate:.0%} hit rate), {statistics['evictions']} evictions.")
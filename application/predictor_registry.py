@@ -0,0 +1,180 @@
+# Process-wide registry of loaded detection models, shared between extraction runs.
+from collections import OrderedDict
+from threading import Lock
+
+from quantization import quantize_model, DEFAULT_PRECISION
+from onnx_backend import OnnxPredictor, onnx_model_path, DEFAULT_ENGINE
+from resolution_presets import apply_preset, DEFAULT_PRESET
+
+# Model weights and config files for each model selection in the GUI
+MODEL_PATHS = {
+    1: ("./prebuilt_detect_models/model_roboflow_default_2k_iter/model_trained_default_set.pth",
+        "./config/mask_rcnn_R_101_FPN_3x_2k_iter.yaml"),
+    2: ("./prebuilt_detect_models/model_roboflow_optimized_5k_iter/model_optimized_5k_iter.pth",
+        "./config/mask_rcnn_R_101_FPN_3x_5k_iter.yaml"),
+}
+DEFAULT_MODEL_PATHS = ("./prebuilt_detect_models/model_roboflow_default_2k_iter/model_trained_default_set.pth",
+                       "./config/mask_rcnn_R_101_FPN_3x_5k_iter.yaml")
+
+NUM_CLASSES = 3  # Adjust based on your model's training
+
+# Upper bound on the combined size of the cached model weights (a R-101 FPN model is roughly 250 MB)
+DEFAULT_MEMORY_BUDGET_BYTES = 1024 * 1024 * 1024
+
+def select_device(preferred=None):
+    """
+    Pick the device to run the model on.
+
+    Parameters:
+        preferred (str): Optional device requested by the user (e.g. "cuda", "cuda:1" or "cpu").
+
+    Returns:
+        str: The requested CUDA device (or "cuda") when a GPU is available, otherwise "cpu".
+    """
+    if preferred is not None and not preferred.startswith("cuda"):
+        return preferred  # Without asking torch, so CPU runs of other engines don't need it
+
+    from torch.cuda import is_available
+
+    if is_available():
+        return preferred or "cuda"
+    if preferred is not None:
+        print("CUDA was requested but no GPU is available, running inference on the CPU instead.")
+    return "cpu"
+
+def get_model_paths(model_selection):
+    """Return the (weights path, config path) pair for the selected model."""
+    return MODEL_PATHS.get(model_selection, DEFAULT_MODEL_PATHS)
+
+def build_predictor(config_path, weights_path, device, score_threshold=None, nms_threshold=None, precision=DEFAULT_PRECISION, engine=DEFAULT_ENGINE, preset=DEFAULT_PRESET, num_classes=NUM_CLASSES):
+    """
+    Build a detectron2 DefaultPredictor from a config file and model weights, quantized for "int8" precision (CPU only).
+
+    The resolution preset overrides the input size, proposal counts and detections per image of the config.
+
+    The "onnx" engine instead loads the ONNX export of the weights (see onnx_backend), which runs
+    on the CPU without PyTorch, with the thresholds and resolution the model was exported with.
+    """
+    if engine == "onnx":
+        return OnnxPredictor(onnx_model_path(weights_path))
+
+    from detectron2.config import get_cfg
+    from detectron2.engine import DefaultPredictor
+
+    cfg = get_cfg()
+    cfg.MODEL.DEVICE = device
+    cfg.merge_from_file(config_path)
+    cfg.MODEL.WEIGHTS = weights_path  # Set the model weights path
+    cfg.MODEL.ROI_HEADS.NUM_CLASSES = num_classes  # Set the number of classes
+    if score_threshold is not None:
+        cfg.MODEL.ROI_HEADS.SCORE_THRESH_TEST = score_threshold
+    if nms_threshold is not None:
+        cfg.MODEL.ROI_HEADS.NMS_THRESH_TEST = nms_threshold
+    apply_preset(cfg, preset)
+
+    predictor = DefaultPredictor(cfg)
+    if precision == "int8":
+        predictor.model = quantize_model(predictor.model)
+    return predictor
+
+def estimate_predictor_bytes(predictor):
+    """Estimate the memory held by a predictor from the size of its parameters and buffers."""
+    model = getattr(predictor, "model", None)
+    if model is None:
+        return getattr(predictor, "model_bytes", 0)  # ONNX Runtime sessions, sized by their model file
+    tensors = list(model.parameters()) + list(model.buffers())
+    # Dynamically quantized layers (see quantization.quantize_model) keep their weights packed, outside the parameters
+    for module in model.modules():
+        if hasattr(module, "_packed_params") and callable(getattr(module, "weight", None)):
+            tensors += [tensor for tensor in (module.weight(), module.bias()) if tensor is not None]
+    return sum(tensor.numel() * tensor.element_size() for tensor in tensors)
+
+class PredictorRegistry:
+    """
+    Keep loaded predictors around between runs so that the model weights are only loaded once.
+
+    Predictors are keyed by (model_selection, config path, weights path, device, thresholds, precision, engine, preset).
+    When the combined size of the cached predictors exceeds the memory budget, the least
+    recently used predictors are evicted. The registry is safe to use from the extraction thread.
+    """
+
+    def __init__(self, memory_budget=DEFAULT_MEMORY_BUDGET_BYTES, factory=build_predictor, size_estimator=estimate_predictor_bytes):
+        self.memory_budget = memory_budget
+        self.factory = factory
+        self.size_estimator = size_estimator
+        self._predictors = OrderedDict()  # key -> (predictor, size in bytes), oldest first
+        self._lock = Lock()
+        self.builds = 0
+        self.hits = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self._predictors)
+
+    def __contains__(self, key):
+        return key in self._predictors
+
+    @staticmethod
+    def make_key(model_selection, config_path, weights_path, device, score_threshold=None, nms_threshold=None, precision=DEFAULT_PRECISION, engine=DEFAULT_ENGINE, preset=DEFAULT_PRESET):
+        """Build the registry key for a predictor configuration."""
+        return (model_selection, config_path, weights_path, device, (score_threshold, nms_threshold), precision, engine, preset)
+
+    @property
+    def used_bytes(self):
+        """Combined estimated size of all cached predictors."""
+        return sum(size for _, size in self._predictors.values())
+
+    def get(self, model_selection, config_path, weights_path, device, score_threshold=None, nms_threshold=None, precision=DEFAULT_PRECISION, engine=DEFAULT_ENGINE, preset=DEFAULT_PRESET):
+        """
+        Return a cached predictor for the given configuration, building it on first use.
+
+        Parameters:
+            model_selection (int): Selected model index.
+            config_path (str): Path to the detectron2 config file.
+            weights_path (str): Path to the model weights.
+            device (str): Device to run the model on ("cuda" or "cpu").
+            score_threshold (float): Optional ROI heads score threshold.
+            nms_threshold (float): Optional ROI heads NMS threshold.
+            precision (str): "fp32", or "int8" for a dynamically quantized model on the CPU (see quantization).
+            engine (str): "pytorch", or "onnx" for the ONNX Runtime export of the model (see onnx_backend).
+            preset (str): Resolution preset of the model input, one of resolution_presets.PRESETS.
+
+        Returns:
+            DefaultPredictor: The loaded predictor.
+        """
+        key = self.make_key(model_selection, config_path, weights_path, device, score_threshold, nms_threshold, precision, engine, preset)
+
+        with self._lock:
+            if key in self._predictors:
+                self._predictors.move_to_end(key)  # Mark as most recently used
+                self.hits += 1
+                return self._predictors[key][0]
+
+            # Build under the lock so two runs never load the same weights twice
+            predictor = self.factory(config_path, weights_path, device, score_threshold, nms_threshold, precision, engine, preset)
+            self.builds += 1
+            self._predictors[key] = (predictor, self.size_estimator(predictor))
+            self._evict()
+            return predictor
+
+    def _evict(self):
+        """Drop least recently used predictors until the cache fits the budget, always keeping the newest one."""
+        while len(self._predictors) > 1 and self.used_bytes > self.memory_budget:
+            key, _ = self._predictors.popitem(last=False)
+            self.evictions += 1
+            print(f"Evicted cached model {key[2]} on {key[3]} to stay within the memory budget.")
+
+    def clear(self):
+        """Remove all cached predictors."""
+        with self._lock:
+            self._predictors.clear()
+
+# Registry shared by every extraction run in this process (including the GUI run thread)
+PREDICTOR_REGISTRY = PredictorRegistry()
+
+def get_predictor(model_selection, device, score_threshold=None, nms_threshold=None, registry=None, precision=DEFAULT_PRECISION, engine=DEFAULT_ENGINE, preset=DEFAULT_PRESET):
+    """Return the predictor for a model selection from the shared registry."""
+    if registry is None:
+        registry = PREDICTOR_REGISTRY
+    weights_path, config_path = get_model_paths(model_selection)
+    return registry.get(model_selection, config_path, weights_path, device, score_threshold, nms_threshold, precision, engine, preset)
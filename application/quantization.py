@@ -0,0 +1,33 @@
+# Reduced precision inference: INT8 dynamic quantization of the detection models for CPU-only nodes.
+PRECISIONS = ("fp32", "int8")
+DEFAULT_PRECISION = "fp32"
+
+def validate_precision(precision):
+    """Return the precision in lower case, raising ValueError when it is not one of PRECISIONS."""
+    precision = str(precision).lower()
+    if precision not in PRECISIONS:
+        raise ValueError(f"Unknown inference precision: {precision}, expected one of {', '.join(PRECISIONS)}.")
+    return precision
+
+def quantize_model(model, inplace=True):
+    """
+    Quantize the fully connected layers of a model to INT8, for inference on the CPU.
+
+    The weights are stored as INT8 and the activations are quantized on the fly (dynamic
+    quantization), so no calibration data is needed. PyTorch only quantizes Linear layers
+    dynamically, which in Mask R-CNN are the box head and the box predictor, by far the
+    largest layers by weight. Convolutions stay in FP32, static quantization of the
+    backbone would need calibration and a traceable model.
+
+    Parameters:
+        model (torch.nn.Module): Model in evaluation mode, on the CPU.
+        inplace (bool): Replace the layers of model itself, rather than of a copy.
+
+    Returns:
+        torch.nn.Module: The quantized model.
+    """
+    from torch import qint8
+    from torch.nn import Linear
+    from torch.ao.quantization import quantize_dynamic
+
+    return quantize_dynamic(model.eval(), {Linear}, dtype=qint8, inplace=inplace)
@@ -0,0 +1,182 @@
+# Windowed access to input rasters, so large scenes are never decoded into memory all at once.
+from math import ceil
+from os import path
+
+from cv2 import imread, resize, cvtColor, INTER_AREA, COLOR_GRAY2BGR, COLOR_RGB2BGR, COLOR_RGBA2BGR
+from numpy import uint8, uint16, empty, clip
+from tifffile import TiffFile, memmap
+
+TIFF_EXTENSIONS = (".tif", ".tiff")
+WORLD_FILE_EXTENSIONS = (".wld", ".tfw", ".tifw", ".jgw", ".jpgw", ".pgw", ".pngw")
+# GeoTIFF tags, see the GeoTIFF specification
+MODEL_PIXEL_SCALE_TAG = 33550
+MODEL_TIEPOINT_TAG = 33922
+MODEL_TRANSFORMATION_TAG = 34264
+PREVIEW_BAND_ROWS = 1024  # Rows decoded at a time when building a preview of a large raster
+
+def to_bgr_uint8(pixels):
+    """Convert decoded raster pixels (grayscale, RGB or RGBA, 8 or 16 bit) to an 8 bit BGR image."""
+    if pixels.dtype == uint16:
+        pixels = (pixels >> 8).astype(uint8)
+    elif pixels.dtype != uint8:
+        pixels = clip(pixels, 0, 255).astype(uint8)
+
+    if pixels.ndim == 2 or pixels.shape[2] == 1:
+        return cvtColor(pixels, COLOR_GRAY2BGR)
+    if pixels.shape[2] == 4:
+        return cvtColor(pixels, COLOR_RGBA2BGR)
+    return cvtColor(pixels[:, :, :3], COLOR_RGB2BGR)
+
+class ArrayRasterSource:
+    """In-memory raster, used for JPEG/PNG images which cannot be decoded window by window."""
+
+    def __init__(self, img):
+        self.img = img
+        self.height, self.width = img.shape[:2]
+
+    @classmethod
+    def from_file(cls, file_path):
+        img = imread(file_path)
+        if img is None:
+            raise ValueError(f"Image could not be read: {file_path}")
+        return cls(img)
+
+    def read(self, window=None):
+        """Return the (x0, y0, x1, y1) window of the image in BGR order, or the whole image."""
+        if window is None:
+            return self.img
+        x0, y0, x1, y1 = window
+        return self.img[y0:y1, x0:x1]
+
+    def read_preview(self, max_side):
+        """Return a copy of the image downscaled so its longest side is at most max_side pixels."""
+        scale = min(1.0, max_side / max(self.height, self.width))
+        if scale == 1.0:
+            return self.img.copy()
+        size = (max(1, round(self.width * scale)), max(1, round(self.height * scale)))
+        return resize(self.img, size, interpolation=INTER_AREA)
+
+    def close(self):
+        self.img = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+class TiffRasterSource:
+    """
+    TIFF/BigTIFF (including GeoTIFF) raster read one window at a time.
+
+    Uncompressed contiguous rasters are memory-mapped. Tiled and stripped rasters only
+    decode the tiles or strips intersecting the requested window.
+    """
+
+    def __init__(self, file_path):
+        self.file_path = file_path
+        self._tiff = TiffFile(file_path)
+        self._page = self._tiff.pages[0]
+        self.height, self.width = self._page.shape[:2]
+        self._memmap = memmap(file_path) if self._page.is_memmappable else None
+
+        if self._memmap is None and self._page.planarconfig != 1:
+            # Separate colour planes are stored as separate segments, decode the page once instead
+            print(f"Warning: {path.basename(file_path)} stores separate colour planes and will be decoded in full.")
+            self._memmap = self._page.asarray()
+
+        self._chunk_height, self._chunk_width = self._page.chunks[0], self._page.chunks[1]
+        self._chunk_columns = ceil(self.width / self._chunk_width)
+
+    def read(self, window=None):
+        """Return the (x0, y0, x1, y1) window of the raster in BGR order, or the whole raster."""
+        x0, y0, x1, y1 = window if window is not None else (0, 0, self.width, self.height)
+        if self._memmap is not None:
+            return to_bgr_uint8(self._memmap[y0:y1, x0:x1])
+
+        samples = self._page.samplesperpixel
+        pixels = empty((y1 - y0, x1 - x0, samples), dtype=self._page.dtype)
+        file_handle = self._tiff.filehandle
+
+        # Decode only the tiles (or strips) intersecting the window
+        for row in range(y0 // self._chunk_height, ceil(y1 / self._chunk_height)):
+            for column in range(x0 // self._chunk_width, ceil(x1 / self._chunk_width)):
+                index = row * self._chunk_columns + column
+                file_handle.seek(self._page.dataoffsets[index])
+                data = file_handle.read(self._page.databytecounts[index])
+                segment, indices, _ = self._page.decode(data, index, jpegtables=self._page.jpegtables)
+                segment = segment[0]  # Segments are decoded as (depth, height, width, samples)
+                seg_y, seg_x = indices[-3], indices[-2]
+
+                # Copy the part of the segment that overlaps the window
+                top, left = max(y0, seg_y), max(x0, seg_x)
+                bottom = min(y1, seg_y + segment.shape[0], self.height)
+                right = min(x1, seg_x + segment.shape[1], self.width)
+                pixels[top - y0:bottom - y0, left - x0:right - x0] = segment[top - seg_y:bottom - seg_y, left - seg_x:right - seg_x]
+
+        return to_bgr_uint8(pixels)
+
+    def read_preview(self, max_side):
+        """Return the raster subsampled so its longest side is at most max_side pixels, decoding one band at a time."""
+        step = max(1, ceil(max(self.height, self.width) / max_side))
+        band_rows = max(step, PREVIEW_BAND_ROWS // step * step)  # Whole multiples of the step keep rows aligned
+        preview = empty((ceil(self.height / step), ceil(self.width / step), 3), dtype=uint8)
+        for y in range(0, self.height, band_rows):
+            band = self.read((0, y, self.width, min(y + band_rows, self.height)))[::step, ::step]
+            preview[y // step:y // step + band.shape[0]] = band
+        return preview
+
+    def close(self):
+        self._memmap = None
+        self._tiff.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+def open_raster(file_path):
+    """Open an input image for windowed reading, memory-mapping or chunk-reading TIFFs when possible."""
+    if file_path.lower().endswith(TIFF_EXTENSIONS):
+        return TiffRasterSource(file_path)
+    return ArrayRasterSource.from_file(file_path)
+
+def read_world_file(file_path):
+    """
+    Read the affine transform of a world file (.tfw, .jgw, .pgw, .wld, ...).
+
+    World files give the map coordinates of the centre of the top left pixel, the returned
+    transform maps pixel corners instead, like read_georeference.
+    """
+    with open(file_path) as world_file:
+        a, d, b, e, c, f = (float(line) for line in world_file.read().split()[:6])
+    return (a, b, c - (a + b) / 2, d, e, f - (d + e) / 2)
+
+def read_georeference(file_path):
+    """
+    Return the affine transform from pixel to map coordinates of an image, or None when it is not georeferenced.
+
+    The transform (a, b, c, d, e, f) maps the pixel corner (x, y) to the map coordinates
+    (a * x + b * y + c, d * x + e * y + f). It comes from a world file next to the image,
+    or from the GeoTIFF tags of TIFF images.
+    """
+    stem = path.splitext(file_path)[0]
+    for extension in WORLD_FILE_EXTENSIONS:
+        for world_path in (stem + extension, stem + extension.upper()):
+            if path.isfile(world_path):
+                return read_world_file(world_path)
+
+    if not file_path.lower().endswith(TIFF_EXTENSIONS):
+        return None
+    with TiffFile(file_path) as tiff:
+        tags = tiff.pages[0].tags
+        if MODEL_TRANSFORMATION_TAG in tags:
+            matrix = tags[MODEL_TRANSFORMATION_TAG].value
+            return (matrix[0], matrix[1], matrix[3], matrix[4], matrix[5], matrix[7])
+        if MODEL_PIXEL_SCALE_TAG in tags and MODEL_TIEPOINT_TAG in tags:
+            scale_x, scale_y = tags[MODEL_PIXEL_SCALE_TAG].value[:2]
+            i, j, _, x, y = tags[MODEL_TIEPOINT_TAG].value[:5]
+            # Map Y grows northwards while rows grow downwards
+            return (scale_x, 0.0, x - i * scale_x, 0.0, -scale_y, y + j * scale_y)
+    return None
@@ -0,0 +1,56 @@
+# Speed/accuracy presets of the model input resolution, proposal counts and detections per image, with their measured cost and accuracy.
+from json import load
+from os import path
+
+# Overrides of the model config per preset. Balanced keeps the settings the models were trained and evaluated with.
+PRESETS = {
+    "fast": {"INPUT.MIN_SIZE_TEST": 512, "INPUT.MAX_SIZE_TEST": 853, "MODEL.RPN.PRE_NMS_TOPK_TEST": 500,
+             "MODEL.RPN.POST_NMS_TOPK_TEST": 300, "MODEL.ROI_HEADS.DETECTIONS_PER_IMAGE": 100},
+    "balanced": {},
+    # Crowded city blocks can hold more than the 100 detections per image of the default config
+    "accurate": {"INPUT.MIN_SIZE_TEST": 1024, "INPUT.MAX_SIZE_TEST": 1707, "MODEL.RPN.PRE_NMS_TOPK_TEST": 2000,
+                 "MODEL.RPN.POST_NMS_TOPK_TEST": 1000, "MODEL.ROI_HEADS.DETECTIONS_PER_IMAGE": 300},
+}
+DEFAULT_PRESET = "balanced"
+
+# Latency and AP of each model and preset, written by train_new_model/benchmark_resolution_presets.py
+PRESET_MEASUREMENTS_PATH = "./prebuilt_detect_models/resolution_presets.json"
+
+def validate_preset(preset):
+    """Return the preset in lower case, raising ValueError when it is not one of PRESETS."""
+    preset = str(preset).lower()
+    if preset not in PRESETS:
+        raise ValueError(f"Unknown resolution preset: {preset}, expected one of {', '.join(PRESETS)}.")
+    return preset
+
+def apply_preset(cfg, preset):
+    """Set the config options of a preset on a detectron2 config, before the predictor is built from it."""
+    for key, value in PRESETS[preset].items():
+        node = cfg
+        *parents, name = key.split(".")
+        for parent in parents:
+            node = getattr(node, parent)
+        setattr(node, name, value)
+    return cfg
+
+def load_preset_measurements(measurements_path=PRESET_MEASUREMENTS_PATH):
+    """
+    Load the measured latency and AP of the presets.
+
+    Returns:
+        dict: {model number (str): {preset: {"latency_ms", "bbox_AP", "segm_AP", ...}}}, empty when they were never measured.
+    """
+    if not path.isfile(measurements_path):
+        return {}
+    with open(measurements_path, encoding="utf-8") as measurements_file:
+        return load(measurements_file)
+
+def describe_preset(preset, model_selection, measurements):
+    """Return the label of a preset, with its measured latency and mask AP for the model when known."""
+    label = f"{preset.capitalize()}"
+    if PRESETS[preset]:
+        label += f" ({PRESETS[preset]['INPUT.MIN_SIZE_TEST']} px)"
+    measured = measurements.get(str(model_selection), {}).get(preset)
+    if not measured:
+        return label + ", not measured"
+    return label + f", {measured['latency_ms']:.0f} ms, mask AP {measured['segm_AP']:.1f}"
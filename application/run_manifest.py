@@ -0,0 +1,84 @@
+# Append-only manifest of the images completed by an extraction run, used to resume interrupted runs.
+from json import dumps, loads
+from os import path, open as open_file, write, fsync, close, remove, O_WRONLY, O_APPEND, O_CREAT
+from time import time
+
+from prediction_cache import file_digest
+
+MANIFEST_NAME = "run_manifest.jsonl"
+
+class RunManifest:
+    """
+    Record of the images an extraction run has finished, one JSON line per image.
+
+    A line is only appended once all outputs of the image are written, and each line is
+    appended in a single write and flushed to disk, so the manifest survives crashes and
+    reboots. A line cut short by a crash is ignored, and its image processed again.
+    Each line is written with its leading newline in that same write, so records never join
+    a line cut short, nor the records other worker processes append to the same manifest.
+    """
+
+    def __init__(self, folder, settings=None):
+        self.file_path = path.join(folder, MANIFEST_NAME)
+        # Compared with the settings loaded back from the JSON lines, so tuples and int keys must go through JSON too
+        self.settings = loads(dumps(settings or {}))
+
+    def reset(self):
+        """Start a new manifest, forgetting the images completed by previous runs."""
+        if path.exists(self.file_path):
+            remove(self.file_path)
+
+    def record(self, image_file, output_files):
+        """
+        Record an image as completed.
+
+        Parameters:
+            image_file (str): File name of the processed image.
+            output_files (list): Paths of all the files written for the image.
+        """
+        entry = {
+            "image": image_file,
+            "settings": self.settings,
+            "outputs": {path.abspath(output_file): file_digest(output_file) for output_file in output_files},
+            "time": time(),
+        }
+        # Starts with its newline rather than ending with it, as a line cut short by a crash has none
+        line = ("\n" + dumps(entry)).encode()
+        descriptor = open_file(self.file_path, O_WRONLY | O_APPEND | O_CREAT, 0o644)
+        try:
+            write(descriptor, line)
+            fsync(descriptor)
+        finally:
+            close(descriptor)
+
+    def entries(self):
+        """Return the latest complete manifest entry of each image."""
+        if not path.exists(self.file_path):
+            return {}
+        entries = {}
+        with open(self.file_path, encoding="utf-8") as manifest_file:
+            for line in manifest_file:
+                if not line.strip():
+                    continue  # Lines start with their newline, so the manifest starts with an empty line
+                try:
+                    entry = loads(line)
+                except ValueError:
+                    continue  # Line cut short by a crash
+                entries[entry["image"]] = entry
+        return entries
+
+    def completed_images(self):
+        """
+        Return the images completed with the current settings whose outputs are all intact.
+
+        Images whose outputs are missing or were only partly written (checksum mismatch)
+        are left out, so a resumed run processes them again.
+        """
+        completed = set()
+        for image_file, entry in self.entries().items():
+            if entry["settings"] != self.settings:
+                continue
+            if all(path.isfile(output_file) and file_digest(output_file) == digest
+                   for output_file, digest in entry["outputs"].items()):
+                completed.add(image_file)
+        return completed
@@ -0,0 +1,119 @@
+# Stand-in for the detection model: deterministic synthetic predictions after a simulated inference delay, to profile the pipeline without weights.
+from time import perf_counter, sleep
+from zlib import crc32
+
+from cv2 import ellipse
+from numpy import asarray, ndarray, zeros, float32, int64, uint8
+from numpy.random import default_rng
+
+from predictor_registry import NUM_CLASSES
+
+DEFAULT_BUILDINGS_PER_MEGAPIXEL = 100  # A dense city block at the resolution of the sample imagery
+DEFAULT_INFERENCE_DELAY = 0.0  # Seconds per image
+
+class HostTensor(ndarray):
+    """NumPy array with the few torch tensor methods the pipeline calls on model outputs."""
+
+    def element_size(self):
+        return self.itemsize
+
+    def numel(self):
+        return self.size
+
+    def to(self, device):
+        return self
+
+    def numpy(self):
+        return self.view(ndarray)
+
+class SyntheticBoxes:
+    """Stand-in for detectron2 Boxes."""
+
+    def __init__(self, tensor):
+        self.tensor = tensor
+
+class SyntheticInstances:
+    """
+    Stand-in for detectron2 Instances on the CPU, with full-frame masks as Mask R-CNN outputs them.
+
+    Only implements what the pipeline reads: the predicted fields, their sizes, len and
+    boolean indexing (see instance_filter.filter_instances).
+    """
+
+    def __init__(self, image_size, boxes, scores, classes, masks):
+        self.image_size = image_size
+        self.pred_boxes = SyntheticBoxes(asarray(boxes, dtype=float32).reshape(-1, 4).view(HostTensor))
+        self.scores = asarray(scores, dtype=float32).view(HostTensor)
+        self.pred_classes = asarray(classes, dtype=int64).view(HostTensor)
+        self.pred_masks = asarray(masks, dtype=bool).view(HostTensor)
+
+    def get_fields(self):
+        return {"pred_boxes": self.pred_boxes, "scores": self.scores, "pred_classes": self.pred_classes,
+                "pred_masks": self.pred_masks}
+
+    def __len__(self):
+        return len(self.scores)
+
+    def __getitem__(self, keep):
+        return SyntheticInstances(self.image_size, self.pred_boxes.tensor[keep], self.scores[keep], self.pred_classes[keep],
+                                  self.pred_masks[keep])
+
+class StubPredictor:
+    """
+    Predictor returning synthetic buildings instead of running a model.
+
+    The same image always gives the same predictions, whatever the batch or the worker it is
+    in: the random generator is seeded with the image pixels. Scores are spread between 0.05
+    and 1, so the score filtering drops some of the detections as it would for a real model.
+    Plug it into extract_features through the factory of a PredictorRegistry.
+    """
+
+    def __init__(self, buildings_per_megapixel=DEFAULT_BUILDINGS_PER_MEGAPIXEL, inference_delay=DEFAULT_INFERENCE_DELAY, seed=0):
+        """
+        Parameters:
+            buildings_per_megapixel (float): Density of the synthetic buildings.
+            inference_delay (float): Seconds slept per image, standing in for the model.
+            seed (int): Varies the predictions of every image.
+        """
+        self.buildings_per_megapixel = buildings_per_megapixel
+        self.inference_delay = inference_delay
+        self.seed = seed
+        self.input_format = "BGR"
+        self.seconds = 0.0  # Spent in predict_images, standing in for the model rather than the pipeline
+
+    def predict(self, img):
+        """Return the synthetic buildings of one BGR image as SyntheticInstances."""
+        height, width = img.shape[:2]
+        rng = default_rng([self.seed, crc32(img[::16, ::16].tobytes())])
+        count = int(round(self.buildings_per_megapixel * height * width / 1e6))
+
+        half_sizes = rng.integers(4, 40, size=(count, 2))
+        centres = rng.integers(0, (width, height), size=(count, 2))
+        angles = rng.uniform(0, 180, size=count)
+        masks = zeros((count, height, width), dtype=uint8)
+        boxes = zeros((count, 4), dtype=float32)
+        for i in range(count):
+            x, y = (int(value) for value in centres[i])
+            reach = int(half_sizes[i].max())
+            ellipse(masks[i], (x, y), tuple(int(value) for value in half_sizes[i]), float(angles[i]), 0, 360, 1, -1)
+            # Boxes bound the drawn masks, as Mask R-CNN boxes roughly bound its masks
+            x0, y0 = max(x - reach, 0), max(y - reach, 0)
+            crop = masks[i, y0:y + reach + 1, x0:x + reach + 1]
+            rows, columns = crop.any(axis=1).nonzero()[0], crop.any(axis=0).nonzero()[0]
+            if len(rows):
+                boxes[i] = (x0 + columns[0], y0 + rows[0], x0 + columns[-1] + 1, y0 + rows[-1] + 1)
+        scores = rng.uniform(0.05, 1.0, size=count)
+        classes = rng.integers(0, NUM_CLASSES, size=count)
+        return SyntheticInstances((height, width), boxes, scores, classes, masks.view(bool))
+
+    def predict_images(self, images):
+        """Return one {"instances": SyntheticInstances} per image, after the simulated inference delay."""
+        start = perf_counter()
+        if self.inference_delay:
+            sleep(self.inference_delay * len(images))
+        outputs = [{"instances": self.predict(img)} for img in images]
+        self.seconds += perf_counter() - start
+        return outputs
+
+    def __call__(self, img):
+        return self.predict_images([img])[0]
@@ -0,0 +1,46 @@
+import numpy as np
+import pytest
+
+from annotation_renderer import label_map, render_annotation, should_annotate
+
+@pytest.fixture
+def scene():
+    img = np.zeros((100, 200, 3), dtype=np.uint8)
+    img[:, :, 2] = 200  # Red image, so grayscale and tinted pixels are easy to tell apart
+    masks = np.zeros((2, 100, 200), dtype=bool)
+    masks[0, 20:60, 20:80] = True
+    masks[1, 40:80, 60:120] = True
+    boxes = np.array([[20, 20, 79, 59], [60, 40, 119, 79]], dtype=float)
+    return img, masks, boxes
+
+def test_label_map_keeps_the_last_instance_on_overlaps(scene):
+    _, masks, _ = scene
+    labels = label_map(masks)
+
+    assert labels[30, 30] == 0
+    assert labels[50, 70] == 1  # Covered by both masks
+    assert labels[90, 150] == -1
+
+def test_annotation_is_gray_outside_and_tinted_inside_instances(scene):
+    img, masks, boxes = scene
+    annotated = render_annotation(img, masks, boxes, np.array([0.9, 0.8]), np.array([0, 0]), scale=1.0)
+
+    assert annotated.shape == img.shape
+    background = annotated[95, 190]
+    assert background[0] == background[1] == background[2]  # Grayscale
+    inside = annotated[30, 40]
+    assert not inside[0] == inside[1] == inside[2]
+
+@pytest.mark.parametrize("scale, shape", [(0.8, (80, 160, 3)), (0.25, (25, 50, 3))])
+def test_annotation_is_rendered_at_reduced_scale(scene, scale, shape):
+    img, masks, boxes = scene
+    assert render_annotation(img, masks, boxes, np.array([0.9, 0.8]), np.array([0, 0]), scale).shape == shape
+
+def test_image_without_instances_is_rendered_in_grayscale(scene):
+    img, _, _ = scene
+    annotated = render_annotation(img, np.zeros((0, 100, 200), dtype=bool), np.zeros((0, 4)), np.zeros(0), np.zeros(0), 1.0)
+    assert (annotated[:, :, 0] == annotated[:, :, 2]).all()
+
+def test_every_nth_image_is_annotated():
+    assert [should_annotate(index, 3) for index in range(7)] == [True, False, False, True, False, False, True]
+    assert not any(should_annotate(index, 0) for index in range(5))
@@ -0,0 +1,46 @@
+import io
+import json
+import subprocess
+import sys
+
+import pytest
+
+from batch_cli import load_job_spec, main, JsonLinesReporter
+
+FOLDERS = {"input_folder": "in", "output_2d_folder": "out_2d", "output_3d_folder": "out_3d"}
+
+def test_job_spec_defaults_are_filled_in():
+    job_spec = load_job_spec(dict(FOLDERS, workers=4))
+
+    assert job_spec["workers"] == 4
+    assert job_spec["model"] == 1
+    assert job_spec["post_processing"] == "Simplify Contours"
+    assert job_spec["format"] == "OBJ"
+    assert job_spec["resume"] is False
+
+@pytest.mark.parametrize("spec", [
+    {"input_folder": "in", "output_2d_folder": "out_2d"},  # Missing folder
+    dict(FOLDERS, wokers=2),  # Misspelled setting
+    dict(FOLDERS, batch_size=0),
+])
+def test_invalid_job_specs_are_rejected(spec):
+    with pytest.raises(ValueError):
+        load_job_spec(spec)
+
+def test_invalid_command_line_job_exits_with_usage_error(capsys):
+    assert main(["--input", "in"]) == 2
+    assert "Missing job settings" in capsys.readouterr().err
+
+def test_json_lines_reporter_writes_one_event_per_line():
+    stream = io.StringIO()
+    reporter = JsonLinesReporter(stream)
+    reporter({"event": "progress", "completed": 1, "total": 2})
+    reporter({"event": "done", "images": 2})
+
+    events = [json.loads(line) for line in stream.getvalue().splitlines()]
+    assert [event["event"] for event in events] == ["progress", "done"]
+
+def test_importing_the_cli_loads_no_gui_modules():
+    code = "import sys, batch_cli; print(sorted(m for m in ('tkinter', 'customtkinter', 'user_interface') if m in sys.modules))"
+    result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+    assert result.stdout.strip() == "[]"
@@ -0,0 +1,58 @@
+import numpy as np
+import pytest
+
+torch = pytest.importorskip("torch")
+
+from batch_inference import iter_batches, predict_batch
+
+class HalvingTransform:
+    def apply_image(self, img):
+        return img[::2, ::2]
+
+class HalvingResize:
+    def get_transform(self, img):
+        return HalvingTransform()
+
+class RecordingModel:
+    """Model stub returning one output per input and recording each forward call."""
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, inputs):
+        self.calls.append(len(inputs))
+        return [{"instances": (np.asarray(x["image"]).shape, np.asarray(x["image"]).sum(axis=(1, 2)).tolist(), x["height"], x["width"])}
+                for x in inputs]
+
+class FakePredictor:
+    def __init__(self, input_format="BGR"):
+        self.input_format = input_format
+        self.aug = HalvingResize()
+        self.model = RecordingModel()
+
+    def __call__(self, original_image):
+        # Same steps as detectron2's DefaultPredictor.__call__
+        if self.input_format == "RGB":
+            original_image = original_image[:, :, ::-1]
+        height, width = original_image.shape[:2]
+        image = self.aug.get_transform(original_image).apply_image(original_image)
+        image = torch.as_tensor(image.astype("float32").transpose(2, 0, 1))
+        inputs = {"image": image, "height": height, "width": width}
+        return self.model([inputs])[0]
+
+def test_iter_batches():
+    assert list(iter_batches([1, 2, 3, 4, 5], 2)) == [[1, 2], [3, 4], [5]]
+    assert list(iter_batches([1, 2], 8)) == [[1, 2]]
+    with pytest.raises(ValueError):
+        list(iter_batches([1, 2], 0))
+
+@pytest.mark.parametrize("input_format", ["BGR", "RGB"])
+def test_batch_matches_single_image_outputs(input_format):
+    rng = np.random.default_rng(0)
+    images = [rng.integers(0, 255, size=(h, w, 3), dtype=np.uint8) for h, w in [(32, 48), (64, 40), (20, 20)]]
+    predictor = FakePredictor(input_format)
+
+    single_outputs = [predictor(img) for img in images]
+    batch_outputs = predict_batch(predictor, images)
+
+    assert batch_outputs == single_outputs
+    assert predictor.model.calls == [1, 1, 1, 3]  # the whole batch went through one forward call
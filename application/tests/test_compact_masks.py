@@ -0,0 +1,64 @@
+import numpy as np
+import pytest
+
+from compact_masks import PackedMasks, CompactInstances, crop_windows, mask_crop_window
+from annotation_renderer import label_map
+from detect_buildings import process_contours
+
+def crowded_masks(count=40, shape=(120, 160), seed=0):
+    """Random masks of rectangular buildings with ragged edges, and their boxes."""
+    rng = np.random.default_rng(seed)
+    masks = np.zeros((count,) + shape, dtype=bool)
+    boxes = []
+    for i in range(count):
+        x0, y0 = rng.integers(0, shape[1] - 20), rng.integers(0, shape[0] - 20)
+        x1, y1 = x0 + rng.integers(3, 20), y0 + rng.integers(3, 20)
+        masks[i, y0:y1, x0:x1] = rng.random((y1 - y0, x1 - x0)) > 0.2
+        rows, columns = masks[i].any(axis=1).nonzero()[0], masks[i].any(axis=0).nonzero()[0]
+        boxes.append((columns[0], rows[0], columns[-1], rows[-1]))
+    return masks, np.array(boxes, dtype=np.float32)
+
+def test_crop_windows_match_the_single_box_window():
+    boxes = np.array([[1.5, 0.0, 198.7, 99.0], [50.2, 40.9, 60.1, 45.0], [-0.5, 3.2, 0.4, 7.9]])
+    windows = crop_windows(boxes, (100, 200), margin=2)
+    assert windows.tolist() == [list(mask_crop_window(box, (100, 200), margin=2)) for box in boxes]
+
+def test_masks_unpack_to_the_original_dense_masks():
+    masks, boxes = crowded_masks()
+    packed = PackedMasks.from_dense(masks, crop_windows(boxes, masks.shape[1:]))
+
+    assert all(np.array_equal(packed.dense(i), masks[i]) for i in range(len(masks)))
+    assert packed.nbytes < masks.nbytes / 20
+
+def test_label_map_matches_the_dense_label_map():
+    masks, boxes = crowded_masks()
+    packed = PackedMasks.from_dense(masks, crop_windows(boxes, masks.shape[1:]))
+    assert np.array_equal(packed.label_map(), label_map(masks))
+
+def test_selection_keeps_the_selected_masks():
+    masks, boxes = crowded_masks()
+    packed = PackedMasks.from_dense(masks, crop_windows(boxes, masks.shape[1:]))
+    keep = np.arange(len(masks)) % 3 == 1
+
+    selected = packed.select(keep)
+
+    assert len(selected) == keep.sum()
+    assert all(np.array_equal(selected.dense(j), masks[i]) for j, i in enumerate(np.flatnonzero(keep)))
+
+def test_empty_masks():
+    packed = PackedMasks.from_dense(np.zeros((0, 10, 10), dtype=bool), np.zeros((0, 4), dtype=np.int64))
+    assert len(packed) == 0 and packed.area == 0
+    assert (packed.label_map() == -1).all()
+    assert len(packed.select(np.zeros(0, dtype=bool))) == 0
+
+@pytest.mark.parametrize("algorithm", ["Simplify Contours", "Convex Hulls"])
+def test_packed_contours_match_the_dense_mask_contours(algorithm):
+    masks, boxes = crowded_masks()
+    instances = CompactInstances(masks.shape[1:], boxes, np.ones(len(boxes)), np.zeros(len(boxes)),
+                                 PackedMasks.from_dense(masks, crop_windows(boxes, masks.shape[1:])))
+
+    for i, window in enumerate(instances.masks.windows.tolist()):
+        packed = process_contours(instances.masks.crop(i), algorithm, offset=tuple(window[:2]))
+        dense = process_contours(masks[i], algorithm, boxes[i])
+        assert len(packed) == len(dense)
+        assert all(np.array_equal(a, b) for a, b in zip(packed, dense))
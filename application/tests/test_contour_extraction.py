@@ -0,0 +1,28 @@
+import numpy as np
+import pytest
+
+from detect_buildings import process_contours, mask_crop_window
+
+def building_mask(shape, window):
+    x0, y0, x1, y1 = window
+    mask = np.zeros(shape, dtype=bool)
+    mask[y0:y1, x0:x1] = True
+    mask[y0 + 2:y0 + 5, x0:x0 + 3] = False  # Notch, so simplification has something to do
+    return mask
+
+@pytest.mark.parametrize("algorithm", ["Simplify Contours", "Smooth Contours", "Convex Hulls"])
+@pytest.mark.parametrize("window", [(40, 30, 90, 70), (0, 0, 25, 20), (170, 80, 200, 100)])
+def test_cropped_contours_match_full_frame(algorithm, window):
+    mask = building_mask((100, 200), window)
+    box = (window[0], window[1], window[2] - 1, window[3] - 1)
+
+    full = process_contours(mask, algorithm)
+    cropped = process_contours(mask, algorithm, box)
+
+    assert len(full) == len(cropped)
+    for full_contour, cropped_contour in zip(full, cropped):
+        assert np.array_equal(full_contour, cropped_contour)
+
+def test_crop_window_is_clipped_to_the_mask():
+    assert mask_crop_window((1.5, 0.0, 198.7, 99.0), (100, 200), margin=2) == (0, 0, 200, 100)
+    assert mask_crop_window((50.2, 40.9, 60.1, 45.0), (100, 200), margin=2) == (48, 38, 63, 47)
@@ -3,7 +3,7 @@ import pytest
 
 # List of dependencies to test
 required_modules = [
-    'cv2', 'numpy', 'customtkinter', 'detectron2', 'PIL', 'os', 'sys', 'warnings'
+    'cv2', 'numpy', 'customtkinter', 'detectron2', 'PIL', 'tifffile', 'os', 'sys', 'warnings'
 ]
 
 def test_dependencies():
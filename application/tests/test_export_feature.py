@@ -0,0 +1,138 @@
+import json
+import struct
+
+import numpy as np
+import pytest
+
+from make_geometry import flatten_contours, build_mesh, imagery_mesh
+from export_feature import (EXPORT_FORMATS, write_mesh_glb, write_buildings_glb, write_mesh_ply, write_buildings_ply,
+                            _atomic_file, GLB_MAGIC, GLB_JSON_CHUNK, GLB_BIN_CHUNK)
+
+def read_glb(file_path):
+    """Parse a GLB file into its JSON document and binary chunk."""
+    data = file_path.read_bytes()
+    magic, version, length = struct.unpack_from("<III", data, 0)
+    assert (magic, version, length) == (GLB_MAGIC, 2, len(data))
+    json_length, json_type = struct.unpack_from("<II", data, 12)
+    assert json_type == GLB_JSON_CHUNK and json_length % 4 == 0
+    document = json.loads(data[20:20 + json_length])
+    binary = b""
+    if 20 + json_length < len(data):
+        binary_length, binary_type = struct.unpack_from("<II", data, 20 + json_length)
+        assert binary_type == GLB_BIN_CHUNK
+        binary = data[28 + json_length:28 + json_length + binary_length]
+    return document, binary
+
+def read_ply(file_path):
+    """Parse a binary PLY file written by export_feature into its header lines, vertices and faces."""
+    data = file_path.read_bytes()
+    header_end = data.index(b"end_header\n") + len(b"end_header\n")
+    header = data[:header_end].decode("ascii").splitlines()
+    vertex_count = int(next(line for line in header if line.startswith("element vertex")).split()[-1])
+    face_count = int(next(line for line in header if line.startswith("element face")).split()[-1])
+    count_format = {"uchar": "<B", "ushort": "<H", "uint": "<I"}[next(line for line in header if "vertex_indices" in line).split()[2]]
+    has_building = "property int building" in header
+
+    vertices = np.frombuffer(data, dtype="<f4", count=vertex_count * 3, offset=header_end).reshape(-1, 3)
+    position = header_end + vertices.nbytes
+    faces = []
+    for _ in range(face_count):
+        (size,) = struct.unpack_from(count_format, data, position)
+        position += struct.calcsize(count_format)
+        indices = list(struct.unpack_from(f"<{size}i", data, position))
+        position += 4 * size
+        building = None
+        if has_building:
+            (building,) = struct.unpack_from("<i", data, position)
+            position += 4
+        faces.append((indices, building))
+    assert position == len(data)
+    return header, vertices, faces
+
+@pytest.fixture
+def footprints():
+    l_shape = np.array([[0, 0], [20, 0], [20, 10], [10, 10], [10, 20], [0, 20]])
+    square = np.array([[30, 30], [40, 30], [40, 40], [30, 40]])
+    return build_mesh([flatten_contours([l_shape]), flatten_contours([square, square + 20])])
+
+def glb_accessor(document, binary, index):
+    """Read an accessor of a GLB file as a flat array."""
+    accessor = document["accessors"][index]
+    view = document["bufferViews"][accessor["bufferView"]]
+    dtype = {5123: "<u2", 5125: "<u4", 5126: "<f4"}[accessor["componentType"]]
+    width = {"SCALAR": 1, "VEC3": 3}[accessor["type"]]
+    return np.frombuffer(binary, dtype=dtype, count=accessor["count"] * width, offset=view["byteOffset"])
+
+def test_glb_is_one_mesh_with_the_building_of_each_vertex(tmp_path, footprints):
+    vertices, face_offsets, building_offsets = footprints
+    file_path = tmp_path / "image_footprints.glb"
+
+    write_buildings_glb(str(file_path), vertices, face_offsets, building_offsets, name_prefix="image_building")
+
+    document, binary = read_glb(file_path)
+    assert document["nodes"] == [{"name": "image_building", "mesh": 0}]
+    primitive = document["meshes"][0]["primitives"][0]
+    positions = glb_accessor(document, binary, primitive["attributes"]["POSITION"]).reshape(-1, 3)
+    assert positions.tolist() == vertices.tolist()
+    assert document["accessors"][0]["min"] == [0, 0, 0] and document["accessors"][0]["max"] == [60, 60, 0]
+    buildings = glb_accessor(document, binary, primitive["attributes"]["_BUILDING"])
+    assert buildings.tolist() == [1] * 6 + [2] * 8
+
+    # The L shape needs 4 triangles and each square 2, none of them spanning two buildings
+    triangles = glb_accessor(document, binary, primitive["indices"]).reshape(-1, 3)
+    assert len(triangles) == 8
+    assert all(len(set(buildings[triangle].tolist())) == 1 for triangle in triangles)
+
+def test_glb_without_buildings_is_an_empty_scene(tmp_path):
+    file_path = tmp_path / "empty.glb"
+    write_buildings_glb(str(file_path), *build_mesh([]))
+    document, binary = read_glb(file_path)
+    assert document["scenes"] == [{"nodes": []}] and binary == b""
+
+def test_glb_imagery_is_two_triangles(tmp_path):
+    file_path = tmp_path / "image_imagery.glb"
+    write_mesh_glb(str(file_path), *imagery_mesh(640, 480), name="image_imagery")
+    document, _ = read_glb(file_path)
+    assert document["nodes"] == [{"name": "image_imagery", "mesh": 0}]
+    assert document["accessors"][document["meshes"][0]["primitives"][0]["indices"]]["count"] == 6
+
+def test_ply_keeps_polygons_and_building_numbers(tmp_path, footprints):
+    vertices, face_offsets, building_offsets = footprints
+    file_path = tmp_path / "image_footprints.ply"
+
+    write_buildings_ply(str(file_path), vertices, face_offsets, building_offsets, name_prefix="image_building")
+
+    header, positions, faces = read_ply(file_path)
+    assert "format binary_little_endian 1.0" in header
+    assert positions.tolist() == vertices.tolist()
+    assert faces == [(list(range(6)), 1), (list(range(6, 10)), 2), (list(range(10, 14)), 2)]
+
+def test_ply_large_faces_use_a_wider_count_type(tmp_path):
+    circle = np.zeros((300, 3), dtype=np.int32)
+    circle[:, 0] = np.arange(300)
+    file_path = tmp_path / "large.ply"
+
+    write_mesh_ply(str(file_path), circle, np.array([0, 300]), name="large")
+
+    header, _, faces = read_ply(file_path)
+    assert "property list ushort int vertex_indices" in header
+    assert faces == [(list(range(300)), None)]
+
+def test_failed_writes_leave_no_file_behind(tmp_path):
+    file_path = tmp_path / "broken.glb"
+    with pytest.raises(RuntimeError):
+        with _atomic_file(str(file_path)) as output_file:
+            output_file.write(b"partial")
+            raise RuntimeError("disk full")
+    assert list(tmp_path.iterdir()) == []
+
+@pytest.mark.parametrize("export_format", sorted(EXPORT_FORMATS))
+def test_every_format_writes_imagery_and_footprints(tmp_path, footprints, export_format):
+    writers = EXPORT_FORMATS[export_format]
+    imagery_path = tmp_path / f"image_imagery{writers['extension']}"
+    footprints_path = tmp_path / f"image_footprints{writers['extension']}"
+
+    writers["mesh"](str(imagery_path), *imagery_mesh(64, 48), name="image_imagery")
+    writers["buildings"](str(footprints_path), *footprints, name_prefix="image_building")
+
+    assert sorted(tmp_path.iterdir()) == sorted([imagery_path, footprints_path])
@@ -0,0 +1,60 @@
+import pytest
+
+from extract_log import ExtractLog, ImageTimer, summarize_records, format_timing_report
+
+def make_timer(image, **timings):
+    timer = ImageTimer(image)
+    for stage, seconds in timings.items():
+        timer.add(stage, seconds)
+    return timer
+
+def test_repeated_stages_add_up():
+    timer = ImageTimer("a.png")
+    timer.add("contours", 0.25)
+    with timer.measure("contours"):
+        pass
+    timer.add("contours", 0.5)
+
+    assert timer.record["timings"]["contours"] == pytest.approx(0.75, abs=0.01)
+
+def test_log_only_returns_the_records_of_its_run(tmp_path):
+    previous = ExtractLog(str(tmp_path), "previous")
+    current = ExtractLog(str(tmp_path), "current")
+    previous.record(make_timer("a.png", decode=0.1))
+    current.record(make_timer("b.png", decode=0.2, inference=0.3), cached=False)
+
+    records = current.records()
+
+    assert [record["image"] for record in records] == ["b.png"]
+    assert records[0]["total_seconds"] == pytest.approx(0.5)
+    assert records[0]["cached"] is False
+
+    current.reset()
+    assert current.records() == [] and previous.records() == []
+
+def test_truncated_line_is_skipped(tmp_path):
+    log = ExtractLog(str(tmp_path), "run")
+    log.record(make_timer("a.png", decode=0.1))
+    with open(log.file_path, "a", encoding="utf-8") as log_file:
+        log_file.write('{"image": "b.png", "tim')
+
+    assert len(log.records()) == 1
+
+def test_summary_percentiles_and_slowest_images(tmp_path):
+    log = ExtractLog(str(tmp_path), "run")
+    for index in range(100):
+        log.record(make_timer(f"{index:03d}.png", inference=(index + 1) / 100, write_footprints=0.01))
+
+    summary = summarize_records(log.records(), slowest=3)
+
+    assert summary["images"] == 100
+    assert summary["stages"]["inference"]["p50"] == pytest.approx(0.505)
+    assert summary["stages"]["inference"]["p99"] == pytest.approx(0.9901)
+    assert summary["stages"]["write_footprints"]["p95"] == pytest.approx(0.01)
+    assert [image for image, _ in summary["slowest"]] == ["099.png", "098.png", "097.png"]
+
+    report = format_timing_report(summary)
+    assert "inference" in report and "099.png" in report
+
+def test_empty_run_report():
+    assert format_timing_report(summarize_records([])) == "No image timings were recorded."
@@ -0,0 +1,35 @@
+import pytest
+
+from inference_pool import split_shards, default_threads_per_worker, run_inference_pool, report_image_done
+
+def echo_shard(shard, suffix):
+    """Shard function standing in for model inference in the worker processes."""
+    for image_file in shard:
+        report_image_done(image_file)
+    return [image_file + suffix for image_file in shard]
+
+def test_split_shards_covers_every_image_once():
+    image_files = [f"tile_{i}.jpg" for i in range(10)]
+    shards = split_shards(image_files, 3)
+
+    assert len(shards) == 3
+    assert sorted(f for shard in shards for f in shard) == sorted(image_files)
+    assert max(map(len, shards)) - min(map(len, shards)) <= 1
+
+def test_split_shards_never_returns_empty_shards():
+    assert split_shards(["a.jpg", "b.jpg"], 4) == [["a.jpg"], ["b.jpg"]]
+    with pytest.raises(ValueError):
+        split_shards(["a.jpg"], 0)
+
+def test_default_threads_per_worker_is_at_least_one():
+    assert default_threads_per_worker(1) >= 1
+    assert default_threads_per_worker(10_000) == 1
+
+def test_pool_merges_results_and_progress():
+    image_files = [f"tile_{i}.jpg" for i in range(6)]
+    progress = []
+    results = run_inference_pool(image_files, ("_done",), num_workers=2, threads_per_worker=1,
+                                 on_image_done=progress.append, shard_function=echo_shard)
+
+    assert sorted(f for shard_result in results for f in shard_result) == sorted(f + "_done" for f in image_files)
+    assert sorted(progress) == sorted(image_files)
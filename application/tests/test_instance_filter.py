@@ -0,0 +1,105 @@
+import numpy as np
+import pytest
+
+from instance_filter import (validate_thresholds, keep_mask, filter_instances, keep_scene_instance, empty_transfer_statistics,
+                             merge_transfer_statistics, format_transfer_report)
+from tiling import SceneInstance
+from compact_masks import CompactInstances
+
+class FakeTensor(np.ndarray):
+    """NumPy array with the size methods of a torch tensor."""
+    def element_size(self):
+        return self.itemsize
+
+    def numel(self):
+        return self.size
+
+    def to(self, device):
+        return self
+
+    def numpy(self):
+        return self.view(np.ndarray)
+
+class FakeBoxes:
+    def __init__(self, tensor):
+        self.tensor = tensor
+
+class FakeInstances:
+    """Minimal detectron2 Instances, its NumPy masks standing in for the model device."""
+    def __init__(self, boxes, scores, classes, masks, device="cuda"):
+        self.pred_boxes = FakeBoxes(np.asarray(boxes, dtype=np.float32).reshape(-1, 4).view(FakeTensor))
+        self.scores = np.asarray(scores, dtype=np.float32).view(FakeTensor)
+        self.pred_classes = np.asarray(classes, dtype=np.int64).view(FakeTensor)
+        self.pred_masks = np.asarray(masks, dtype=bool).view(FakeTensor)
+        self.image_size = self.pred_masks.shape[1:]
+        self.device = device
+
+    def get_fields(self):
+        return {"pred_boxes": self.pred_boxes, "scores": self.scores, "pred_classes": self.pred_classes,
+                "pred_masks": self.pred_masks}
+
+    def __len__(self):
+        return len(self.scores)
+
+    def __getitem__(self, keep):
+        return FakeInstances(self.pred_boxes.tensor[keep], self.scores[keep], self.pred_classes[keep], self.pred_masks[keep],
+                             self.device)
+
+def make_instances(scores, classes, size=8):
+    boxes = [(1, 1, 3, 3)] * len(scores)
+    return FakeInstances(boxes, scores, classes, np.ones((len(scores), size, size), dtype=bool))
+
+def test_per_class_thresholds_override_the_score_threshold():
+    scores = np.array([0.3, 0.6, 0.6, 0.9, 0.45])
+    classes = np.array([0, 0, 1, 1, 2])
+
+    assert keep_mask(scores, classes, 0.5).tolist() == [False, True, True, True, False]
+    assert keep_mask(scores, classes, 0.5, {1: 0.8, 2: 0.4}).tolist() == [False, True, False, True, True]
+
+def test_only_kept_instances_and_their_boxes_are_moved():
+    instances = make_instances([0.2, 0.7, 0.4, 0.95], [0, 0, 1, 1])
+    statistics = empty_transfer_statistics()
+
+    kept = filter_instances(instances, 0.5, statistics=statistics)
+
+    assert isinstance(kept, CompactInstances)
+    assert kept.scores.tolist() == pytest.approx([0.7, 0.95])
+    assert kept.masks.windows.tolist() == [[0, 0, 5, 5]] * 2  # Boxes grown by the crop margin
+    # Each instance holds a float32 box and score, an int64 class and a 64 byte mask, of which only
+    # the 25 pixels of the crop window are moved
+    assert statistics == {"instances": 4, "kept": 2, "bytes_moved": 2 * 53, "bytes_skipped": 4 * 92 - 2 * 53}
+
+def test_compact_instances_are_only_filtered():
+    compact = filter_instances(make_instances([0.6, 0.7, 0.9], [0, 1, 2]), 0.5)
+
+    kept = filter_instances(compact, 0.5, {1: 0.8})
+
+    assert kept.scores.tolist() == pytest.approx([0.6, 0.9])
+    assert np.array_equal(kept.masks.crop(1), compact.masks.crop(2))
+
+def test_transfer_statistics_are_merged_and_reported():
+    first = {"instances": 10, "kept": 4, "bytes_moved": 4_000_000, "bytes_skipped": 6_000_000}
+    second = {"instances": 6, "kept": 2, "bytes_moved": 1_000_000, "bytes_skipped": 9_000_000}
+
+    merged = merge_transfer_statistics([first, second])
+
+    assert merged == {"instances": 16, "kept": 6, "bytes_moved": 5_000_000, "bytes_skipped": 15_000_000}
+    assert format_transfer_report(merged) == ("Device transfer: kept 6 of 16 detections, moved 5.0 MB, "
+                                              "skipped 15.0 MB (75% saved).")
+
+def test_stored_scene_instances_are_filtered_by_class():
+    mask = np.ones((2, 2), dtype=bool)
+    assert keep_scene_instance(SceneInstance((0, 0, 2, 2), mask, 0.6, 0), 0.5, {1: 0.7})
+    assert not keep_scene_instance(SceneInstance((0, 0, 2, 2), mask, 0.6, 1), 0.5, {1: 0.7})
+
+@pytest.mark.parametrize("score_threshold, class_thresholds", [
+    (1.5, None),
+    (0.5, {3: 0.5}),  # Beyond NUM_CLASSES
+    (0.5, {0: -0.1}),
+])
+def test_invalid_thresholds_are_rejected(score_threshold, class_thresholds):
+    with pytest.raises(ValueError):
+        validate_thresholds(score_threshold, class_thresholds)
+
+def test_class_ids_from_json_specs_become_ints():
+    assert validate_thresholds(0.5, {"1": 0.7}) == {1: 0.7}
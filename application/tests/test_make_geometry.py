@@ -0,0 +1,78 @@
+import cv2
+import numpy as np
+import pytest
+
+from make_geometry import flatten_contours, build_mesh, imagery_mesh, triangulate_mesh, _triangulate_polygon
+
+def test_flatten_contours_sets_z_to_zero():
+    contour = np.array([[[1, 2]], [[3, 4]], [[5, 6]]], dtype=np.int32)
+    (flattened,) = flatten_contours([contour])
+    assert flattened.tolist() == [[1, 2, 0], [3, 4, 0], [5, 6, 0]]
+
+def test_flatten_contours_accepts_plain_point_arrays():
+    box = np.array([[0, 0], [10, 0], [10, 5], [0, 5]])
+    (flattened,) = flatten_contours([box])
+    assert flattened[:, 2].tolist() == [0, 0, 0, 0]
+
+def test_face_offsets_follow_contour_lengths():
+    groups = [[np.zeros((3, 3), dtype=int)], [np.zeros((4, 3), dtype=int), np.zeros((5, 3), dtype=int)]]
+    vertices, face_offsets, building_offsets = build_mesh(groups)
+    assert vertices.shape == (12, 3)
+    assert face_offsets.tolist() == [0, 3, 7, 12]
+    assert building_offsets.tolist() == [0, 1, 3]
+
+def test_empty_mesh():
+    vertices, face_offsets, building_offsets = build_mesh([])
+    assert vertices.shape == (0, 3)
+    assert face_offsets.tolist() == [0]
+    assert building_offsets.tolist() == [0]
+
+def test_imagery_mesh_spans_the_image():
+    vertices, face_offsets = imagery_mesh(640, 480)
+    assert vertices.tolist() == [[0, 0, 0], [640, 0, 0], [640, 480, 0], [0, 480, 0]]
+    assert face_offsets.tolist() == [0, 4]
+
+def triangles_area(vertices, triangles):
+    a, b, c = (vertices[triangles[:, i], :2].astype(float) for i in range(3))
+    (ux, uy), (vx, vy) = (b - a).T, (c - a).T
+    return np.abs(ux * vy - uy * vx).sum() / 2
+
+def test_concave_footprints_are_triangulated_without_overlap():
+    l_shape = np.array([[0, 0, 0], [20, 0, 0], [20, 10, 0], [10, 10, 0], [10, 20, 0], [0, 20, 0]])
+    for outline in (l_shape, l_shape[::-1].copy()):
+        triangles, triangle_offsets = triangulate_mesh(outline, np.array([0, 6]))
+        assert len(triangles) == 4
+        assert triangle_offsets.tolist() == [0, 4]
+        assert triangles_area(outline, triangles) == 300
+
+def test_triangulation_covers_each_contour_exactly():
+    rng = np.random.default_rng(0)
+    mask = np.zeros((200, 200), dtype=np.uint8)
+    for _ in range(6):
+        cv2.circle(mask, tuple(int(v) for v in rng.integers(40, 160, 2)), int(rng.integers(10, 40)), 1, -1)
+    contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+    vertices, face_offsets, _ = build_mesh([flatten_contours(contours)])
+
+    triangles, triangle_offsets = triangulate_mesh(vertices, face_offsets)
+
+    for face, contour in enumerate(contours):
+        face_triangles = triangles[triangle_offsets[face]:triangle_offsets[face + 1]]
+        assert ((face_triangles >= face_offsets[face]) & (face_triangles < face_offsets[face + 1])).all()
+        assert triangles_area(vertices, face_triangles) == pytest.approx(cv2.contourArea(contour))
+
+def test_batched_ear_clipping_matches_clipping_each_face():
+    rng = np.random.default_rng(1)
+    mask = np.zeros((300, 300), dtype=np.uint8)
+    for _ in range(30):
+        corner = rng.integers(10, 270, 2)
+        cv2.circle(mask, tuple(int(v) for v in corner), int(rng.integers(3, 15)), 1, -1)
+        cv2.rectangle(mask, tuple(int(v) for v in corner), tuple(int(v) for v in corner + rng.integers(5, 30, 2)), 1, -1)
+    contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+    contours = [cv2.approxPolyDP(contour, 1.5, True) for contour in contours] + [np.array([[0, 0], [20, 0], [20, 10], [10, 10], [10, 20], [0, 20]])]
+    vertices, face_offsets, _ = build_mesh([flatten_contours(contours)])
+
+    triangles, triangle_offsets = triangulate_mesh(vertices, face_offsets)
+
+    for face, contour in enumerate(contours):
+        expected = np.array(_triangulate_polygon(contour.reshape(-1, 2)), dtype=np.int64).reshape(-1, 3) + face_offsets[face]
+        assert triangles[triangle_offsets[face]:triangle_offsets[face + 1]].tolist() == expected.tolist()
@@ -0,0 +1,114 @@
+import json
+
+import numpy as np
+import pytest
+
+from make_geometry import flatten_contours, build_mesh, imagery_mesh
+from mosaic_export import (image_transforms, export_mosaic, save_mesh, load_mesh, mesh_path,
+                           MOSAIC_FOLDER, MOSAIC_INDEX)
+
+def square(x, y, side):
+    return np.array([[x, y], [x + side, y], [x + side, y + side], [x, y + side]], dtype=np.int32)
+
+def store_image(output_3d_folder, image_file, buildings, size=(1000, 1000)):
+    """Store the footprints of an image as the extraction does with the mosaic enabled."""
+    rendered = {"imagery": imagery_mesh(*size), "footprints": build_mesh([flatten_contours(outlines) for outlines in buildings])}
+    save_mesh(mesh_path(str(output_3d_folder), image_file), rendered)
+
+def test_stored_meshes_round_trip(tmp_path):
+    store_image(tmp_path, "a.png", [[square(10, 10, 5)], [square(50, 50, 8), square(70, 70, 3)]], size=(640, 480))
+
+    (vertices, face_offsets, building_offsets), size = load_mesh(mesh_path(str(tmp_path), "a.png"))
+
+    assert size == (640, 480)
+    assert face_offsets.tolist() == [0, 4, 8, 12]
+    assert building_offsets.tolist() == [0, 1, 3]
+    assert vertices[4].tolist() == [50, 50, 0]
+
+def test_grid_layout_from_row_and_column_names():
+    layout, transforms = image_transforms(["city_0_1.png", "city_1_0.png", "city_0_0.png"], [(100, 80)] * 3)
+    assert layout == "grid"
+    assert [transform[2] for transform in transforms] == [100, 0, 0]
+    assert [transform[5] for transform in transforms] == [0, 80, 0]
+
+def test_grid_layout_in_name_order_without_row_and_column_names():
+    _, transforms = image_transforms(["d.png", "b.png", "a.png", "c.png"], [(100, 80), (50, 50), (50, 50), (50, 50)])
+    # A 2 x 2 grid of 100 x 80 cells, filled row by row in name order
+    assert [(transform[2], transform[5]) for transform in transforms] == [(100, 80), (100, 0), (0, 0), (0, 80)]
+
+def test_georeferenced_layout_uses_world_files(tmp_path):
+    for name, x in (("west.png", 1000.0), ("east.png", 1050.0)):
+        (tmp_path / name.replace(".png", ".pgw")).write_text(f"0.5\n0\n0\n-0.5\n{x + 0.25}\n{2000 - 0.25}\n")
+
+    layout, transforms = image_transforms(["west.png", "east.png"], [(100, 100)] * 2, str(tmp_path))
+
+    assert layout == "georeferenced"
+    assert transforms == [(0.5, 0.0, 1000.0, 0.0, -0.5, 2000.0), (0.5, 0.0, 1050.0, 0.0, -0.5, 2000.0)]
+
+def test_mosaic_of_mixed_resolutions_uses_the_finest_pixel_size(tmp_path):
+    # A 2 m per pixel image first, then a 0.5 m per pixel image to its east
+    for name, pixel_size, x in (("coarse.png", 2.0, 1000.0), ("fine.png", 0.5, 3000.0)):
+        (tmp_path / name.replace(".png", ".pgw")).write_text(
+            f"{pixel_size}\n0\n0\n{-pixel_size}\n{x + pixel_size / 2}\n{5000 - pixel_size / 2}\n")
+        store_image(tmp_path, name, [[square(100, 100, 300)]])
+
+    index = export_mosaic(["coarse.png", "fine.png"], str(tmp_path), str(tmp_path), export_format="PLY", chunk_size=500)
+
+    assert index["layout"] == "georeferenced"
+    assert index["pixel_size"] == 0.5
+    assert index["chunk_size"] == 250
+    assert index["depth"] == 4  # The mosaic spans 2500 m, in 250 m chunks
+
+@pytest.fixture
+def city(tmp_path):
+    """Four 1000 pixel images named by grid cell, with a large and many small buildings each."""
+    rng = np.random.default_rng(0)
+    image_files = []
+    for row in range(2):
+        for column in range(2):
+            image_file = f"city_{row}_{column}.png"
+            buildings = [[square(100, 100, 300)]]
+            buildings += [[square(*(int(v) for v in rng.integers(510, 950, 2)), 3)] for _ in range(20)]
+            store_image(tmp_path, image_file, buildings)
+            image_files.append(image_file)
+    return tmp_path, image_files
+
+def test_mosaic_writes_a_quadtree_of_chunks(city):
+    output_3d_folder, image_files = city
+
+    index = export_mosaic(image_files, str(output_3d_folder), export_format="PLY", chunk_size=500)
+
+    mosaic_folder = output_3d_folder / MOSAIC_FOLDER
+    assert json.loads((mosaic_folder / MOSAIC_INDEX).read_text()) == index
+    assert index["layout"] == "grid" and index["origin"] == [0, 0]
+    assert index["depth"] == 2  # 2000 pixels in 500 pixel chunks: 4 x 4, 2 x 2 and the root
+    assert (mosaic_folder / index["imagery"]).is_file()
+
+    nodes = index["nodes"]
+    assert index["root"] == "0/0/0"
+    for node in nodes.values():
+        assert (mosaic_folder / node["file"]).is_file()
+        for child in node["children"]:
+            assert nodes[child]["level"] == node["level"] + 1
+            assert (nodes[child]["x"] // 2, nodes[child]["y"] // 2) == (node["x"], node["y"])
+
+    # Every building is at the finest level, the small ones are left out of the coarser levels
+    finest = [node for node in nodes.values() if node["level"] == 2]
+    assert sum(node["buildings"] for node in finest) == 4 * 21
+    assert nodes["0/0/0"]["buildings"] == 4
+    assert nodes["2/0/0"] == {**nodes["2/0/0"], "chunk_bounds": [0, 0, 500, 500], "buildings": 1}
+    assert nodes["0/0/0"]["geometric_error"] > nodes["1/0/0"]["geometric_error"] > 0
+
+def test_mosaic_places_images_at_their_grid_offset(city):
+    output_3d_folder, image_files = city
+
+    index = export_mosaic(image_files, str(output_3d_folder), export_format="OBJ", chunk_size=2000)
+
+    # A single chunk holds the whole city, the large building of image (1, 1) is offset by 1000 pixels
+    assert index["depth"] == 0
+    text = (output_3d_folder / MOSAIC_FOLDER / index["nodes"]["0/0/0"]["file"]).read_text()
+    assert "v 1100.0 1100.0 0" in text and "v 1400.0 1400.0 0" in text
+
+def test_mosaic_without_stored_meshes(tmp_path):
+    with pytest.raises(ValueError):
+        export_mosaic(["a.png"], str(tmp_path))
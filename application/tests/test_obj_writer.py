@@ -0,0 +1,72 @@
+import numpy as np
+import pytest
+
+import obj_writer
+from make_geometry import flatten_contours, build_mesh, imagery_mesh
+from obj_writer import ObjWriter, write_mesh_obj, write_buildings_obj
+
+def reference_footprints_obj(contour_groups):
+    """The in-memory implementation the streaming writer must match byte for byte (without object names)."""
+    vertices, obj_faces, vertex_index = [], [], 1
+    for flattened_contours in contour_groups:
+        for contour in flattened_contours:
+            obj_faces.append("f " + " ".join(str(vertex_index + idx) for idx in range(len(contour))))
+            for pt in contour:
+                vertices.append(f"v {pt[0]} {pt[1]} 0")
+            vertex_index += len(contour)
+    return "\n".join(vertices) + "\n" + "\n".join(obj_faces) + "\n"
+
+def random_contour_groups(seed, buildings):
+    rng = np.random.default_rng(seed)
+    return [flatten_contours([rng.integers(0, 5000, size=(rng.integers(3, 40), 1, 2), dtype=np.int32)
+                              for _ in range(rng.integers(1, 3))]) for _ in range(buildings)]
+
+@pytest.mark.parametrize("chunk_rows", [3, 65536])
+@pytest.mark.parametrize("buildings", [1, 50])
+def test_unnamed_output_matches_in_memory_text(tmp_path, monkeypatch, chunk_rows, buildings):
+    monkeypatch.setattr(obj_writer, "CHUNK_ROWS", chunk_rows)
+    groups = random_contour_groups(0, buildings)
+    file_path = tmp_path / "footprints.obj"
+
+    write_buildings_obj(str(file_path), *build_mesh(groups), name_prefix=None)
+
+    assert file_path.read_text() == reference_footprints_obj(groups)
+
+def test_image_without_buildings_writes_an_empty_file(tmp_path):
+    file_path = tmp_path / "footprints.obj"
+
+    write_buildings_obj(str(file_path), *build_mesh([]), name_prefix=None)
+
+    # The in-memory implementation wrote two empty lines here, the streaming writer writes nothing
+    assert reference_footprints_obj([]) == "\n\n"
+    assert file_path.read_text() == ""
+
+def test_each_building_is_a_named_object(tmp_path):
+    square = np.array([[0, 0, 0], [4, 0, 0], [4, 4, 0], [0, 4, 0]])
+    triangle = np.array([[10, 10, 0], [12, 10, 0], [11, 12, 0]])
+    file_path = tmp_path / "tile_footprints.obj"
+
+    write_buildings_obj(str(file_path), *build_mesh([[square], [triangle, triangle]]), name_prefix="tile_building")
+
+    assert file_path.read_text().splitlines() == [
+        "o tile_building_1", "v 0 0 0", "v 4 0 0", "v 4 4 0", "v 0 4 0", "f 1 2 3 4",
+        "o tile_building_2", "v 10 10 0", "v 12 10 0", "v 11 12 0", "v 10 10 0", "v 12 10 0", "v 11 12 0",
+        "f 5 6 7", "f 8 9 10",
+    ]
+
+def test_imagery_obj(tmp_path):
+    file_path = tmp_path / "tile_imagery.obj"
+    write_mesh_obj(str(file_path), *imagery_mesh(640, 480))
+    assert file_path.read_text() == "v 0 0 0\nv 640 0 0\nv 640 480 0\nv 0 480 0\nf 1 2 3 4\n"
+
+def test_failed_write_leaves_no_file_behind(tmp_path):
+    file_path = tmp_path / "broken.obj"
+    file_path.write_text("previous run\n")
+
+    with pytest.raises(RuntimeError):
+        with ObjWriter(str(file_path)) as writer:
+            writer.write_object(*imagery_mesh(10, 10))
+            raise RuntimeError("crash while writing")
+
+    assert file_path.read_text() == "previous run\n"
+    assert [entry.name for entry in tmp_path.iterdir()] == ["broken.obj"]
@@ -0,0 +1,94 @@
+from os import path
+
+import numpy as np
+import pytest
+
+from onnx_backend import validate_engine, resized_shape, paste_mask, postprocess, onnx_model_path
+from compact_masks import crop_windows
+
+APPLICATION_FOLDER = path.dirname(path.dirname(path.abspath(__file__)))
+SAMPLE_IMAGES = ["blender/media/imagery.jpg", "blender/media/imagery_2.jpg", "blender/media/imagery_3.jpg"]
+
+def test_engine_is_validated():
+    assert validate_engine("ONNX") == "onnx"
+    with pytest.raises(ValueError):
+        validate_engine("tensorrt")
+
+@pytest.mark.parametrize("image_size, expected", [
+    ((600, 800), (800, 1067)),
+    ((2000, 1000), (1333, 667)),  # Longest edge capped
+    ((800, 800), (800, 800)),
+])
+def test_images_are_resized_like_detectron2(image_size, expected):
+    assert resized_shape(*image_size, 800, 1333) == expected
+
+def test_full_mask_is_pasted_onto_its_box():
+    box = np.array([10, 20, 50, 60], dtype=np.float32)
+    window = tuple(crop_windows([box], (100, 100))[0].tolist())
+
+    pasted = paste_mask(np.ones((28, 28), dtype=np.float32), box, window)
+
+    dense = np.zeros((100, 100), dtype=bool)
+    dense[window[1]:window[3], window[0]:window[2]] = pasted
+    expected = np.zeros((100, 100), dtype=bool)
+    expected[20:60, 10:50] = True
+    assert np.array_equal(dense, expected)
+
+def test_pasted_masks_match_detectron2():
+    torch = pytest.importorskip("torch")
+    pytest.importorskip("detectron2")
+    from detectron2.layers.mask_ops import paste_masks_in_image
+    from detectron2.structures import Boxes
+
+    rng = np.random.default_rng(0)
+    masks = rng.random((5, 28, 28)).astype(np.float32)
+    boxes = np.array([[3.2, 4.7, 40.1, 33.9], [0, 0, 64, 48], [20.5, 10.5, 21.5, 30.5], [50, 40, 63.8, 47.9], [7, 7, 19, 12]],
+                     dtype=np.float32)
+    expected = paste_masks_in_image(torch.as_tensor(masks)[:, None], Boxes(torch.as_tensor(boxes)), (48, 64)).numpy()
+
+    windows = crop_windows(boxes, (48, 64))
+    for mask, box, window, dense in zip(masks, boxes, windows.tolist(), expected):
+        x0, y0, x1, y1 = window
+        assert np.array_equal(paste_mask(mask, box, window), dense[y0:y1, x0:x1])
+        assert not dense.sum() - dense[y0:y1, x0:x1].sum()  # Nothing is pasted outside the crop window
+
+def test_outputs_are_scaled_to_the_image_and_empty_boxes_dropped():
+    boxes = np.array([[10, 10, 30, 20], [5, 5, 5, 9], [190, 90, 260, 120]], dtype=np.float32)
+    outputs = (boxes, np.array([0.9, 0.8, 0.7], dtype=np.float32), np.array([0, 1, 2]), np.ones((3, 1, 28, 28), dtype=np.float32))
+
+    instances = postprocess(outputs, (100, 200), (50, 100))
+
+    assert len(instances) == 2
+    assert instances.boxes.tolist() == [[5, 5, 15, 10], [95, 45, 100, 50]]  # Clipped to the image
+    assert instances.classes.tolist() == [0, 2]
+    assert instances.masks.dense(0)[5:10, 5:15].all() and instances.masks.dense(0).sum() == 50
+
+def load_parity_models():
+    """(PyTorch, ONNX) predictors of model 1, skipping when its weights, export or engines are missing."""
+    pytest.importorskip("onnxruntime")
+    pytest.importorskip("detectron2")
+    from predictor_registry import build_predictor, get_model_paths
+
+    weights_path, config_path = (path.join(APPLICATION_FOLDER, model_path) for model_path in get_model_paths(1))
+    if not path.isfile(weights_path) or not path.isfile(onnx_model_path(weights_path)):
+        pytest.skip("Model weights or their ONNX export are not available, see onnx_backend.py")
+    return (build_predictor(config_path, weights_path, "cpu"),
+            build_predictor(config_path, weights_path, "cpu", engine="onnx"))
+
+@pytest.mark.parametrize("image_file", SAMPLE_IMAGES)
+def test_onnx_predictions_match_pytorch(image_file):
+    from cv2 import imread
+    from instance_filter import filter_instances
+
+    pytorch_predictor, onnx_predictor = load_parity_models()
+    img = imread(path.join(APPLICATION_FOLDER, image_file))
+
+    expected = filter_instances(pytorch_predictor(img)["instances"].to("cpu"), 0.5)
+    actual = filter_instances(onnx_predictor(img)["instances"], 0.5)
+
+    assert len(actual) == len(expected)
+    assert np.allclose(actual.boxes, expected.boxes, atol=1)
+    assert np.allclose(actual.scores, expected.scores, atol=1e-3)
+    for i in range(len(expected)):
+        actual_mask, expected_mask = actual.masks.dense(i), expected.masks.dense(i)
+        assert (actual_mask & expected_mask).sum() / max((actual_mask | expected_mask).sum(), 1) > 0.95
@@ -0,0 +1,79 @@
+import threading
+import time
+
+import pytest
+
+from pipeline import PipelineStage, run_pipeline, merge_stage_statistics, format_stage_report
+
+def test_items_flow_through_all_stages_in_order():
+    written = []
+    stages = [
+        PipelineStage("read", lambda x: x * 2),
+        PipelineStage("inference", lambda batch: [x + 1 for x in batch], batch_size=3),
+        PipelineStage("write", written.append),
+    ]
+
+    statistics = run_pipeline(range(10), stages, queue_size=2)
+
+    assert written == [x * 2 + 1 for x in range(10)]
+    assert [stats["stage"] for stats in statistics] == ["read", "inference", "write"]
+    assert all(stats["items"] == 10 for stats in statistics)
+    assert all(0.0 <= stats["utilisation"] <= 1.0 for stats in statistics)
+
+def test_batched_stage_receives_full_batches():
+    batch_sizes = []
+
+    def infer(batch):
+        batch_sizes.append(len(batch))
+        return batch
+
+    run_pipeline(range(7), [PipelineStage("inference", infer, batch_size=3)])
+
+    assert batch_sizes == [3, 3, 1]
+
+def test_bounded_queues_limit_items_in_flight():
+    queue_size = 2
+    in_flight = 0
+    max_in_flight = 0
+    lock = threading.Lock()
+
+    def read(x):
+        nonlocal in_flight, max_in_flight
+        with lock:
+            in_flight += 1
+            max_in_flight = max(max_in_flight, in_flight)
+        return x
+
+    def write(x):
+        nonlocal in_flight
+        time.sleep(0.01)  # Slow consumer, the reader must not run far ahead
+        with lock:
+            in_flight -= 1
+
+    run_pipeline(range(20), [PipelineStage("read", read), PipelineStage("write", write)], queue_size=queue_size)
+
+    # At most one item per queue plus one item held by each stage thread
+    assert max_in_flight <= queue_size + 2
+
+def test_stage_error_stops_pipeline_and_is_raised():
+    written = []
+
+    def post_process(x):
+        if x == 3:
+            raise ValueError("bad contour")
+        return x
+
+    stages = [PipelineStage("post-process", post_process), PipelineStage("write", written.append)]
+
+    with pytest.raises(ValueError, match="bad contour"):
+        run_pipeline(range(100), stages, queue_size=1)
+    assert 3 not in written
+
+def test_merge_and_report_statistics():
+    worker_a = [{"stage": "inference", "items": 2, "busy_seconds": 4.0, "wall_seconds": 5.0}]
+    worker_b = [{"stage": "inference", "items": 3, "busy_seconds": 5.0, "wall_seconds": 5.0}]
+
+    merged = merge_stage_statistics([worker_a, worker_b])
+
+    assert merged == [{"stage": "inference", "items": 5, "busy_seconds": 9.0, "wall_seconds": 10.0, "utilisation": 0.9}]
+    assert "bottleneck" in format_stage_report(merged)
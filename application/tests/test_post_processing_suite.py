@@ -0,0 +1,25 @@
+import pytest
+
+from benchmarks.post_processing_suite import run_suite, compare_to_baseline
+
+def make_results(workload=None, **stages):
+    return {"workload": workload or {"images": 1, "buildings": 10, "seed": 0, "contour_points": 500},
+            "environment": {}, "stages": stages}
+
+def test_every_stage_is_timed():
+    results = run_suite(images=1, buildings=5, repeats=1, min_sample_seconds=0)
+
+    assert set(results["stages"]) == {"find_contours", "fill_holes", "simplify_contours", "smooth_contours", "convex_hulls",
+                                      "bounding_boxes", "flatten_contours", "build_mesh", "write_obj"}
+    assert results["workload"]["contour_points"] > 5 * 8  # Jittered polygons, not 4 point boxes
+
+def test_stages_slower_than_the_tolerance_are_regressions():
+    baseline = make_results(smooth_contours=0.010, build_mesh=0.010, write_obj=0.0001)
+    results = make_results(smooth_contours=0.014, build_mesh=0.012, write_obj=0.0005)
+
+    # write_obj is 5x slower but by less than the timer noise floor
+    assert compare_to_baseline(results, baseline, tolerance=0.3) == [("smooth_contours", 0.014, 0.010)]
+
+def test_baseline_of_another_workload_is_rejected():
+    with pytest.raises(ValueError):
+        compare_to_baseline(make_results(), make_results({"images": 4, "buildings": 300, "seed": 0, "contour_points": 1}))
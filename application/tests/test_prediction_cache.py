@@ -0,0 +1,113 @@
+import os
+
+import numpy as np
+import pytest
+
+from tiling import SceneInstance
+from compact_masks import CompactInstances, PackedMasks, crop_windows
+from prediction_cache import (PredictionCache, model_fingerprint, prediction_key, encode_predictions, decode_predictions,
+                              save_predictions, load_predictions, merge_cache_statistics)
+
+def scene_instances():
+    rng = np.random.default_rng(0)
+    return [
+        SceneInstance((10, 20, 40, 35), rng.random((15, 30)) > 0.5, 0.9, 1),
+        SceneInstance((100, 5, 107, 9), rng.random((4, 7)) > 0.5, 0.6, 2),
+    ]
+
+def test_scene_instances_round_trip(tmp_path):
+    cache = PredictionCache(str(tmp_path))
+    original = scene_instances()
+    cache.put("scene", encode_predictions(original))
+
+    decoded = decode_predictions(cache.get("scene"))
+
+    assert len(decoded) == len(original)
+    for got, expected in zip(decoded, original):
+        assert got.box == expected.box
+        assert np.array_equal(got.mask, expected.mask)
+        assert got.score == pytest.approx(expected.score)
+        assert got.class_id == expected.class_id
+
+def test_stored_predictions_round_trip(tmp_path):
+    file_path = str(tmp_path / "scene_predictions.npz")
+    original = scene_instances()
+    save_predictions(file_path, original)
+
+    decoded = load_predictions(file_path)
+
+    assert [instance.box for instance in decoded] == [instance.box for instance in original]
+    assert all(np.array_equal(got.mask, expected.mask) for got, expected in zip(decoded, original))
+    assert os.listdir(tmp_path) == ["scene_predictions.npz"]  # No temporary file left behind
+
+def compact_instances():
+    masks = np.zeros((2, 40, 60), dtype=bool)
+    masks[0, 5:15, 10:30] = True
+    masks[1, 20:37, 41:50] = True
+    boxes = np.array([[10, 5, 29, 14], [41, 20, 49, 36]], dtype=np.float32)
+    return masks, boxes, CompactInstances((40, 60), boxes, np.array([0.9, 0.7], dtype=np.float32), np.array([1, 0], dtype=np.int32),
+                                          PackedMasks.from_dense(masks, crop_windows(boxes, (40, 60))))
+
+def test_compact_instances_round_trip(tmp_path):
+    masks, boxes, original = compact_instances()
+    file_path = str(tmp_path / "image_predictions.npz")
+    save_predictions(file_path, original)
+
+    decoded = load_predictions(file_path)
+
+    assert isinstance(decoded, CompactInstances)
+    assert decoded.image_size == (40, 60)
+    assert np.array_equal(decoded.boxes, boxes)
+    assert all(np.array_equal(decoded.masks.dense(i), masks[i]) for i in range(2))
+
+def test_empty_predictions_round_trip(tmp_path):
+    cache = PredictionCache(str(tmp_path))
+    cache.put("empty", encode_predictions([]))
+    assert decode_predictions(cache.get("empty")) == []
+
+def test_hits_and_misses_are_counted(tmp_path):
+    cache = PredictionCache(str(tmp_path))
+    assert cache.get("missing") is None
+    cache.put("present", encode_predictions(scene_instances()))
+    assert cache.get("present") is not None
+
+    assert cache.statistics() == {"hits": 1, "misses": 1, "evictions": 0}
+    assert merge_cache_statistics([cache.statistics(), cache.statistics()])["hits"] == 2
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    arrays = encode_predictions(scene_instances())
+    probe = PredictionCache(str(tmp_path / "probe"))
+    probe.put("probe", arrays)
+    entry_bytes = os.path.getsize(tmp_path / "probe" / "probe.npz")
+
+    cache = PredictionCache(str(tmp_path / "cache"), max_bytes=entry_bytes * 2)
+    cache.put("first", arrays)
+    cache.put("second", arrays)
+    os.utime(tmp_path / "cache" / "first.npz", (1, 1))
+    os.utime(tmp_path / "cache" / "second.npz", (2, 2))
+    cache.get("first")  # Refreshes "first", leaving "second" as the least recently used
+    cache.put("third", arrays)
+
+    assert cache.get("second") is None
+    assert cache.get("first") is not None and cache.get("third") is not None
+    assert cache.evictions == 1
+
+def test_key_depends_on_image_model_and_settings():
+    settings = {"score_threshold": 0.5, "tile_size": None}
+    key = prediction_key("image", "model", settings)
+
+    assert key == prediction_key("image", "model", dict(reversed(list(settings.items()))))
+    assert key != prediction_key("other image", "model", settings)
+    assert key != prediction_key("image", "other model", settings)
+    assert key != prediction_key("image", "model", {"score_threshold": 0.7, "tile_size": None})
+
+def test_fingerprint_covers_further_model_files(tmp_path):
+    weights, config, onnx = (tmp_path / name for name in ("model.pth", "config.yaml", "model.onnx"))
+    for file_path in (weights, config, onnx):
+        file_path.write_bytes(b"first")
+    before = model_fingerprint(str(weights), str(config), str(onnx))
+
+    onnx.write_bytes(b"exported again")
+
+    assert model_fingerprint(str(weights), str(config), str(onnx)) != before
+    assert model_fingerprint(str(weights), str(config)) != before
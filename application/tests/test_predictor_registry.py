@@ -0,0 +1,88 @@
+from predictor_registry import PredictorRegistry, get_predictor, get_model_paths
+
+class CountingFactory:
+    """Stand-in for build_predictor that records how often a model is constructed."""
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, config_path, weights_path, device, score_threshold=None, nms_threshold=None, precision="fp32", engine="pytorch", preset="balanced"):
+        self.calls.append((config_path, weights_path, device, precision, engine, preset))
+        return object()
+
+def test_second_run_skips_model_construction():
+    factory = CountingFactory()
+    registry = PredictorRegistry(factory=factory, size_estimator=lambda predictor: 100)
+
+    first = get_predictor(1, device="cpu", registry=registry)
+    second = get_predictor(1, device="cpu", registry=registry)
+
+    assert first is second
+    assert len(factory.calls) == 1
+    assert registry.builds == 1
+    assert registry.hits == 1
+
+def test_different_configuration_builds_new_model():
+    factory = CountingFactory()
+    registry = PredictorRegistry(factory=factory, size_estimator=lambda predictor: 100)
+
+    get_predictor(1, device="cpu", registry=registry)
+    get_predictor(2, device="cpu", registry=registry)
+    get_predictor(1, device="cpu", score_threshold=0.7, registry=registry)
+
+    assert len(factory.calls) == 3
+    assert len(registry) == 3
+
+def test_quantized_model_is_cached_separately():
+    factory = CountingFactory()
+    registry = PredictorRegistry(factory=factory, size_estimator=lambda predictor: 100)
+
+    full = get_predictor(1, device="cpu", registry=registry)
+    quantized = get_predictor(1, device="cpu", registry=registry, precision="int8")
+
+    assert full is not quantized
+    assert [call[3] for call in factory.calls] == ["fp32", "int8"]
+    assert get_predictor(1, device="cpu", registry=registry, precision="int8") is quantized
+
+def test_onnx_engine_is_cached_separately():
+    factory = CountingFactory()
+    registry = PredictorRegistry(factory=factory, size_estimator=lambda predictor: 100)
+
+    pytorch = get_predictor(1, device="cpu", registry=registry)
+    onnx = get_predictor(1, device="cpu", registry=registry, engine="onnx")
+
+    assert pytorch is not onnx
+    assert [call[4] for call in factory.calls] == ["pytorch", "onnx"]
+
+def test_resolution_presets_are_cached_separately():
+    factory = CountingFactory()
+    registry = PredictorRegistry(factory=factory, size_estimator=lambda predictor: 100)
+
+    for preset in ("fast", "accurate", "fast"):
+        get_predictor(1, device="cpu", registry=registry, preset=preset)
+
+    assert [call[5] for call in factory.calls] == ["fast", "accurate"]
+
+def test_least_recently_used_model_is_evicted():
+    factory = CountingFactory()
+    registry = PredictorRegistry(memory_budget=250, factory=factory, size_estimator=lambda predictor: 100)
+
+    get_predictor(1, device="cpu", registry=registry)
+    get_predictor(2, device="cpu", registry=registry)
+    get_predictor(1, device="cpu", registry=registry)  # model 1 is now the most recently used
+    get_predictor(3, device="cpu", registry=registry)  # exceeds the budget, evicts model 2
+
+    weights_2, config_2 = get_model_paths(2)
+    assert registry.evictions == 1
+    assert registry.make_key(2, config_2, weights_2, "cpu") not in registry
+    assert registry.used_bytes <= 250
+
+    get_predictor(1, device="cpu", registry=registry)
+    assert len(factory.calls) == 3  # model 1 was never rebuilt
+
+def test_newest_model_kept_when_larger_than_budget():
+    registry = PredictorRegistry(memory_budget=10, factory=CountingFactory(), size_estimator=lambda predictor: 100)
+
+    predictor = get_predictor(1, device="cpu", registry=registry)
+
+    assert len(registry) == 1
+    assert get_predictor(1, device="cpu", registry=registry) is predictor
@@ -0,0 +1,46 @@
+from types import SimpleNamespace
+
+import pytest
+
+from quantization import validate_precision
+from predictor_registry import estimate_predictor_bytes
+
+def test_precision_is_validated():
+    assert validate_precision("INT8") == "int8"
+    assert validate_precision("fp32") == "fp32"
+    with pytest.raises(ValueError):
+        validate_precision("fp16")
+
+def test_linear_layers_are_quantized_to_int8():
+    torch = pytest.importorskip("torch")
+    pytest.importorskip("torch.ao.quantization")
+    from quantization import quantize_model
+
+    torch.manual_seed(0)
+    model = torch.nn.Sequential(torch.nn.Conv2d(3, 4, 3), torch.nn.Flatten(), torch.nn.Linear(4 * 6 * 6, 16),
+                                torch.nn.ReLU(), torch.nn.Linear(16, 3))
+    inputs = torch.rand(2, 3, 8, 8)
+    with torch.no_grad():
+        expected = model(inputs)
+
+    quantized = quantize_model(model, inplace=False)
+
+    assert type(quantized[0]) is torch.nn.Conv2d  # Convolutions stay in FP32
+    assert all(type(quantized[i]) is not torch.nn.Linear for i in (2, 4))
+    with torch.no_grad():
+        assert torch.allclose(quantized(inputs), expected, atol=0.05)
+
+def test_quantized_weights_are_counted_in_the_predictor_size():
+    torch = pytest.importorskip("torch")
+    pytest.importorskip("torch.ao.quantization")
+    from quantization import quantize_model
+
+    model = torch.nn.Sequential(torch.nn.Conv2d(3, 4, 3), torch.nn.Flatten(), torch.nn.Linear(4 * 6 * 6, 16),
+                                torch.nn.ReLU(), torch.nn.Linear(16, 3))
+    conv_bytes = (4 * 3 * 3 * 3 + 4) * 4
+
+    quantized = quantize_model(model, inplace=False)
+
+    # One byte per INT8 weight, the biases stay in FP32
+    linear_bytes = (4 * 6 * 6 * 16 + 16 * 3) + (16 + 3) * 4
+    assert estimate_predictor_bytes(SimpleNamespace(model=quantized)) == conv_bytes + linear_bytes
@@ -0,0 +1,89 @@
+import numpy as np
+import cv2
+import pytest
+import tifffile
+
+from raster_source import open_raster, read_georeference, TiffRasterSource, ArrayRasterSource
+
+@pytest.fixture
+def rgb_pixels():
+    rng = np.random.default_rng(0)
+    return rng.integers(0, 255, size=(300, 500, 3), dtype=np.uint8)
+
+@pytest.mark.parametrize("layout", [
+    {"tile": (64, 64), "compression": "zlib"},
+    {"rowsperstrip": 16, "compression": "zlib"},
+    {},  # uncompressed, memory-mapped
+    {"tile": (64, 64), "bigtiff": True},
+])
+def test_tiff_windows_match_full_image(tmp_path, rgb_pixels, layout):
+    file_path = str(tmp_path / "scene.tif")
+    tifffile.imwrite(file_path, rgb_pixels, **layout)
+    expected_bgr = rgb_pixels[:, :, ::-1]
+
+    with open_raster(file_path) as source:
+        assert isinstance(source, TiffRasterSource)
+        assert (source.height, source.width) == (300, 500)
+        for window in [(0, 0, 500, 300), (30, 50, 170, 130), (450, 290, 500, 300), (64, 64, 128, 128)]:
+            x0, y0, x1, y1 = window
+            assert np.array_equal(source.read(window), expected_bgr[y0:y1, x0:x1])
+
+def test_tiff_preview_is_subsampled(tmp_path, rgb_pixels):
+    file_path = str(tmp_path / "scene.tif")
+    tifffile.imwrite(file_path, rgb_pixels, tile=(64, 64))
+
+    with open_raster(file_path) as source:
+        preview = source.read_preview(100)
+
+    assert max(preview.shape[:2]) <= 100
+    assert np.array_equal(preview, rgb_pixels[::5, ::5, ::-1])
+
+def test_grayscale_16_bit_tiff_is_converted_to_bgr(tmp_path):
+    pixels = np.full((40, 60), 0x8000, dtype=np.uint16)
+    file_path = str(tmp_path / "scene.tif")
+    tifffile.imwrite(file_path, pixels, tile=(16, 16))
+
+    with open_raster(file_path) as source:
+        window = source.read((5, 5, 25, 15))
+
+    assert window.shape == (10, 20, 3)
+    assert window.dtype == np.uint8
+    assert (window == 0x80).all()
+
+def test_jpeg_and_png_use_in_memory_fallback(tmp_path, rgb_pixels):
+    file_path = str(tmp_path / "image.png")
+    cv2.imwrite(file_path, rgb_pixels)
+
+    with open_raster(file_path) as source:
+        assert isinstance(source, ArrayRasterSource)
+        assert np.array_equal(source.read((10, 20, 40, 60)), rgb_pixels[20:60, 10:40])
+        assert max(source.read_preview(250).shape[:2]) == 250
+
+def test_unreadable_image_raises(tmp_path):
+    file_path = tmp_path / "broken.jpg"
+    file_path.write_bytes(b"not an image")
+
+    with pytest.raises(ValueError):
+        open_raster(str(file_path))
+
+def test_world_file_georeference_maps_pixel_corners(tmp_path):
+    image_path = tmp_path / "tile.png"
+    cv2.imwrite(str(image_path), np.zeros((10, 10, 3), dtype=np.uint8))
+    # 0.5 m pixels, the centre of the top left pixel at (1000.25, 2000.75)
+    (tmp_path / "tile.pgw").write_text("0.5\n0\n0\n-0.5\n1000.25\n2000.75\n")
+
+    assert read_georeference(str(image_path)) == (0.5, 0.0, 1000.0, 0.0, -0.5, 2001.0)
+
+def test_geotiff_tags_georeference(tmp_path, rgb_pixels):
+    file_path = str(tmp_path / "scene.tif")
+    tifffile.imwrite(file_path, rgb_pixels, extratags=[
+        (33550, "d", 3, (0.3, 0.3, 0.0)),  # ModelPixelScaleTag
+        (33922, "d", 6, (0, 0, 0, 500000.0, 4100000.0, 0.0)),  # ModelTiepointTag
+    ])
+
+    assert read_georeference(file_path) == pytest.approx((0.3, 0.0, 500000.0, 0.0, -0.3, 4100000.0))
+
+def test_images_without_georeference(tmp_path, rgb_pixels):
+    file_path = str(tmp_path / "scene.tif")
+    tifffile.imwrite(file_path, rgb_pixels)
+    assert read_georeference(file_path) is None
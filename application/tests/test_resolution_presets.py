@@ -0,0 +1,38 @@
+import json
+from types import SimpleNamespace
+
+import pytest
+
+from resolution_presets import PRESETS, validate_preset, apply_preset, load_preset_measurements, describe_preset
+
+def make_config():
+    """Stand-in for the nested detectron2 config nodes the presets touch."""
+    return SimpleNamespace(INPUT=SimpleNamespace(MIN_SIZE_TEST=800, MAX_SIZE_TEST=1333),
+                           MODEL=SimpleNamespace(RPN=SimpleNamespace(PRE_NMS_TOPK_TEST=1000, POST_NMS_TOPK_TEST=1000),
+                                                 ROI_HEADS=SimpleNamespace(DETECTIONS_PER_IMAGE=100)))
+
+def test_preset_is_validated():
+    assert validate_preset("Fast") == "fast"
+    with pytest.raises(ValueError):
+        validate_preset("ultra")
+
+def test_presets_override_the_config():
+    cfg = apply_preset(make_config(), "fast")
+
+    assert (cfg.INPUT.MIN_SIZE_TEST, cfg.INPUT.MAX_SIZE_TEST) == (512, 853)
+    assert cfg.MODEL.RPN.POST_NMS_TOPK_TEST == 300
+
+def test_balanced_preset_keeps_the_model_config():
+    assert vars(apply_preset(make_config(), "balanced").INPUT) == vars(make_config().INPUT)
+
+def test_presets_are_ordered_by_resolution():
+    assert PRESETS["fast"]["INPUT.MIN_SIZE_TEST"] < make_config().INPUT.MIN_SIZE_TEST < PRESETS["accurate"]["INPUT.MIN_SIZE_TEST"]
+
+def test_preset_labels_show_the_measurements_of_the_model(tmp_path):
+    measurements_path = tmp_path / "resolution_presets.json"
+    measurements_path.write_text(json.dumps({"1": {"fast": {"latency_ms": 180.4, "bbox_AP": 40.0, "segm_AP": 37.26}}}))
+    measurements = load_preset_measurements(str(measurements_path))
+
+    assert describe_preset("fast", 1, measurements) == "Fast (512 px), 180 ms, mask AP 37.3"
+    assert describe_preset("fast", 2, measurements) == "Fast (512 px), not measured"
+    assert describe_preset("balanced", 1, load_preset_measurements(str(tmp_path / "missing.json"))) == "Balanced, not measured"
@@ -0,0 +1,72 @@
+from multiprocessing import get_context
+
+from run_manifest import RunManifest, MANIFEST_NAME
+
+SETTINGS = {"model": 1, "post_processing": "Simplify Contours", "tile_size": None}
+
+def write_outputs(folder, name):
+    output_files = []
+    for suffix in ("_imagery.obj", "_footprints.obj"):
+        output_file = folder / (name + suffix)
+        output_file.write_text(f"o {name}\n")
+        output_files.append(str(output_file))
+    return output_files
+
+def test_completed_images_survive_a_new_manifest(tmp_path):
+    RunManifest(str(tmp_path), SETTINGS).record("a.jpg", write_outputs(tmp_path, "a"))
+    RunManifest(str(tmp_path), SETTINGS).record("b.jpg", write_outputs(tmp_path, "b"))
+
+    assert RunManifest(str(tmp_path), SETTINGS).completed_images() == {"a.jpg", "b.jpg"}
+
+def test_partially_written_outputs_are_redone(tmp_path):
+    manifest = RunManifest(str(tmp_path), SETTINGS)
+    manifest.record("a.jpg", write_outputs(tmp_path, "a"))
+    manifest.record("b.jpg", write_outputs(tmp_path, "b"))
+
+    (tmp_path / "a_footprints.obj").write_text("o a\nv 0")  # Changed after it was recorded
+    (tmp_path / "b_imagery.obj").unlink()
+
+    assert manifest.completed_images() == set()
+
+def test_line_cut_short_by_a_crash_is_ignored(tmp_path):
+    manifest = RunManifest(str(tmp_path), SETTINGS)
+    manifest.record("a.jpg", write_outputs(tmp_path, "a"))
+    with open(tmp_path / MANIFEST_NAME, "a") as manifest_file:
+        manifest_file.write('\n{"image": "b.jpg", "outp')  # Only part of the record of b was written
+
+    assert manifest.completed_images() == {"a.jpg"}
+
+def test_other_settings_and_reset_forget_completed_images(tmp_path):
+    manifest = RunManifest(str(tmp_path), SETTINGS)
+    manifest.record("a.jpg", write_outputs(tmp_path, "a"))
+
+    assert RunManifest(str(tmp_path), dict(SETTINGS, post_processing="Convex Hulls")).completed_images() == set()
+
+    manifest.reset()
+    assert manifest.completed_images() == set()
+
+def test_settings_that_change_through_json_still_match(tmp_path):
+    settings = dict(SETTINGS, class_thresholds={0: 0.7, 2: 0.4}, thresholds=[(0, 0.7)])
+    RunManifest(str(tmp_path), settings).record("a.jpg", write_outputs(tmp_path, "a"))
+
+    assert RunManifest(str(tmp_path), settings).completed_images() == {"a.jpg"}
+
+def test_record_after_a_line_cut_short_is_kept(tmp_path):
+    manifest = RunManifest(str(tmp_path), SETTINGS)
+    with open(tmp_path / MANIFEST_NAME, "a") as manifest_file:
+        manifest_file.write('{"image": "a.jpg", "outp')
+    manifest.record("b.jpg", write_outputs(tmp_path, "b"))
+
+    assert manifest.completed_images() == {"b.jpg"}
+
+def record_images(folder, names):
+    manifest = RunManifest(folder, SETTINGS)
+    for name in names:
+        manifest.record(f"{name}.jpg", [])
+
+def test_worker_processes_append_to_the_same_manifest(tmp_path):
+    names = [[f"worker{worker}_{index}" for index in range(50)] for worker in range(4)]
+    with get_context("spawn").Pool(4) as pool:
+        pool.starmap(record_images, [(str(tmp_path), worker_names) for worker_names in names])
+
+    assert RunManifest(str(tmp_path), SETTINGS).completed_images() == {f"{name}.jpg" for worker_names in names for name in worker_names}
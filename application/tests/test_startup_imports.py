@@ -0,0 +1,10 @@
+import subprocess
+import sys
+
+import pytest
+
+@pytest.mark.parametrize("module", ["detect_buildings", "batch_cli", "tiling", "prediction_cache", "run_manifest"])
+def test_module_imports_without_model_libraries(module):
+    code = f"import sys, {module}; print(sorted(m for m in ('torch', 'detectron2', 'matplotlib') if m in sys.modules))"
+    result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+    assert result.stdout.strip() == "[]"
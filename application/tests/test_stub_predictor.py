@@ -0,0 +1,66 @@
+import numpy as np
+
+from stub_predictor import StubPredictor
+from instance_filter import filter_instances, empty_transfer_statistics
+from batch_inference import predict_batch
+from detect_buildings import extract_features
+from predictor_registry import PredictorRegistry
+from benchmarks.pipeline_throughput import generate_images, run_harness
+
+def make_image(seed, size=500):
+    return np.random.default_rng(seed).integers(0, 256, size=(size, size, 3), dtype=np.uint8)
+
+def test_same_image_gives_the_same_predictions_in_any_batch():
+    predictor = StubPredictor(buildings_per_megapixel=40)
+    first, second = make_image(0), make_image(1)
+
+    alone = predictor(first)["instances"]
+    batched = predict_batch(predictor, [second, first])[1]["instances"]
+
+    assert len(alone) == 10  # 40 per megapixel of a quarter megapixel image
+    assert np.array_equal(alone.scores, batched.scores)
+    assert np.array_equal(alone.pred_masks, batched.pred_masks)
+    assert not np.array_equal(predictor(second)["instances"].scores, alone.scores)
+
+def test_boxes_bound_the_synthetic_masks():
+    instances = StubPredictor(buildings_per_megapixel=40)(make_image(0))["instances"]
+
+    for box, mask in zip(instances.pred_boxes.tensor, instances.pred_masks):
+        rows, columns = mask.any(axis=1).nonzero()[0], mask.any(axis=0).nonzero()[0]
+        assert box.tolist() == [columns[0], rows[0], columns[-1] + 1, rows[-1] + 1]
+
+def test_predictions_go_through_the_score_filter():
+    instances = StubPredictor(buildings_per_megapixel=200)(make_image(0))["instances"]
+    statistics = empty_transfer_statistics()
+
+    kept = filter_instances(instances, 0.5, statistics=statistics)
+
+    assert 0 < len(kept) < len(instances)
+    assert statistics["instances"] == len(instances) and statistics["bytes_skipped"] > 0
+
+def test_harness_runs_the_pipeline_without_a_model():
+    results = run_harness(images=2, size=256, density=100, inference_delay=0.01)
+
+    assert results["summary"]["images"] == 2
+    assert set(results["stages"]) == {"read", "inference", "post-process", "write"}
+    assert results["stages"]["inference"] >= 0.01
+    assert results["images_per_second"] > 0
+
+def test_harness_run_reports_stage_timings_of_every_image():
+    timings = run_harness(images=3, size=256, density=100)["summary"]["timings"]
+
+    assert timings["images"] == 3 and len(timings["slowest"]) == 3
+    assert {"decode", "inference", "filtering", "annotation", "contours", "write_footprints"} <= set(timings["stages"])
+
+def test_resume_with_class_thresholds_skips_completed_images(tmp_path, capsys):
+    input_folder, output_2d_folder, output_3d_folder = (str(tmp_path / name) for name in ("input", "2d", "3d"))
+    (tmp_path / "input").mkdir()
+    generate_images(input_folder, 2, 128)
+    registry = PredictorRegistry(factory=lambda *predictor_options: StubPredictor())
+
+    def run(resume):
+        return extract_features(1, "Building Footprints", input_folder, output_2d_folder, output_3d_folder, "Simplify Contours",
+                                registry=registry, device="cpu", cache_folder=None, class_thresholds={0: 0.7}, resume=resume)
+
+    run(resume=False)
+    assert run(resume=True)["images"] == 0
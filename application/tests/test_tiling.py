@@ -0,0 +1,92 @@
+import numpy as np
+import pytest
+
+from cv2 import connectedComponentsWithStats
+
+from raster_source import ArrayRasterSource
+from stub_predictor import SyntheticInstances
+from tiling import SceneInstance, tile_windows, merge_scene_instances, predict_tiled
+
+def test_tiles_cover_scene_with_overlap():
+    windows = tile_windows(height=2500, width=3000, tile_size=1024, overlap=128)
+
+    covered = np.zeros((2500, 3000), dtype=bool)
+    for x0, y0, x1, y1 in windows:
+        assert x1 - x0 <= 1024 and y1 - y0 <= 1024
+        covered[y0:y1, x0:x1] = True
+    assert covered.all()
+
+    # Adjacent tiles share at least the overlap
+    xs = sorted({x0 for x0, _, _, _ in windows})
+    assert all(b - a <= 1024 - 128 for a, b in zip(xs, xs[1:]))
+
+def test_small_scene_is_a_single_tile():
+    assert tile_windows(height=300, width=400, tile_size=1024, overlap=128) == [(0, 0, 400, 300)]
+
+def test_tile_size_must_exceed_overlap():
+    with pytest.raises(ValueError):
+        tile_windows(height=2000, width=2000, tile_size=100, overlap=100)
+
+def instance_from_scene_mask(scene_mask, window, score=0.9):
+    """Crop a scene mask to a tile window and then to the box of the building inside it."""
+    x0, y0, x1, y1 = window
+    tile_mask = scene_mask[y0:y1, x0:x1]
+    ys, xs = np.nonzero(tile_mask)
+    bx0, by0, bx1, by1 = xs.min(), ys.min(), xs.max() + 1, ys.max() + 1
+    return SceneInstance((bx0 + x0, by0 + y0, bx1 + x0, by1 + y0), tile_mask[by0:by1, bx0:bx1], score, 0)
+
+def test_building_across_seam_is_merged_into_one_footprint():
+    scene_mask = np.zeros((100, 200), dtype=bool)
+    scene_mask[40:60, 80:130] = True  # Building crossing the seam between the two tiles
+
+    left = instance_from_scene_mask(scene_mask, (0, 0, 120, 100), score=0.8)
+    right = instance_from_scene_mask(scene_mask, (90, 0, 200, 100), score=0.9)
+
+    merged = merge_scene_instances([left, right], tiles=[0, 1])
+
+    assert len(merged) == 1
+    x0, y0, x1, y1 = merged[0].box
+    assert (x0, y0, x1, y1) == (80, 40, 130, 60)
+    assert merged[0].mask.all()
+    assert merged[0].score == 0.9
+
+def test_separate_buildings_are_not_merged():
+    scene_mask_a = np.zeros((100, 200), dtype=bool)
+    scene_mask_a[10:30, 95:115] = True
+    scene_mask_b = np.zeros((100, 200), dtype=bool)
+    scene_mask_b[60:80, 95:115] = True
+
+    instances = [
+        instance_from_scene_mask(scene_mask_a, (0, 0, 120, 100)),
+        instance_from_scene_mask(scene_mask_b, (0, 0, 120, 100)),
+        instance_from_scene_mask(scene_mask_a, (90, 0, 200, 100)),
+        instance_from_scene_mask(scene_mask_b, (90, 0, 200, 100)),
+    ]
+
+    merged = merge_scene_instances(instances, tiles=[0, 0, 1, 1])
+
+    assert sorted(instance.box for instance in merged) == [(95, 10, 115, 30), (95, 60, 115, 80)]
+
+class BrightRegionPredictor:
+    """Predictor detecting every bright region of a tile as a building, with its exact box."""
+
+    def predict_images(self, images):
+        outputs = []
+        for img in images:
+            count, labels, stats, _ = connectedComponentsWithStats((img[:, :, 0] > 0).astype(np.uint8))
+            boxes = [(x, y, x + w, y + h) for x, y, w, h, _ in stats[1:]]
+            masks = np.stack([labels == label for label in range(1, count)]) if count > 1 else np.zeros((0,) + img.shape[:2], bool)
+            outputs.append({"instances": SyntheticInstances(img.shape[:2], boxes, [0.9] * len(boxes), [0] * len(boxes), masks)})
+        return outputs
+
+def test_tiled_scene_exports_each_building_once_with_its_exact_box():
+    # 1100 pixels is not a multiple of the tile step: the last tile overlaps the first by 948 pixels
+    scene = np.zeros((600, 1100, 3), dtype=np.uint8)
+    scene[250:350, 300:400] = 255  # Seen whole by both tiles, away from their border bands
+    scene[100:160, 1000:1050] = 255  # Cut by the right border of the first tile
+    assert tile_windows(600, 1100, 1024, 128) == [(0, 0, 1024, 600), (76, 0, 1100, 600)]
+
+    instances = predict_tiled(BrightRegionPredictor(), ArrayRasterSource(scene), tile_size=1024, overlap=128)
+
+    assert sorted(instance.box for instance in instances) == [(300, 250, 400, 350), (1000, 100, 1050, 160)]
+    assert all(instance.mask.all() for instance in instances)
@@ -0,0 +1,183 @@
+# Tiled sliding-window inference for large satellite scenes, stitching footprints back into scene coordinates.
+from collections import namedtuple
+
+from numpy import array, zeros, maximum, minimum, nonzero, logical_and, logical_or, count_nonzero
+
+from batch_inference import iter_batches, predict_batch
+from instance_filter import filter_instances
+
+DEFAULT_TILE_SIZE = 1024  # Tile side in pixels, roughly the input size the models were trained on
+DEFAULT_TILE_OVERLAP = 128  # Overlap between adjacent tiles, should exceed the size of most buildings
+DEFAULT_MERGE_THRESHOLD = 0.5  # Overlap (relative to the smaller mask) above which two detections are one building
+
+# A detected building in scene coordinates. The mask only covers the box (x0, y0, x1, y1).
+SceneInstance = namedtuple("SceneInstance", ["box", "mask", "score", "class_id"])
+
+def tile_positions(length, tile_size, overlap):
+    """Return the start offsets of the tiles covering [0, length), the last tile ending at the border."""
+    if tile_size <= overlap:
+        raise ValueError(f"Tile size ({tile_size}) must be larger than the tile overlap ({overlap}).")
+    if length <= tile_size:
+        return [0]
+    step = tile_size - overlap
+    positions = list(range(0, length - tile_size, step))
+    positions.append(length - tile_size)
+    return positions
+
+def tile_windows(height, width, tile_size=DEFAULT_TILE_SIZE, overlap=DEFAULT_TILE_OVERLAP):
+    """Return the (x0, y0, x1, y1) windows of the overlapping tiles covering a height x width scene."""
+    return [
+        (x, y, min(x + tile_size, width), min(y + tile_size, height))
+        for y in tile_positions(height, tile_size, overlap)
+        for x in tile_positions(width, tile_size, overlap)
+    ]
+
+def tile_instances(instances, window, score_threshold, class_thresholds=None, statistics=None):
+    """
+    Convert the predictions of one tile into SceneInstances, cropping each mask to its box.
+
+    Parameters:
+        instances (Instances): Predictions of the tile, in tile coordinates.
+        window (tuple): The (x0, y0, x1, y1) window of the tile in the scene.
+        score_threshold (float): Detections below this score are dropped.
+        class_thresholds (dict): Minimum score per class id, overriding score_threshold for that class.
+        statistics (dict): Device transfer statistics to update, see instance_filter.filter_instances.
+
+    Returns:
+        list: SceneInstances in scene coordinates.
+    """
+    # Dropped detections are left on the model device, the others only move the pixels of their boxes,
+    # rounded outwards so the cropped mask keeps every pixel of the building
+    instances = filter_instances(instances, score_threshold, class_thresholds, statistics, margin=0)
+    tile_x, tile_y = window[0], window[1]
+
+    scene_instances = []
+    for i, (x0, y0, x1, y1) in enumerate(instances.masks.windows.tolist()):
+        if x1 <= x0 or y1 <= y0:
+            continue
+        box = (x0 + tile_x, y0 + tile_y, x1 + tile_x, y1 + tile_y)
+        scene_instances.append(SceneInstance(box, instances.masks.crop(i), float(instances.scores[i]), int(instances.classes[i])))
+    return scene_instances
+
+def _seen_by_other_tile(box, windows, tile_index):
+    """
+    Whether a box intersects the window of another tile, which may detect the same building.
+
+    The last tile of a row or column ends at the scene border, so it can overlap its neighbour
+    by much more than the tile overlap: the windows are checked rather than a border band.
+    """
+    x0, y0, x1, y1 = box
+    hits = (windows[:, 0] < x1) & (x0 < windows[:, 2]) & (windows[:, 1] < y1) & (y0 < windows[:, 3])
+    hits[tile_index] = False
+    return bool(hits.any())
+
+def merge_scene_instances(instances, tiles, merge_threshold=DEFAULT_MERGE_THRESHOLD):
+    """
+    De-duplicate buildings detected by several overlapping tiles.
+
+    Two detections from different tiles are the same building when their masks overlap by at
+    least merge_threshold of the smaller mask. Each group of duplicates is merged into one
+    instance whose mask is the union of the group, so buildings cut by a seam are joined up.
+
+    Parameters:
+        instances (list): SceneInstances from all tiles.
+        tiles (list): Index of the tile each instance was detected in.
+        merge_threshold (float): Minimum overlap, relative to the smaller mask, to merge two detections.
+
+    Returns:
+        list: The de-duplicated SceneInstances.
+    """
+    if not instances:
+        return []
+
+    parent = list(range(len(instances)))
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    boxes = array([instance.box for instance in instances])
+    areas = [count_nonzero(instance.mask) for instance in instances]
+
+    for i in range(len(instances)):
+        # Only compare against later instances whose boxes intersect this one
+        ix0 = maximum(boxes[i, 0], boxes[i + 1:, 0])
+        iy0 = maximum(boxes[i, 1], boxes[i + 1:, 1])
+        ix1 = minimum(boxes[i, 2], boxes[i + 1:, 2])
+        iy1 = minimum(boxes[i, 3], boxes[i + 1:, 3])
+        for offset in nonzero(logical_and(ix1 > ix0, iy1 > iy0))[0]:
+            j = i + 1 + offset
+            if tiles[i] == tiles[j] or find(i) == find(j):
+                continue  # Duplicates within a tile are already suppressed by the model
+            x0, y0, x1, y1 = ix0[offset], iy0[offset], ix1[offset], iy1[offset]
+            mask_i = instances[i].mask[y0 - boxes[i, 1]:y1 - boxes[i, 1], x0 - boxes[i, 0]:x1 - boxes[i, 0]]
+            mask_j = instances[j].mask[y0 - boxes[j, 1]:y1 - boxes[j, 1], x0 - boxes[j, 0]:x1 - boxes[j, 0]]
+            smaller_area = min(areas[i], areas[j])
+            if smaller_area and count_nonzero(logical_and(mask_i, mask_j)) / smaller_area >= merge_threshold:
+                parent[find(j)] = find(i)
+
+    groups = {}
+    for i in range(len(instances)):
+        groups.setdefault(find(i), []).append(instances[i])
+
+    merged = []
+    for group in groups.values():
+        if len(group) == 1:
+            merged.append(group[0])
+            continue
+        x0 = min(instance.box[0] for instance in group)
+        y0 = min(instance.box[1] for instance in group)
+        x1 = max(instance.box[2] for instance in group)
+        y1 = max(instance.box[3] for instance in group)
+        mask = zeros((y1 - y0, x1 - x0), dtype=bool)
+        for instance in group:
+            bx0, by0, bx1, by1 = instance.box
+            region = mask[by0 - y0:by1 - y0, bx0 - x0:bx1 - x0]
+            logical_or(region, instance.mask, out=region)
+        best = max(group, key=lambda instance: instance.score)
+        merged.append(SceneInstance((x0, y0, x1, y1), mask, best.score, best.class_id))
+    return merged
+
+def predict_tiled(predictor, source, tile_size=DEFAULT_TILE_SIZE, overlap=DEFAULT_TILE_OVERLAP, batch_size=1,
+                  score_threshold=0.5, merge_threshold=DEFAULT_MERGE_THRESHOLD, class_thresholds=None, statistics=None):
+    """
+    Detect buildings in a large scene by running the model on overlapping tiles.
+
+    Tiles are read from the raster source and run through the model batch_size at a time,
+    and only box-cropped masks are kept, so peak memory depends on the tile size rather
+    than the scene size. Detections from neighbouring tiles that cover the same building
+    are merged.
+
+    Parameters:
+        predictor (DefaultPredictor): Loaded predictor used for inference.
+        source (RasterSource): Scene to read the tiles from (see raster_source.open_raster).
+        tile_size (int): Tile side in pixels.
+        overlap (int): Overlap between adjacent tiles in pixels.
+        batch_size (int): Number of tiles run through the model in a single forward pass.
+        score_threshold (float): Detections below this score are dropped.
+        merge_threshold (float): Minimum mask overlap, relative to the smaller mask, to merge two detections.
+        class_thresholds (dict): Minimum score per class id, overriding score_threshold for that class.
+        statistics (dict): Device transfer statistics to update, see instance_filter.filter_instances.
+
+    Returns:
+        list: SceneInstances in scene coordinates.
+    """
+    windows = tile_windows(source.height, source.width, tile_size, overlap)
+    window_array = array(windows)
+
+    # Detections outside every other tile cannot be seen twice, so they skip the merge
+    interior, seam, seam_tiles = [], [], []
+    for batch_start, batch_windows in zip(range(0, len(windows), batch_size), iter_batches(windows, batch_size)):
+        tiles = [source.read(window) for window in batch_windows]
+        for tile_index, window, outputs in zip(range(batch_start, batch_start + len(tiles)), batch_windows,
+                                               predict_batch(predictor, tiles)):
+            for instance in tile_instances(outputs["instances"], window, score_threshold, class_thresholds, statistics):
+                if _seen_by_other_tile(instance.box, window_array, tile_index):
+                    seam.append(instance)
+                    seam_tiles.append(tile_index)
+                else:
+                    interior.append(instance)
+
+    return interior + merge_scene_instances(seam, seam_tiles, merge_threshold)
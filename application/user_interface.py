@@ -9,11 +9,12 @@ import os
 import tkinter as tk
 import customtkinter as ctk
 
-from cv2 import imread, cvtColor, COLOR_BGR2RGB
+from cv2 import cvtColor, COLOR_BGR2RGB
 
 from PIL import Image as PILImage, ImageTk
 
-from detect_buildings import extract_features
+from raster_source import open_raster
+from resolution_presets import PRESETS, DEFAULT_PRESET, load_preset_measurements, describe_preset
 
 
 class App:
@@ -108,7 +109,21 @@ class App:
         
         # default frame redraw
         self.show_paths_frame()
+
+        # Load the model libraries in the background once the window is up
+        self.root.after(1000, self.warm_up_in_thread)
     
+    def warm_up_in_thread(self):
+        """Import the model libraries in a background thread so the first extraction starts quickly."""
+        def warm_up():
+            try:
+                from detect_buildings import warm_up_libraries
+                warm_up_libraries()
+            except Exception as e:
+                print(f"Warning: detection libraries could not be loaded, extraction is unavailable until they are installed: {e}")
+
+        Thread(target=warm_up, daemon=True).start()
+
     def get_user_preferences(self):
         """Get user preferences from a configuration file."""
         user_preferences = {
@@ -241,10 +256,58 @@ class App:
         self.model_dropdown = ctk.CTkOptionMenu(
             left_frame,
             variable=self.model_var,  # This holds the currently selected model
-            values=self.model_options   # Pass the list of model options directly
+            values=self.model_options,   # Pass the list of model options directly
+            command=lambda _: self.update_preset_label()
         )
         self.model_dropdown.pack(pady=5)
 
+        # Inference precision, the quantized INT8 model is faster on computers without a GPU
+        self.precision_options = {
+            "Full precision (FP32)": "fp32",
+            "Quantized INT8 (faster on CPU, slightly less accurate)": "int8",
+        }
+        if not hasattr(self, 'precision_var'):
+            self.precision_var = tk.StringVar(value=list(self.precision_options)[0])
+
+        self.precision_dropdown = ctk.CTkOptionMenu(
+            left_frame,
+            variable=self.precision_var,
+            values=list(self.precision_options)
+        )
+        self.precision_dropdown.pack(pady=5)
+
+        # Inference engine, ONNX Runtime runs an exported copy of the model on the CPU
+        self.engine_options = {
+            "PyTorch engine": "pytorch",
+            "ONNX Runtime engine (CPU, exported model)": "onnx",
+        }
+        if not hasattr(self, 'engine_var'):
+            self.engine_var = tk.StringVar(value=list(self.engine_options)[0])
+
+        self.engine_dropdown = ctk.CTkOptionMenu(
+            left_frame,
+            variable=self.engine_var,
+            values=list(self.engine_options)
+        )
+        self.engine_dropdown.pack(pady=5)
+
+        # Input resolution preset, trading detail for speed, with its measured latency and AP
+        self.preset_options = [preset.capitalize() for preset in PRESETS]
+        if not hasattr(self, 'preset_var'):
+            self.preset_var = tk.StringVar(value=DEFAULT_PRESET.capitalize())
+        self.preset_measurements = load_preset_measurements()
+
+        self.preset_dropdown = ctk.CTkOptionMenu(
+            left_frame,
+            variable=self.preset_var,
+            values=self.preset_options,
+            command=lambda _: self.update_preset_label()
+        )
+        self.preset_dropdown.pack(pady=(5, 0))
+        self.preset_info_label = ctk.CTkLabel(left_frame, text="", font=("Arial", 12))
+        self.preset_info_label.pack(pady=(0, 5))
+        self.update_preset_label()
+
         # Feature selection label
         self.feature_label = ctk.CTkLabel(left_frame, text="Select 3D Feature to Extract:",font=("Arial", 14))
         self.feature_label.pack(pady=5)
@@ -288,6 +351,87 @@ class App:
         )
         self.feature_dropdown.pack(padx=10, pady=10)
 
+        # Batch size label
+        self.batch_size_label = ctk.CTkLabel(left_frame, text="Images per Inference Batch:",font=("Arial", 14))
+        self.batch_size_label.pack(pady=5)
+
+        # Batch size options, larger batches make better use of the CPU/GPU at the cost of memory
+        self.batch_size_options = ["1", "2", "4", "8", "16"]
+
+        # Dropdown variable for batch size selection
+        if not hasattr(self, 'batch_size_var'):
+            self.batch_size_var = tk.StringVar(value=self.batch_size_options[0])  # Set default value if not already set
+
+        # Dropdown menu for batch size selection
+        self.batch_size_dropdown = ctk.CTkOptionMenu(
+            left_frame,
+            variable=self.batch_size_var,  # This holds the currently selected batch size
+            values=self.batch_size_options   # Pass the list of batch size options directly
+        )
+        self.batch_size_dropdown.pack(padx=10, pady=10)
+
+        # Worker processes label
+        self.workers_label = ctk.CTkLabel(left_frame, text="Inference Worker Processes:",font=("Arial", 14))
+        self.workers_label.pack(pady=5)
+
+        # Worker options, each worker loads its own model and processes a share of the input images
+        self.workers_options = ["1", "2", "4", "8"]
+
+        # Dropdown variable for worker selection
+        if not hasattr(self, 'workers_var'):
+            self.workers_var = tk.StringVar(value=self.workers_options[0])  # Set default value if not already set
+
+        # Dropdown menu for worker selection
+        self.workers_dropdown = ctk.CTkOptionMenu(
+            left_frame,
+            variable=self.workers_var,  # This holds the currently selected number of workers
+            values=self.workers_options   # Pass the list of worker options directly
+        )
+        self.workers_dropdown.pack(padx=10, pady=10)
+
+        # Tiling label
+        self.tiling_label = ctk.CTkLabel(left_frame, text="Tile Large Scenes (tile size in pixels):",font=("Arial", 14))
+        self.tiling_label.pack(pady=5)
+
+        # Tiling options, large orthophotos are cut into overlapping tiles so small buildings are not lost
+        self.tiling_options = ["Off", "512", "1024", "2048"]
+
+        # Dropdown variable for tiling selection
+        if not hasattr(self, 'tiling_var'):
+            self.tiling_var = tk.StringVar(value=self.tiling_options[0])  # Set default value if not already set
+
+        # Dropdown menu for tiling selection
+        self.tiling_dropdown = ctk.CTkOptionMenu(
+            left_frame,
+            variable=self.tiling_var,  # This holds the currently selected tile size
+            values=self.tiling_options   # Pass the list of tiling options directly
+        )
+        self.tiling_dropdown.pack(padx=10, pady=10)
+
+        # Annotation label
+        self.annotation_label = ctk.CTkLabel(left_frame, text="Annotated 2D Images:",font=("Arial", 14))
+        self.annotation_label.pack(pady=5)
+
+        # Annotation options as (scale, every Nth image), smaller or fewer annotations speed up large runs
+        self.annotation_options = {
+            "Every image": (0.8, 1),
+            "Every image (half size)": (0.4, 1),
+            "Every 10th image": (0.8, 10),
+            "Off": (0.8, 0),
+        }
+
+        # Dropdown variable for annotation selection
+        if not hasattr(self, 'annotation_var'):
+            self.annotation_var = tk.StringVar(value="Every image")  # Set default value if not already set
+
+        # Dropdown menu for annotation selection
+        self.annotation_dropdown = ctk.CTkOptionMenu(
+            left_frame,
+            variable=self.annotation_var,  # This holds the currently selected annotation mode
+            values=list(self.annotation_options)   # Pass the list of annotation options directly
+        )
+        self.annotation_dropdown.pack(padx=10, pady=10)
+
         # Create the canvas or image to display on the left (visualization or example image)
         self.canvas_label = ctk.CTkLabel(right_frame, text="Example of Extracted Features in Blender", font=("Arial", 16,"bold"))
         self.canvas_label.pack(pady=10)
@@ -331,6 +475,11 @@ class App:
         # Display the detection frame
         self.show_frame(self.detection_frame)
         
+    def update_preset_label(self):
+        """Show the measured latency and AP of the selected resolution preset for the selected model."""
+        model_selection = self.model_options.index(self.model_var.get()) + 1
+        self.preset_info_label.configure(text=describe_preset(self.preset_var.get().lower(), model_selection, self.preset_measurements))
+
     def select_input_folder(self):
         """Select input folder."""
         folder = tk.filedialog.askdirectory()
@@ -562,6 +711,56 @@ class App:
 
         self.post_process_dropdown.pack(pady=10)
 
+        # Minimum confidence of the exported detections, lower keeps more (and less certain) buildings
+        self.score_threshold_options = ["0.3", "0.4", "0.5", "0.6", "0.7", "0.8", "0.9"]
+        if not hasattr(self, 'score_threshold_var'):
+            self.score_threshold_var = tk.StringVar(value="0.5")
+
+        self.score_threshold_label = ctk.CTkLabel(right_frame, text="Minimum detection confidence:")
+        self.score_threshold_label.pack(pady=(10, 0))
+        self.score_threshold_dropdown = ctk.CTkOptionMenu(
+            right_frame,
+            variable=self.score_threshold_var,
+            values=self.score_threshold_options
+        )
+        self.score_threshold_dropdown.pack(pady=10)
+
+        # Mesh file format of the exported imagery and footprints
+        self.export_format_options = ["OBJ", "GLB", "PLY"]
+        if not hasattr(self, 'export_format_var'):
+            self.export_format_var = tk.StringVar(value=self.export_format_options[0])
+
+        self.export_format_label = ctk.CTkLabel(right_frame, text="Export format (OBJ text, binary glTF or binary PLY):")
+        self.export_format_label.pack(pady=(10, 0))
+        self.export_format_dropdown = ctk.CTkOptionMenu(
+            right_frame,
+            variable=self.export_format_var,
+            values=self.export_format_options
+        )
+        self.export_format_dropdown.pack(pady=10)
+
+        # City mosaic: all images placed side by side, chunked with levels of detail for streaming
+        if not hasattr(self, 'mosaic_var'):
+            self.mosaic_var = tk.BooleanVar(value=False)
+
+        self.mosaic_checkbox = ctk.CTkCheckBox(
+            right_frame,
+            text="Also build a city mosaic with levels of detail (3D output folder/mosaic)",
+            variable=self.mosaic_var
+        )
+        self.mosaic_checkbox.pack(pady=10)
+
+        # Re-export only mode, replaying the predictions stored by the last run with the selected algorithm
+        if not hasattr(self, 'reexport_var'):
+            self.reexport_var = tk.BooleanVar(value=False)
+
+        self.reexport_checkbox = ctk.CTkCheckBox(
+            right_frame,
+            text="Re-export only (reuse the predictions of the last run, no detection)",
+            variable=self.reexport_var
+        )
+        self.reexport_checkbox.pack(pady=10)
+
         # Add labels for algorithm descriptions in the right frame
         algorithm_descriptions = [
             ("Simplify Contours", 
@@ -662,6 +861,13 @@ class App:
         self.run_button = ctk.CTkButton(left_frame, text="⏯️ Run Feature Extraction ⏯️", command=self.run_feature_extraction, fg_color="green", font=("Arial", 16))
         self.run_button.pack(pady=10)
 
+        # Resume mode, skipping the images an interrupted run already completed
+        if not hasattr(self, 'resume_var'):
+            self.resume_var = tk.BooleanVar(value=False)
+
+        self.resume_checkbox = ctk.CTkCheckBox(left_frame, text="Resume the previous run (skip completed images)", variable=self.resume_var)
+        self.resume_checkbox.pack(pady=10)
+
         # Create a frame for the log in the second column (log_frame)
         log_frame = ctk.CTkFrame(self.run_frame)
         log_frame.grid(row=0, column=1, padx=20, pady=10, sticky="nsew")
@@ -785,11 +991,23 @@ class App:
             tk.messagebox.showerror("Error", "All input and output folders must be selected before run!")
             return  # Stop further execution of the function
         
-        model_selection = self.model_var.get()
+        model_selection = self.model_options.index(self.model_var.get()) + 1  # 1-based model index used by detect_buildings.py
         extract_feature = self.feature_var.get()
         input_folder = self.input_entry.get()
         output_2d_folder = self.output_2d_entry.get()
         output_3d_folder = self.output_3d_entry.get()
+        batch_size = int(self.batch_size_var.get())
+        num_workers = int(self.workers_var.get())
+        tile_size = None if self.tiling_var.get() == "Off" else int(self.tiling_var.get())
+        reexport_only = self.reexport_var.get() if hasattr(self, 'reexport_var') else False
+        annotation_scale, annotate_every = self.annotation_options[self.annotation_var.get()]
+        resume = self.resume_var.get()
+        export_format = self.export_format_var.get() if hasattr(self, 'export_format_var') else "OBJ"
+        mosaic = self.mosaic_var.get() if hasattr(self, 'mosaic_var') else False
+        score_threshold = float(self.score_threshold_var.get()) if hasattr(self, 'score_threshold_var') else 0.5
+        precision = self.precision_options[self.precision_var.get()] if hasattr(self, 'precision_var') else "fp32"
+        engine = self.engine_options[self.engine_var.get()] if hasattr(self, 'engine_var') else "pytorch"
+        preset = self.preset_var.get().lower() if hasattr(self, 'preset_var') else DEFAULT_PRESET
 
         # set global variable to use in detect_buildings.py
         global export_post_process_algorithm
@@ -810,6 +1028,11 @@ class App:
             errors.append("Output 3D folder not selected. Please select output geometry folder before running extraction.")
         elif not path.isdir(output_3d_folder):
             errors.append(f"Selected output 3D folder path is invalid: {output_3d_folder}")
+
+        if engine == "onnx" and precision != "fp32":
+            errors.append("The ONNX Runtime engine runs the full precision model. Select FP32 precision or the PyTorch engine.")
+        if engine == "onnx" and preset != DEFAULT_PRESET:
+            errors.append("The ONNX Runtime engine runs the model at the resolution it was exported with. Select the Balanced preset or the PyTorch engine.")
             
         if errors:
             print("======\nWarning! Encountered errors when running:\n======")
@@ -820,12 +1043,24 @@ class App:
         self.save_preferences_after_run() # Save the preferences after running the extraction
         
         print("======\nSelected Parameters:\n======",
-              "\nModel selection --> ",model_selection,
+              "\nModel selection --> ",self.model_var.get(),
+              "\nPrecision --> ",precision,
+              "\nEngine --> ",engine,
+              "\nResolution preset --> ",preset,
               "\nExtract feature --> ", extract_feature,
               "\nInput folder --> ",input_folder,
               "\nOutput_2d_folder --> ",output_2d_folder,
               "\nOutput_3d_folder --> ",output_3d_folder,
               "\nPost Processing: --> ",export_post_process_algorithm,
+              "\nMinimum confidence: --> ",score_threshold,
+              "\nExport format: --> ",export_format,
+              "\nCity mosaic: --> ",mosaic,
+              "\nBatch size: --> ",batch_size,
+              "\nWorker processes: --> ",num_workers,
+              "\nTile size: --> ",self.tiling_var.get(),
+              "\nAnnotated images: --> ",self.annotation_var.get(),
+              "\nRe-export only: --> ",reexport_only,
+              "\nResume: --> ",resume,
               "\n======\nRunning feature extraction...\n======\n")
         
         # Disable the button and reset the progress bar
@@ -835,14 +1070,16 @@ class App:
         # Create and start a new thread for the extraction process
         extraction_thread = Thread(
             target=self.extract_features_in_thread,
-            args=(model_selection, extract_feature, input_folder, output_2d_folder,output_3d_folder,export_post_process_algorithm,)
+            args=(model_selection, extract_feature, input_folder, output_2d_folder,output_3d_folder,export_post_process_algorithm,batch_size,num_workers,tile_size,reexport_only,resume,annotation_scale,annotate_every,export_format,mosaic,score_threshold,precision,engine,preset,)
         )
         extraction_thread.start()    
         
-    def extract_features_in_thread(self, model_selection, extract_feature, input_folder,output_2d_folder,output_3d_folder,export_post_process_algorithm):
+    def extract_features_in_thread(self, model_selection, extract_feature, input_folder,output_2d_folder,output_3d_folder,export_post_process_algorithm,batch_size=1,num_workers=1,tile_size=None,reexport_only=False,resume=False,annotation_scale=0.8,annotate_every=1,export_format="OBJ",mosaic=False,score_threshold=0.5,precision="fp32",engine="pytorch",preset="balanced"):
         """Perform the feature extraction in a separate thread."""
         try:
-            extract_features(model_selection, extract_feature, input_folder, output_2d_folder,output_3d_folder, export_post_process_algorithm,self.progressbar,self.feedback_label)
+            # Imported on first use so the window opens without loading the model libraries
+            from detect_buildings import extract_features
+            extract_features(model_selection, extract_feature, input_folder, output_2d_folder,output_3d_folder, export_post_process_algorithm,self.progressbar,self.feedback_label,batch_size=batch_size,num_workers=num_workers,tile_size=tile_size,reexport_only=reexport_only,resume=resume,annotation_scale=annotation_scale,annotate_every=annotate_every,export_format=export_format,mosaic=mosaic,score_threshold=score_threshold,precision=precision,engine=engine,preset=preset)
         except Exception as e:
             # Handle exceptions and inform the user
             tk.messagebox.showerror("Error", f"An error occurred: {e}")
@@ -918,7 +1155,9 @@ class App:
         else:
             image_path = example_image_path
             
-        img = imread(image_path)
+        # Read a preview fitting the 500x500 canvas, large rasters are decoded one band at a time
+        with open_raster(image_path) as source:
+            img = source.read_preview(500)
 
         # Convert to RGB (from BGR used by OpenCV)
         img_rgb = cvtColor(img, COLOR_BGR2RGB)
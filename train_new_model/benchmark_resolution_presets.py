@@ -0,0 +1,70 @@
+import os
+import sys
+import json
+from argparse import ArgumentParser
+
+from torch import set_num_threads
+
+from detectron2.config import get_cfg
+
+from evaluate_model_accuracy import evaluate_loaded_model, save_results_to_csv, select_device, register_dataset
+from compare_quantized_model import NUM_CLASSES, load_model, measure_latency, summarize
+
+# The application builds its predictors with these same presets
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "application"))
+from resolution_presets import PRESETS, apply_preset  # noqa: E402
+
+
+def update_measurements(measurements_path, model_selection, results):
+    # Merge the results of one model into the measurements shown by the application next to each preset
+    measurements = {}
+    if os.path.isfile(measurements_path):
+        with open(measurements_path, encoding="utf-8") as measurements_file:
+            measurements = json.load(measurements_file)
+    measurements[str(model_selection)] = {result["model"]: {name: value for name, value in result.items() if name != "model"}
+                                          for result in results}
+    with open(measurements_path, "w", encoding="utf-8") as measurements_file:
+        json.dump(measurements, measurements_file, indent=2)
+
+if __name__ == "__main__":
+    parser = ArgumentParser(description="Measure the latency and AP of the application's resolution presets for a model.")
+    parser.add_argument("--weights", required=True, help="Model weights (.pth).")
+    parser.add_argument("--config", required=True, help="Detectron2 config file of the model.")
+    parser.add_argument("--model-selection", type=int, required=True, help="Number of the model in the application (1 or 2).")
+    parser.add_argument("--dataset", default="my_dataset_val", help="Registered COCO dataset to evaluate on.")
+    parser.add_argument("--annotations", help="COCO annotations file, registers --dataset from it.")
+    parser.add_argument("--images", help="Image folder of --annotations.")
+    parser.add_argument("--device", default=select_device(), help="Device to measure on (default: the GPU when available).")
+    parser.add_argument("--latency-images", type=int, default=20, help="Images timed for the latency (default 20).")
+    parser.add_argument("--threads", type=int, help="CPU threads used by torch.")
+    parser.add_argument("--output", default="./evaluation_logs/resolution_presets.csv", help="CSV file of the results.")
+    parser.add_argument("--measurements", default="../application/prebuilt_detect_models/resolution_presets.json",
+                        help="Measurements file read by the application.")
+    args = parser.parse_args()
+
+    if args.annotations:
+        register_dataset(args.dataset, args.annotations, args.images)
+    if args.threads:
+        set_num_threads(args.threads)
+    os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+
+    results = []
+    for preset in PRESETS:
+        cfg = get_cfg()
+        cfg.merge_from_file(args.config)
+        cfg.MODEL.WEIGHTS = args.weights
+        cfg.MODEL.DEVICE = args.device
+        cfg.MODEL.ROI_HEADS.NUM_CLASSES = NUM_CLASSES
+        cfg.DATASETS.TEST = (args.dataset,)
+        cfg.OUTPUT_DIR = os.path.dirname(args.output) or "."
+        apply_preset(cfg, preset)  # Also sets the test loader's resize
+
+        model = load_model(cfg)
+        metrics = evaluate_loaded_model(cfg, model)
+        latency = measure_latency(model, cfg, args.latency_images)
+        results.append(summarize(preset, metrics, latency))
+        print(f"{preset:9} {results[-1]['latency_ms']:8.1f} ms  box AP {results[-1]['bbox_AP']:6.2f}  mask AP {results[-1]['segm_AP']:6.2f}")
+
+    save_results_to_csv(results, args.output)
+    update_measurements(args.measurements, args.model_selection, results)
+    print(f"Results saved to {args.output} and {args.measurements}")
@@ -0,0 +1,105 @@
+import os
+import sys
+import copy
+from argparse import ArgumentParser
+from statistics import median
+from time import perf_counter
+
+from torch import no_grad, set_num_threads
+
+from detectron2.checkpoint import DetectionCheckpointer
+from detectron2.config import get_cfg
+from detectron2.data import build_detection_test_loader
+from detectron2.modeling import build_model
+
+from evaluate_model_accuracy import evaluate_loaded_model, save_results_to_csv, register_dataset
+
+# The application quantizes its models with this same function
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "application"))
+from quantization import quantize_model  # noqa: E402
+
+NUM_CLASSES = 3  # Same as the application's predictor_registry.NUM_CLASSES
+METRICS = ("AP", "AP50")
+
+
+def load_model(cfg):
+    # Build the model on the CPU, where quantized inference runs, and load its weights
+    model = build_model(cfg)
+    DetectionCheckpointer(model).load(cfg.MODEL.WEIGHTS)
+    return model.eval()
+
+def measure_latency(model, cfg, images, warmup=2):
+    # Median time of a forward pass over the first images of the test dataset, after a few warm-up passes
+    loader = build_detection_test_loader(cfg, cfg.DATASETS.TEST[0])
+    timings = []
+    with no_grad():
+        for index, inputs in enumerate(loader):
+            if index >= images + warmup:
+                break
+            start = perf_counter()
+            model(inputs)
+            if index >= warmup:
+                timings.append(perf_counter() - start)
+    return median(timings) if timings else float("nan")
+
+def summarize(name, metrics, latency):
+    # Keep the AP and AP50 of the boxes and masks, and the latency in milliseconds
+    result = {"model": name, "latency_ms": round(latency * 1000, 1)}
+    for task in ("bbox", "segm"):
+        for metric in METRICS:
+            result[f"{task}_{metric}"] = round(metrics.get(task, {}).get(metric, float("nan")), 2)
+    return result
+
+def compare(fp32_result, int8_result):
+    # Accuracy lost and speed gained by the quantized model
+    delta = {"model": "int8 - fp32", "latency_ms": round(int8_result["latency_ms"] - fp32_result["latency_ms"], 1)}
+    for name in fp32_result:
+        if name not in ("model", "latency_ms"):
+            delta[name] = round(int8_result[name] - fp32_result[name], 2)
+    return delta
+
+if __name__ == "__main__":
+    parser = ArgumentParser(description="Compare the accuracy and CPU latency of a model and its INT8 quantized version.")
+    parser.add_argument("--weights", required=True, help="Model weights (.pth).")
+    parser.add_argument("--config", required=True, help="Detectron2 config file of the model.")
+    parser.add_argument("--dataset", default="my_dataset_val", help="Registered COCO dataset to evaluate on.")
+    parser.add_argument("--annotations", help="COCO annotations file, registers --dataset from it.")
+    parser.add_argument("--images", help="Image folder of --annotations.")
+    parser.add_argument("--latency-images", type=int, default=20, help="Images timed for the latency (default 20).")
+    parser.add_argument("--threads", type=int, help="CPU threads used by torch.")
+    parser.add_argument("--output", default="./evaluation_logs/quantization_comparison.csv", help="CSV file of the results.")
+    args = parser.parse_args()
+
+    if args.annotations:
+        register_dataset(args.dataset, args.annotations, args.images)
+    if args.threads:
+        set_num_threads(args.threads)
+
+    cfg = get_cfg()
+    cfg.merge_from_file(args.config)
+    cfg.MODEL.WEIGHTS = args.weights
+    cfg.MODEL.DEVICE = "cpu"  # Quantized kernels only exist for the CPU
+    cfg.MODEL.ROI_HEADS.NUM_CLASSES = NUM_CLASSES
+    cfg.DATASETS.TEST = (args.dataset,)
+    cfg.OUTPUT_DIR = os.path.dirname(args.output) or "."
+    os.makedirs(cfg.OUTPUT_DIR, exist_ok=True)
+
+    fp32_model = load_model(cfg)
+    int8_model = quantize_model(copy.deepcopy(fp32_model))
+
+    results = []
+    for name, model in (("fp32", fp32_model), ("int8", int8_model)):
+        metrics = evaluate_loaded_model(cfg, model)
+        latency = measure_latency(model, cfg, args.latency_images)
+        results.append(summarize(name, metrics, latency))
+    results.append(compare(results[0], results[1]))
+    save_results_to_csv(results, args.output)
+
+    fp32_result, int8_result, delta = results
+    for task in ("bbox", "segm"):
+        for metric in METRICS:
+            name = f"{task}_{metric}"
+            print(f"{name:10} fp32 {fp32_result[name]:6.2f}  int8 {int8_result[name]:6.2f}  delta {delta[name]:+6.2f}")
+    speedup = fp32_result["latency_ms"] / int8_result["latency_ms"] if int8_result["latency_ms"] else float("nan")
+    print(f"latency    fp32 {fp32_result['latency_ms']:.1f} ms  int8 {int8_result['latency_ms']:.1f} ms  ({speedup:.2f}x)")
+    print(f"Comparison saved to {args.output}")
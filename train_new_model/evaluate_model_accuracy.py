@@ -1,8 +1,10 @@
 import os
 import csv
 
+from torch.cuda import is_available as cuda_is_available
+
 from detectron2.evaluation import COCOEvaluator, inference_on_dataset
-from detectron2.data import build_detection_test_loader
+from detectron2.data import build_detection_test_loader, DatasetCatalog, MetadataCatalog
 from detectron2.config import get_cfg
 from detectron2.engine import DefaultTrainer
 
@@ -13,23 +15,36 @@ register_coco_instances("my_dataset_train", {}, "/dataset_roboflow/train/_annota
 register_coco_instances("my_dataset_val", {}, "/dataset_roboflow/valid/_annotations.coco.json", "dataset_roboflow/valid/images")
 
 
+def register_dataset(name, annotations, images):
+    # Register a COCO dataset, replacing the example registration above when it has the same name
+    if name in DatasetCatalog.list():
+        DatasetCatalog.remove(name)
+        MetadataCatalog.remove(name)
+    register_coco_instances(name, {}, annotations, images)
+
+def select_device():
+    # Use the GPU when one is available, otherwise fall back to the CPU
+    return "cuda" if cuda_is_available() else "cpu"
+
 def evaluate_model(cfg, model_path):
     # Load model weights of selected model to evaluate
     cfg.MODEL.WEIGHTS = model_path
-    cfg.MODEL.DEVICE = "cuda"  # Change to "cpu" if not using GPU
+    cfg.MODEL.DEVICE = select_device()
     
     # Initialize model with weights
     trainer = DefaultTrainer(cfg)
     trainer.resume_or_load(resume=True)
     
-    evaluator = COCOEvaluator(cfg.DATASETS.TEST[0], cfg, False, output_dir=cfg.OUTPUT_DIR)
-    val_loader = build_detection_test_loader(cfg, cfg.DATASETS.TEST[0])
-    
-    # Run evaluation
-    metrics = inference_on_dataset(trainer.model, val_loader, evaluator)
+    metrics = evaluate_loaded_model(cfg, trainer.model)
     print(f"Metrics for {model_path}: {metrics}")
     return metrics
 
+def evaluate_loaded_model(cfg, model):
+    # Run the COCO evaluation of an already loaded (e.g. quantized) model on the test dataset
+    evaluator = COCOEvaluator(cfg.DATASETS.TEST[0], cfg, False, output_dir=cfg.OUTPUT_DIR)
+    val_loader = build_detection_test_loader(cfg, cfg.DATASETS.TEST[0])
+    return inference_on_dataset(model, val_loader, evaluator)
+
 def evaluate_models(model_paths, cfg):
     results = []
     
@@ -69,7 +84,7 @@ if __name__ == "__main__":
     cfg = get_cfg()
     
     CONFIG_FILE_PATH = f"COCO-InstanceSegmentation/mask_rcnn_R_101_FPN_3x.yaml"
-    cfg.MODEL.DEVICE = "cuda"  # or "cpu" if GPU is unavailable
+    cfg.MODEL.DEVICE = select_device()
     
     # Create output directory for logs
     output_dir = "./evaluation_logs"